@@ -0,0 +1,230 @@
+from airflow.decorators import dag, task
+from airflow.models import Variable
+from airflow.models.param import Param
+
+import pendulum
+import asyncio
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable
+import functools
+import tempfile
+import logging
+import uuid
+import os
+
+# only light modules are imported here - the heavy dependencies of each task are
+# imported inside the task when it runs (see motogp_etl)
+from include.telemetry import track_s3_requests
+from include.registry import (
+    BUCKET,
+    backfill_archive_key,
+    backfill_queue_key,
+    backfill_roster_key,
+)
+
+if TYPE_CHECKING:
+    from include.etl.backfill import WorkItem, WorkQueue
+
+# logger for the backfill DAG
+logger = logging.getLogger(__name__)
+
+# dag arguments - a retried shard resumes from its last checkpoint
+default_args = {"start_date": pendulum.datetime(2023, 10, 25), "retries": 2}
+
+
+def open_queue(shard: int, num_shards: int) -> tuple["WorkQueue", Callable[[], None]]:
+    """Open the work queue of a shard from its last checkpoint.
+
+    Queues are checkpointed into the "backfill_checkpoint_dir" local directory when that
+    Variable is set (ex. a volume shared by the workers), otherwise into S3.
+
+    Args:
+        shard (int): The shard of the queue
+        num_shards (int): The number of shards of the backfill
+
+    Returns:
+        tuple[WorkQueue, Callable[[], None]]: The queue and the function that checkpoints it
+    """
+    from airflow.exceptions import AirflowException
+    from include.etl.backfill import WorkQueue
+    from include.cloud.aws_s3 import download_from_s3, upload_to_s3
+
+    key = backfill_queue_key(shard, num_shards)
+    filename = os.path.basename(key)
+    checkpoint_dir = Variable.get("backfill_checkpoint_dir", None)
+
+    # the local queue file is its own checkpoint
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        return WorkQueue(os.path.join(checkpoint_dir, filename)), lambda: None
+
+    workdir = tempfile.mkdtemp(prefix="motogp_backfill_")
+    try:
+        # resume from the queue uploaded by the last checkpoint
+        path = download_from_s3(key, BUCKET, workdir)
+    except AirflowException:
+        # first run of the shard
+        path = os.path.join(workdir, filename)
+    queue = WorkQueue(path)
+
+    return queue, functools.partial(upload_to_s3, path, key, BUCKET)
+
+
+@dag(
+    default_args=default_args,
+    schedule=None,
+    tags=["motogp"],
+    catchup=False,
+    params={
+        "first_season": Param(2015, type="integer"),
+        "last_season": Param(2023, type="integer"),
+        "shards": Param(4, type="integer", minimum=1),
+    },
+)
+def motogp_backfill():
+    # PLAN
+    @task
+    @track_s3_requests("plan_backfill")
+    def plan_backfill(params: dict = None) -> list[dict]:
+        """Queue the rider pages of every GP class and season, split into shards.
+
+        The riders page of a past season is read from the "backfill_riders_url_template"
+        Variable (ex. "https://www.motogp.com/en/riders/motogp?season={season}") - there
+        is no default, the season filter of motogp.com is not documented. The rider URLs
+        listed for each class and season are stored as a roster, and each rider page is
+        queued once (profile pages are not season-specific).
+
+        URLs already in a shard's queue (including completed ones) are not queued again,
+        so the backfill can be triggered again with a wider range of seasons.
+
+        Args:
+            params (dict): The DAG run params
+
+        Raises:
+            AirflowException: If the URL template is not set, or two seasons list the
+                same riders (the template does not filter by season)
+
+        Returns:
+            list[dict]: The arguments of each shard task
+        """
+        from airflow.exceptions import AirflowException
+        from include.etl.backfill import WorkItem, check_season_rosters, shard_of
+        from include.etl.scrape import execute_async_requests
+        from include.etl.transform import collect_gp_urls
+        from include.cloud.aws_s3 import json_to_s3
+
+        # most recent season first - a rider is queued for the last season they raced
+        seasons = list(range(params["last_season"], params["first_season"] - 1, -1))
+        num_shards = params["shards"]
+        template = Variable.get("backfill_riders_url_template", None)
+        if not template or "{season}" not in template:
+            raise AirflowException(
+                "Set the 'backfill_riders_url_template' Variable to the URL of the "
+                "riders page of a season, with a '{season}' placeholder."
+            )
+
+        # the riders page of each season lists the riders of every GP class
+        responses = asyncio.run(
+            execute_async_requests([template.format(season=s) for s in seasons])
+        )
+        rosters = {}
+        for season, response in zip(seasons, responses):
+            if response is None:
+                logger.warning("The riders page of season %s was not fetched", season)
+                continue
+            # classes that did not run that season (ex. MotoE before 2019) are skipped
+            rosters[season] = collect_gp_urls(response, required=False)
+
+        # an ignored season filter serves the current riders page for every season
+        check_season_rosters(rosters, template)
+
+        items = []
+        for season, roster in rosters.items():
+            for gp_class, urls in roster.items():
+                json_to_s3(urls, backfill_roster_key(gp_class, season), BUCKET)
+                items.extend(WorkItem(gp_class, season, url) for url in urls)
+
+        # add the items of each shard to its queue
+        for shard in range(num_shards):
+            queue, checkpoint = open_queue(shard, num_shards)
+            added = queue.add(
+                [item for item in items if shard_of(item, num_shards) == shard],
+                num_shards,
+            )
+            logger.info("Queued %d new items in shard %d", added, shard)
+            queue.close()
+            checkpoint()
+
+        return [
+            {"shard": shard, "num_shards": num_shards} for shard in range(num_shards)
+        ]
+
+    # EXTRACT
+    @task
+    @track_s3_requests("backfill_shard")
+    def backfill_shard(shard: int, num_shards: int) -> dict[str, int]:
+        """Fetch and archive the pending rider pages of a shard.
+
+        Args:
+            shard (int): The shard of the queue
+            num_shards (int): The number of shards running side by side
+
+        Returns:
+            dict[str, int]: The number of items of the shard by status
+        """
+        from include.etl.backfill import run_shard
+        from include.etl.scrape import ScrapeEngine
+        from include.cloud.aws_s3 import json_to_s3, zip_to_s3_upload
+
+        queue, checkpoint = open_queue(shard, num_shards)
+        # the shards share the proxy's concurrency budget
+        max_concurrency = max(
+            1, int(Variable.get("backfill_max_concurrency", 20)) // num_shards
+        )
+        # compression codec of the archived html ("deflate" or "zstd")
+        codec = Variable.get("html_archive_codec", "deflate")
+
+        def archive(items: list["WorkItem"], responses: list) -> None:
+            # one archive per GP class and season of the batch
+            groups = defaultdict(list)
+            for item, response in zip(items, responses):
+                groups[(item.gp_class, item.season)].append((item.url, response))
+
+            batch_id = uuid.uuid4().hex[:12]
+            for (gp_class, season), pages in groups.items():
+                key = backfill_archive_key(
+                    gp_class, season, f"shard_{shard}_{batch_id}"
+                )
+                zip_to_s3_upload(
+                    f"{key}.zip",
+                    "rider_html",
+                    [response for _, response in pages],
+                    "response",
+                    codec=codec,
+                    bucket_name=BUCKET,
+                )
+                # the url of each member of the archive, in member order
+                json_to_s3([url for url, _ in pages], f"{key}.json", BUCKET)
+
+        async def run() -> dict[str, int]:
+            async with ScrapeEngine(max_concurrency=max_concurrency) as engine:
+                return await run_shard(
+                    queue,
+                    functools.partial(engine.fetch_many, return_exceptions=True),
+                    archive,
+                    checkpoint,
+                    shard=shard,
+                    batch_size=int(Variable.get("backfill_batch_size", 50)),
+                )
+
+        try:
+            return asyncio.run(run())
+        finally:
+            queue.close()
+
+    # run tasks - one mapped task per shard
+    backfill_shard.expand_kwargs(plan_backfill())
+
+
+# call function to execute DAG
+motogp_backfill_dag = motogp_backfill()
@@ -1,17 +1,29 @@
 from airflow.decorators import dag, task
+from airflow.models import Variable
 
 import pendulum
 import asyncio
+import itertools
+from datetime import timedelta
+import os
 
-from include.etl.transform import collect_gp_urls, parse_html_and_format
-from include.etl.scrape import execute_async_requests
-from include.cloud.aws_s3 import (
-    zip_to_s3_upload,
-    unzip_s3_key_to_list,
-    dict_to_df_in_s3,
+# only light modules are imported here - the scheduler parses this file often, so the
+# heavy dependencies of each task (pandas, boto3, httpx, pydantic...) are imported
+# inside the task when it runs
+from include.telemetry import task_telemetry, track_s3_requests
+from include.registry import (
+    BUCKET,
+    GP_CLASS_NAMES,
+    RIDERS_PAGE_URL,
+    changes_manifest_key,
+    changes_table_key,
+    html_archive_key,
+    html_cache_prefix,
+    raw_manifest_key,
+    riders_table_key,
+    transformed_partition,
 )
 
-
 # dag arguments
 default_args = {"start_date": pendulum.datetime(2023, 10, 25)}  # , "retries": 2}
 
@@ -24,89 +36,318 @@ default_args = {"start_date": pendulum.datetime(2023, 10, 25)}  # , "retries": 2
 def taskflow():
     # EXTRACT
     @task
-    def extract_rider_html() -> str:
-        """Get the HTML from each rider's webpage and zip all files to upload to S3 bucket.
+    @task_telemetry("collect_rider_urls")
+    def collect_rider_urls() -> list[dict]:
+        """Collect the URL of each rider's webpage from the riders page, per GP class.
 
         Returns:
-            str: Current date in the format YYYY-MM-DD
+            list[dict]: The arguments of each GP class's extract task (the GP class, the
+                current date in the format YYYY-MM-DD and the rider URLs)
         """
+        from include.etl.scrape import execute_async_requests
+        from include.etl.transform import collect_gp_urls
 
         # get the current date
         current_date = pendulum.now().date()
 
         # list containing motogp.com webpages listing riders and teams
-        motogp_webpage = ["https://www.motogp.com/en/riders/motogp"]
+        motogp_webpage = [RIDERS_PAGE_URL]
         # get the html response from riders page - index because function returns list but only gave a list with one element
         riders_html = asyncio.run(execute_async_requests(motogp_webpage))[0]
         # return function return - to collect rider urls
         rider_urls = collect_gp_urls(riders_html)
 
-        # loop through riders in each class
-        for gp_class, urls in rider_urls.items():
-            # collect responses from requests
-            responses = asyncio.run(execute_async_requests(urls))
+        # one extract task per GP class
+        return [
+            {"gp_class": gp_class, "current_date": str(current_date), "urls": urls}
+            for gp_class, urls in rider_urls.items()
+        ]
+
+    @task
+    @track_s3_requests("extract_rider_html")
+    @task_telemetry("extract_rider_html")
+    def extract_rider_html(gp_class: str, current_date: str, urls: list[str]) -> dict:
+        """Get the HTML from each rider's webpage of a GP class and archive it in the S3 bucket.
+
+        The pages are stored in the content-addressed raw store (one body per distinct
+        page and a manifest per day), or in one zip file per day when the
+        "html_archive_layout" Variable is "zip".
+
+        When the "streaming_transform" Variable is true (and the transform is not
+        incremental), the pages are also parsed as they arrive and the riders table is
+        written here, so the transform task does not download the zip file again.
+
+        Args:
+            gp_class (str): The GP class of the riders (ex. "MOTOGP")
+            current_date (str): Current date in the format YYYY-MM-DD
+            urls (list[str]): The URL of each rider's webpage
+
+        Returns:
+            dict: The GP class, the current date, the key of the manifest (or zip file)
+                in S3 and the key of the riders table when it was written by the
+                streaming pipeline
+        """
+        from include.etl.cache import HtmlCache
+        from include.etl.pipeline import stream_class
+        from include.etl.scrape import ScrapeEngine, execute_async_requests_by_class
+        from include.etl.transform import RIDER_PARQUET_TYPES
+        from include.cloud.aws_s3 import S3ZipWriter, df_to_s3
+        from include.cloud.raw_store import RawStoreWriter, stored_digests
+
+        # cache of rider pages - fresh pages are not requested through the proxy again
+        # (one cache per class, so classes extracted side by side do not share an index)
+        # the local directory is a working copy of the cache mirrored in S3, unless the
+        # "html_cache_store" Variable is "local" (ex. a worker with a persistent disk)
+        cache = HtmlCache(
+            cache_dir=os.path.join(
+                Variable.get("html_cache_dir", "/tmp/motogp_html_cache"), gp_class
+            ),
+            # above the daily schedule, so pages fetched by the previous run are fresh
+            ttl=timedelta(hours=float(Variable.get("html_cache_ttl_hours", 36))),
+            max_age=timedelta(days=float(Variable.get("html_cache_max_age_days", 14))),
+            max_bytes=int(Variable.get("html_cache_max_mib", 256)) * 1024 * 1024,
+            bucket_name=(
+                BUCKET if Variable.get("html_cache_store", "s3") == "s3" else None
+            ),
+            prefix=html_cache_prefix(gp_class),
+        )
+        # compression codec of the archived html ("deflate" or "zstd")
+        codec = Variable.get("html_archive_codec", "deflate")
+        # layout of the archived html ("manifest" or "zip")
+        layout = Variable.get("html_archive_layout", "manifest")
+        # the classes extracted side by side share the proxy's concurrency budget - each
+        # engine starts below its share and grows to it while the proxy keeps up
+        max_concurrency = max(
+            1, int(Variable.get("scrape_max_concurrency", 20)) // len(GP_CLASS_NAMES)
+        )
+
+        # define S3 key based on GP class
+        if layout == "zip":
+            key = html_archive_key(gp_class, current_date)
+        else:
+            key = raw_manifest_key(gp_class, current_date)
+
+        def open_archive():
+            # the archive of the class and the function adding a page (url, content) to it
+            if layout == "zip":
+                archive = S3ZipWriter(key, codec=codec)
+                members = itertools.count()
+                return archive, lambda url, content: archive.write(
+                    f"rider_html_{next(members)}.txt", content
+                )
+            # bodies stored by the previous snapshot are not uploaded again
+            archive = RawStoreWriter(
+                gp_class,
+                current_date,
+                codec=codec,
+                known_digests=stored_digests(gp_class, current_date, codec),
+            )
+            return archive, archive.write
+
+        # parse the pages while they are fetched and archived
+        streaming = (
+            Variable.get("streaming_transform", "false").lower() == "true"
+            and Variable.get("transform_incremental", "false").lower() != "true"
+        )
+        if streaming:
+            file_format = Variable.get("transformed_file_format", "parquet")
+            workers = int(Variable.get("transform_parse_workers", 0))
+
+            async def run():
+                async with ScrapeEngine(
+                    max_concurrency=max_concurrency,
+                    cache=cache,
+                ) as engine:
+                    return await stream_class(
+                        engine,
+                        gp_class,
+                        urls,
+                        current_date,
+                        archive=add_page,
+                        workers=workers,
+                    )
+
+            # the archive is aborted if the class fails
+            archive, add_page = open_archive()
+            with archive:
+                df = asyncio.run(run())
+
+            # upload the table of the class for the load task
+            table_key = riders_table_key(gp_class, current_date, file_format)
+            df_to_s3(
+                df=df,
+                key=table_key,
+                bucket_name=BUCKET,
+                file_format=file_format,
+                dtype=RIDER_PARQUET_TYPES,
+            )
+            return {
+                "gp_class": gp_class,
+                "current_date": current_date,
+                "html_key": key,
+                "table_key": table_key,
+            }
+
+        def upload_class_responses(gp_class: str, responses: list) -> None:
+            # archive the fetched pages of the class, in the order of urls
+            archive, add_page = open_archive()
+            with archive:
+                for url, response in zip(urls, responses):
+                    if response is not None:
+                        add_page(url, response.content)
 
-            # define S3 key based on GP class
-            key = f"html_responses/{gp_class}/{current_date}/rider_responses.zip"
-            # upload temp zipfile to S3 bucket
-            zip_to_s3_upload(key, "rider_html", responses, "response")
+        # collect the responses of the class, then upload them
+        asyncio.run(
+            execute_async_requests_by_class(
+                {gp_class: urls},
+                cache=cache,
+                on_class_complete=upload_class_responses,
+                max_concurrency=max_concurrency,
+            )
+        )
 
-        # return the date
-        return str(current_date)
+        # return the key of the archive for the transform task of the class
+        return {"gp_class": gp_class, "current_date": current_date, "html_key": key}
 
     # TRANSFORM
     @task
-    def transform_htmls(current_date: str) -> list[str]:
-        """Parse and format the HTML for each rider into Pandas DataFrames uploaded into AWS S3 bucket.
+    @track_s3_requests("transform_htmls")
+    @task_telemetry("transform_htmls")
+    def transform_htmls(
+        gp_class: str, current_date: str, html_key: str, table_key: str = None
+    ) -> str:
+        """Parse and format the HTML for each rider of a GP class into one table uploaded into AWS S3 bucket.
 
         Args:
+            gp_class (str): The GP class of the riders (ex. "MOTOGP")
             current_date (str): Current date in the format YYYY-MM-DD
+            html_key (str): Key path to the manifest (or zip file) of the html of the class in S3
+            table_key (str, optional): Key path to the table already written by the
+                streaming pipeline of the extract task
 
         Returns:
-            list[str]: Key paths to the transformed data in S3
+            str: Key path to the transformed data of the class in S3
         """
+        from include.etl.batch import parse_html_to_frame
+        from include.etl.changes import transform_incremental
+        from include.etl.transform import (
+            RIDER_PARQUET_TYPES,
+            parse_html_and_format,
+            riders_to_frame,
+        )
+        from include.cloud.aws_s3 import (
+            df_to_s3,
+            find_previous_partition,
+            json_to_s3,
+            s3_to_df,
+        )
+        from include.cloud.raw_store import iter_raw_pages
 
-        # initialize list to store key paths for transformed data
-        destination_keys = []
-
-        # define GP classes
-        gp_classes = ["MOTOGP", "MOTO2", "MOTO3", "MOTOE"]
-        # loop through GP classes in S3 bucket prefix
-        for _class in gp_classes:
-            # key to read zipped html responses from S3 bucket
-            read_key = f"html_responses/{_class}/{current_date}/rider_responses.zip"
-            # download and unzip file -> dump files as objects into list
-            htmls = unzip_s3_key_to_list(
-                key=read_key, bucket_name="motogp-data-project"
-            )
+        # the class was already transformed while it was fetched
+        if table_key:
+            return table_key
 
-            # call function to parse html and extract/format data
-            data = parse_html_and_format(htmls)
-            # loop through dicts in data
-            for data_dict in data:
-                # key to write dataframes to S3 bucket
-                write_key = f"transformed_rider_data/{_class}/{current_date}/riders.csv"
-                # append write_key to destination_keys
-                destination_keys.append(write_key)
-
-                # convert data_dict to dataframe and upload to S3 bucket
-                dict_to_df_in_s3(
-                    data=data_dict, key=write_key, bucket_name="motogp-data-project"
+        # file format of the transformed tables ("parquet" or "csv")
+        file_format = Variable.get("transformed_file_format", "parquet")
+        # only pass riders that changed since the previous snapshot downstream
+        incremental = Variable.get("transform_incremental", "false").lower() == "true"
+        # number of worker processes parsing the html (0 parses in this process)
+        workers = int(Variable.get("transform_parse_workers", 0))
+        # pages below which the workers are not used (ex. raised on small machines)
+        min_pages = Variable.get("transform_min_process_pages", None)
+        min_pages = int(min_pages) if min_pages is not None else None
+        # validate the riders of a class column by column ("batch") or one by one ("record")
+        validation = Variable.get("transform_validation", "record")
+
+        # lazily stream the html of each rider from the raw store (or zip file) in S3
+        htmls = iter_raw_pages(key=html_key, bucket_name=BUCKET)
+
+        # key to write the class table to S3 bucket
+        write_key = riders_table_key(gp_class, current_date, file_format)
+
+        if incremental:
+            # previous snapshot of the class, if there is one
+            previous_date = find_previous_partition(
+                transformed_partition(gp_class),
+                before=current_date,
+                bucket_name=BUCKET,
+            )
+            previous = None
+            if previous_date:
+                previous = s3_to_df(
+                    riders_table_key(gp_class, previous_date, file_format),
+                    bucket_name=BUCKET,
                 )
+            # only pages that changed since the previous snapshot are parsed
+            df, changes, manifest = transform_incremental(
+                htmls,
+                previous,
+                gp_class,
+                current_date,
+                workers=workers,
+                min_pages=min_pages,
+            )
+        elif validation == "batch":
+            # extract the raw fields and validate the whole class with vectorized checks
+            df = parse_html_to_frame(
+                htmls, gp_class, current_date, workers=workers, min_pages=min_pages
+            )
+        else:
+            # call function to parse html and extract/format data
+            data = parse_html_and_format(htmls, workers=workers, min_pages=min_pages)
+            # collect all riders of the class into one typed table
+            df = riders_to_frame(data, gp_class, current_date)
+
+        # upload the full table to S3 bucket in a single PUT - the next incremental
+        # run diffs against it
+        df_to_s3(
+            df=df,
+            key=write_key,
+            bucket_name=BUCKET,
+            file_format=file_format,
+            dtype=RIDER_PARQUET_TYPES,
+        )
+
+        if incremental:
+            # upload the changed riders and the change manifest next to the table
+            changes_key = changes_table_key(gp_class, current_date, file_format)
+            df_to_s3(
+                df=changes,
+                key=changes_key,
+                bucket_name=BUCKET,
+                file_format=file_format,
+                dtype=RIDER_PARQUET_TYPES,
+            )
+            json_to_s3(
+                manifest,
+                key=changes_manifest_key(gp_class, current_date),
+                bucket_name=BUCKET,
+            )
+            # only the changed riders are loaded, removed riders as rider_removals rows
+            write_key = changes_key
 
-        # return list of filepaths of uploaded JSON files
-        return destination_keys
+        # return the key of the table for the load task
+        return write_key
 
     # LOAD
     @task
+    @track_s3_requests("update_rds_table")
+    @task_telemetry("update_rds_table")
     def update_rds_table(transformed_data_keys: list[str]) -> None:
-        # use Airflow Operator/hook to update RDS table with new JSON files from S3 bucket
-        # Pick what is the best table in Amazon RDS
-        pass
+        """Bulk load the transformed table of each GP class into the RDS riders table.
+
+        Args:
+            transformed_data_keys (list[str]): Key paths to the transformed data in S3
+        """
+        from include.cloud.aws_rds import transformed_data_to_rds
+
+        # upsert the riders of each class - reruns of the same day are idempotent
+        transformed_data_to_rds(keys=list(transformed_data_keys), bucket_name=BUCKET)
 
-    # run tasks
-    current_date = extract_rider_html()
-    transformed_data_keys = transform_htmls(current_date)
+    # run tasks - extract and transform run as one mapped task per GP class
+    rider_urls = collect_rider_urls()
+    html_keys = extract_rider_html.expand_kwargs(rider_urls)
+    transformed_data_keys = transform_htmls.expand_kwargs(html_keys)
     update_rds_table(transformed_data_keys)
 
 
@@ -0,0 +1,346 @@
+import duckdb
+import pandas as pd
+
+from datetime import date, timedelta
+from typing import Callable, Literal, NamedTuple
+import threading
+import logging
+import time
+import os
+
+from .registry import BUCKET, GP_CLASS_NAMES, TRANSFORMED_PREFIX
+
+# logger for the analytics queries
+logger = logging.getLogger(__name__)
+
+# name of the view over the selected rider partitions
+RIDERS_VIEW = "riders"
+
+# riders that joined or left a GP class between two consecutive snapshots
+ROSTER_CHANGES_SQL = f"""
+WITH snapshots AS (
+    SELECT DISTINCT gp_class, snapshot_date FROM {RIDERS_VIEW}
+), ordered AS (
+    SELECT
+        gp_class,
+        snapshot_date,
+        lag(snapshot_date) OVER (PARTITION BY gp_class ORDER BY snapshot_date) AS previous_date
+    FROM snapshots
+)
+SELECT o.snapshot_date, o.gp_class, r.rider_name, 'joined' AS change
+FROM ordered o
+JOIN {RIDERS_VIEW} r ON r.gp_class = o.gp_class AND r.snapshot_date = o.snapshot_date
+WHERE o.previous_date IS NOT NULL AND NOT EXISTS (
+    SELECT 1 FROM {RIDERS_VIEW} p
+    WHERE p.gp_class = o.gp_class
+      AND p.snapshot_date = o.previous_date
+      AND p.rider_name = r.rider_name
+)
+UNION ALL
+SELECT o.snapshot_date, o.gp_class, p.rider_name, 'left' AS change
+FROM ordered o
+JOIN {RIDERS_VIEW} p ON p.gp_class = o.gp_class AND p.snapshot_date = o.previous_date
+WHERE NOT EXISTS (
+    SELECT 1 FROM {RIDERS_VIEW} r
+    WHERE r.gp_class = o.gp_class
+      AND r.snapshot_date = o.snapshot_date
+      AND r.rider_name = p.rider_name
+)
+ORDER BY snapshot_date, gp_class, change, rider_name
+"""
+
+# size of the riders of each GP class in each snapshot
+CLASS_PROFILE_SQL = f"""
+SELECT
+    gp_class,
+    snapshot_date,
+    count(*) AS riders,
+    avg(weight) AS average_weight,
+    avg(height) AS average_height
+FROM {RIDERS_VIEW}
+GROUP BY gp_class, snapshot_date
+ORDER BY gp_class, snapshot_date
+"""
+
+
+class RosterChange(NamedTuple):
+    """A rider that joined or left a GP class since its previous snapshot."""
+
+    snapshot_date: date
+    gp_class: str
+    rider_name: str
+    change: Literal["joined", "left"]
+
+
+class ClassProfile(NamedTuple):
+    """The number and average size of the riders of a GP class in a snapshot."""
+
+    gp_class: str
+    snapshot_date: date
+    riders: int
+    average_weight: float | None
+    average_height: float | None
+
+
+class RiderAnalytics:
+    """Ad-hoc queries over the riders tables written by the transform task, in DuckDB.
+
+    The partitions of the selected GP classes and dates are found from their keys
+    (`{root}/{class}/{date}/riders.{format}`), so only the files of the selected
+    partitions are read. The root can be an S3 prefix or a local directory (ex. a copy
+    of the bucket). Aggregates are cached until `cache_ttl` has passed.
+
+    S3 tables are read with DuckDB's httpfs extension, which must be installed in the
+    image (see Dockerfile) - it is only loaded, never downloaded at query time. The
+    credentials of the "s3_conn" connection are given to DuckDB again before each
+    query, so temporary (ex. STS) credentials refreshed by boto3 are picked up.
+
+    Args:
+        root (str): The prefix of the transformed tables ("s3://bucket/prefix" or a path)
+        file_format (Literal): The file format of the riders tables
+        cache_ttl (timedelta): How long partition listings and aggregates are reused
+        clock (Callable[[], float]): The monotonic clock the cache expires with
+    """
+
+    def __init__(
+        self,
+        root: str = f"s3://{BUCKET}/{TRANSFORMED_PREFIX}",
+        file_format: Literal["parquet", "csv"] = "parquet",
+        cache_ttl: timedelta = timedelta(minutes=10),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.root = root.rstrip("/")
+        self.file_format = file_format
+        self.cache_ttl = cache_ttl.total_seconds()
+        self.clock = clock
+        self.connection = duckdb.connect()
+        # guards the connection, its riders view and the cache
+        self._lock = threading.RLock()
+        self._cache = {}
+        # the httpfs extension is loaded on the first read of S3 tables
+        self._httpfs_loaded = False
+
+    def close(self) -> None:
+        """Close the DuckDB connection."""
+        self.connection.close()
+
+    def partitions(self, gp_classes: list[str] = None) -> list[tuple[str, str, str]]:
+        """List the riders tables of some GP classes.
+
+        Args:
+            gp_classes (list[str], optional): The GP classes (defaults to every class)
+
+        Returns:
+            list[tuple[str, str, str]]: The GP class, the date and the path of each
+                table, sorted by class and date
+        """
+        gp_classes = tuple(gp_classes or GP_CLASS_NAMES)
+        return self._cached(("partitions", gp_classes), self._list, gp_classes)
+
+    def riders(
+        self, gp_classes: list[str] = None, start: str = None, end: str = None
+    ) -> duckdb.DuckDBPyRelation:
+        """Read the riders of the partitions of some GP classes and dates.
+
+        Args:
+            gp_classes (list[str], optional): The GP classes (defaults to every class)
+            start (str, optional): The first date in the format YYYY-MM-DD
+            end (str, optional): The last date in the format YYYY-MM-DD
+
+        Raises:
+            ValueError: If no partition matches
+
+        Returns:
+            duckdb.DuckDBPyRelation: The riders of the selected partitions
+        """
+        paths = self._paths(gp_classes, start, end)
+        with self._lock:
+            self._prepare()
+            # a relation of its own - not the shared view, which other queries replace
+            return self.connection.sql(f"SELECT * FROM {self._reader(paths)}")
+
+    def query(
+        self,
+        sql: str,
+        gp_classes: list[str] = None,
+        start: str = None,
+        end: str = None,
+        params: list = None,
+    ) -> pd.DataFrame:
+        """Run a query over the riders view of some GP classes and dates.
+
+        Args:
+            sql (str): The query, reading from the "riders" view
+            gp_classes (list[str], optional): The GP classes (defaults to every class)
+            start (str, optional): The first date in the format YYYY-MM-DD
+            end (str, optional): The last date in the format YYYY-MM-DD
+            params (list, optional): The parameters of the query's placeholders
+
+        Returns:
+            pd.DataFrame: The result of the query
+        """
+        paths = self._paths(gp_classes, start, end)
+        with self._lock:
+            return self._execute(sql, paths, params).df()
+
+    def roster_changes(
+        self, gp_classes: list[str] = None, start: str = None, end: str = None
+    ) -> list[RosterChange]:
+        """Get the riders that joined or left each GP class between its snapshots.
+
+        Args:
+            gp_classes (list[str], optional): The GP classes (defaults to every class)
+            start (str, optional): The first date in the format YYYY-MM-DD
+            end (str, optional): The last date in the format YYYY-MM-DD
+
+        Returns:
+            list[RosterChange]: The changes, by date, class, change and rider
+        """
+        return self._aggregate(ROSTER_CHANGES_SQL, RosterChange, gp_classes, start, end)
+
+    def class_profiles(
+        self, gp_classes: list[str] = None, start: str = None, end: str = None
+    ) -> list[ClassProfile]:
+        """Get the number and average weight and height of the riders over time.
+
+        Args:
+            gp_classes (list[str], optional): The GP classes (defaults to every class)
+            start (str, optional): The first date in the format YYYY-MM-DD
+            end (str, optional): The last date in the format YYYY-MM-DD
+
+        Returns:
+            list[ClassProfile]: One profile per GP class and date
+        """
+        return self._aggregate(CLASS_PROFILE_SQL, ClassProfile, gp_classes, start, end)
+
+    def _aggregate(
+        self,
+        sql: str,
+        record: type,
+        gp_classes: list[str],
+        start: str,
+        end: str,
+    ) -> list:
+        # the selected files are part of the key - a new snapshot is a new aggregate
+        paths = tuple(self._paths(gp_classes, start, end))
+
+        def run() -> list:
+            return [record(*row) for row in self._execute(sql, paths).fetchall()]
+
+        return self._cached((sql, paths), run)
+
+    def _paths(self, gp_classes: list[str], start: str, end: str) -> list[str]:
+        # prune the partitions by class (listing) and by date (key)
+        paths = [
+            path
+            for _, snapshot_date, path in self.partitions(gp_classes)
+            if (start is None or snapshot_date >= start)
+            and (end is None or snapshot_date <= end)
+        ]
+        if not paths:
+            raise ValueError(
+                f"No riders table of {gp_classes or 'any class'} between "
+                f"{start or 'the first'} and {end or 'the last'} snapshot."
+            )
+        return paths
+
+    def _execute(
+        self, sql: str, paths: list[str], params: list = None
+    ) -> duckdb.DuckDBPyConnection:
+        # the caller holds the lock from pointing the view at the paths to the results,
+        # so other threads cannot replace the view in between
+        self._prepare()
+        self.connection.execute(
+            f"CREATE OR REPLACE VIEW {RIDERS_VIEW} AS "
+            f"SELECT * FROM {self._reader(paths)}"
+        )
+        return self.connection.execute(sql, params or [])
+
+    def _prepare(self) -> None:
+        if self.root.startswith("s3://"):
+            self._configure_s3()
+
+    def _cached(self, key: tuple, compute: Callable, *args):
+        # one lock for the cache and the connection - compute runs queries under it
+        with self._lock:
+            now = self.clock()
+            entry = self._cache.get(key)
+            if entry is None or entry[0] <= now:
+                entry = (now + self.cache_ttl, compute(*args))
+                self._cache[key] = entry
+            return entry[1]
+
+    def _list(self, gp_classes: tuple[str, ...]) -> list[tuple[str, str, str]]:
+        filename = f"riders.{self.file_format}"
+        if self.root.startswith("s3://"):
+            partitions = self._list_s3(gp_classes, filename)
+        else:
+            partitions = [
+                (gp_class, snapshot_date, path)
+                for gp_class in gp_classes
+                if os.path.isdir(os.path.join(self.root, gp_class))
+                for snapshot_date in os.listdir(os.path.join(self.root, gp_class))
+                for path in [os.path.join(self.root, gp_class, snapshot_date, filename)]
+                if os.path.isfile(path)
+            ]
+        logger.info("Found %d riders tables under '%s'", len(partitions), self.root)
+        return sorted(partitions)
+
+    def _list_s3(
+        self, gp_classes: tuple[str, ...], filename: str
+    ) -> list[tuple[str, str, str]]:
+        from .cloud.aws_s3 import get_s3_client
+
+        bucket_name, _, prefix = self.root.removeprefix("s3://").partition("/")
+        paginator = get_s3_client().get_paginator("list_objects_v2")
+        partitions = []
+        for gp_class in gp_classes:
+            # only the keys of the selected classes are listed
+            class_prefix = f"{prefix}/{gp_class}/" if prefix else f"{gp_class}/"
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=class_prefix):
+                for item in page.get("Contents", []):
+                    # keys are laid out as {prefix}/{class}/{date}/riders.{format}
+                    snapshot_date, _, name = item["Key"][len(class_prefix) :].partition(
+                        "/"
+                    )
+                    if name == filename:
+                        path = f"s3://{bucket_name}/{item['Key']}"
+                        partitions.append((gp_class, snapshot_date, path))
+        return partitions
+
+    def _reader(self, paths: list[str]) -> str:
+        files = "[" + ", ".join(_quote(path) for path in paths) + "]"
+        if self.file_format == "csv":
+            return f"read_csv_auto({files}, header = true, union_by_name = true)"
+        return f"read_parquet({files}, union_by_name = true)"
+
+    def _configure_s3(self) -> None:
+        from .cloud.aws_s3 import get_boto3_session
+
+        if not self._httpfs_loaded:
+            try:
+                self.connection.execute("LOAD httpfs")
+            except duckdb.Error as err:
+                raise RuntimeError(
+                    "The httpfs extension of DuckDB is not installed - install it when "
+                    "the image is built (see Dockerfile)."
+                ) from err
+            self._httpfs_loaded = True
+
+        # read the tables with the current credentials of the "s3_conn" connection -
+        # boto3 refreshes temporary credentials before they expire, a copy does not
+        session = get_boto3_session()
+        credentials = session.get_credentials().get_frozen_credentials()
+        settings = {
+            "s3_region": session.region_name or "us-east-1",
+            "s3_access_key_id": credentials.access_key,
+            "s3_secret_access_key": credentials.secret_key,
+            "s3_session_token": credentials.token or "",
+        }
+        for name, value in settings.items():
+            self.connection.execute(f"SET {name} = {_quote(value)}")
+
+
+def _quote(value: str) -> str:
+    # SQL string literal
+    return "'" + value.replace("'", "''") + "'"
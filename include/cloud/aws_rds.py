@@ -1,53 +1,289 @@
-import json
-
-
-def transformed_data_to_rds() -> None:
-    # download folder of transformed JSON files into temp_dir
-    rider_json_files = []
-
-    # if there are any json files in temp_dir
-    if rider_json_files:
-        # loop through files in temp_dir
-        for json_file in rider_json_files:
-            # open JSON file
-            with open(json_file, "r") as f:
-                # load JSON file into JSON object
-                data = json.load(f)
-
-            # determine the GP class by the json_file
-            if "motogp" in json_file:
-                gp_class = "MOTOGP"
-            elif "moto2" in json_file:
-                gp_class = "MOTO2"
-            elif "moto3" in json_file:
-                gp_class = "MOTO3"
-            elif "motoe" in json_file:
-                gp_class = "MOTOE"
-            else:
-                # raise ValueError
+from airflow.hooks.base import BaseHook
+import mysql.connector
+import pandas as pd
+
+from typing import Literal
+import logging
+
+from .aws_s3 import s3_to_df
+from ..registry import parse_partition
+from .. import telemetry
+
+# logger for the load stage
+logger = logging.getLogger(__name__)
+
+# columns of the riders table, in load order
+RIDER_COLUMNS = (
+    "rider_name",
+    "hero_hashtag",
+    "race_number",
+    "team",
+    "bike",
+    "gp_class",
+    "representing_country",
+    "place_of_birth",
+    "date_of_birth",
+    "height",
+    "weight",
+    "snapshot_date",
+)
+# columns identifying one rider snapshot - a rerun of the same day updates the same rows
+KEY_COLUMNS = ("rider_name", "gp_class", "snapshot_date")
+
+# table of daily rider snapshots (valid for both MySQL and SQLite)
+CREATE_RIDERS_TABLE = """
+CREATE TABLE IF NOT EXISTS riders (
+    rider_name VARCHAR(100) NOT NULL,
+    hero_hashtag VARCHAR(20) NOT NULL,
+    race_number TINYINT NOT NULL,
+    team VARCHAR(100),
+    bike VARCHAR(50),
+    gp_class VARCHAR(10) NOT NULL,
+    representing_country CHAR(2) NOT NULL,
+    place_of_birth VARCHAR(100),
+    date_of_birth DATE,
+    height SMALLINT,
+    weight SMALLINT,
+    snapshot_date DATE NOT NULL,
+    PRIMARY KEY (rider_name, gp_class, snapshot_date)
+)
+"""
+
+# riders removed from the riders page, on the date of the first snapshot without them
+CREATE_RIDER_REMOVALS_TABLE = """
+CREATE TABLE IF NOT EXISTS rider_removals (
+    rider_name VARCHAR(100) NOT NULL,
+    gp_class VARCHAR(10) NOT NULL,
+    snapshot_date DATE NOT NULL,
+    PRIMARY KEY (rider_name, gp_class, snapshot_date)
+)
+"""
+
+# statements that differ between the RDS database and the local stand-in
+DIALECTS = {
+    "mysql": {
+        "placeholder": "%s",
+        "create_staging": "CREATE TEMPORARY TABLE riders_staging LIKE riders",
+        # a plain DROP TABLE commits implicitly and could drop a permanent table
+        "drop_staging": "DROP TEMPORARY TABLE IF EXISTS riders_staging",
+        "merge": "INSERT INTO riders ({columns}) SELECT {columns} FROM riders_staging "
+        "ON DUPLICATE KEY UPDATE {updates}",
+        "update": "{column} = VALUES({column})",
+        "insert_removal": "INSERT IGNORE INTO rider_removals "
+        "(rider_name, gp_class, snapshot_date) VALUES (%s, %s, %s)",
+    },
+    "sqlite": {
+        "placeholder": "?",
+        "create_staging": "CREATE TEMP TABLE riders_staging AS SELECT * FROM riders WHERE 0",
+        "drop_staging": "DROP TABLE IF EXISTS temp.riders_staging",
+        # "WHERE true" removes the parsing ambiguity between a join and ON CONFLICT
+        "merge": "INSERT INTO riders ({columns}) SELECT {columns} FROM riders_staging "
+        "WHERE true ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+        "update": "{column} = excluded.{column}",
+        "insert_removal": "INSERT OR IGNORE INTO rider_removals "
+        "(rider_name, gp_class, snapshot_date) VALUES (?, ?, ?)",
+    },
+}
+
+
+def get_rds_connection():
+    """Open a connection to the RDS MySQL database of the "rds_conn" connection.
+
+    Returns:
+        mysql.connector.MySQLConnection: The database connection
+    """
+    # get connection details from airflow instance connections
+    conn = BaseHook.get_connection("rds_conn")
+    return mysql.connector.connect(
+        host=conn.host,
+        port=conn.port or 3306,
+        user=conn.login,
+        password=conn.password,
+        database=conn.schema,
+    )
+
+
+def df_to_rows(df: pd.DataFrame, columns: tuple = RIDER_COLUMNS) -> list[tuple]:
+    """Convert a transformed rider table to database rows.
+
+    Args:
+        df (pd.DataFrame): The riders of a GP class (see riders_to_frame)
+        columns (tuple): The columns of the rows, in order
+
+    Returns:
+        list[tuple]: One tuple per rider with the values of columns (NULLs as None)
+    """
+    # missing values (pd.NA/NaN/NaT) become None
+    values = df[list(columns)].astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def load_riders(
+    connection, rows: list[tuple], dialect: Literal["mysql", "sqlite"] = "mysql"
+) -> int:
+    """Bulk load riders into the riders table with a staging table and an upsert.
+
+    The rows are inserted into a temporary staging table with a single batched
+    statement, then merged into the riders table keyed on KEY_COLUMNS, so loading the
+    same snapshot twice updates rows instead of duplicating them.
+
+    Args:
+        connection: The DB-API connection to the database
+        rows (list[tuple]): The values of RIDER_COLUMNS for each rider
+        dialect (Literal): The SQL dialect of the database
+
+    Returns:
+        int: The number of riders loaded
+    """
+    sql = DIALECTS[dialect]
+    columns = ", ".join(RIDER_COLUMNS)
+    placeholders = ", ".join([sql["placeholder"]] * len(RIDER_COLUMNS))
+    # every non-key column is overwritten by the staged value
+    updates = ", ".join(
+        sql["update"].format(column=column)
+        for column in RIDER_COLUMNS
+        if column not in KEY_COLUMNS
+    )
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_RIDERS_TABLE)
+        cursor.execute(sql["drop_staging"])
+        cursor.execute(sql["create_staging"])
+        # one batched insert for every rider of the class
+        cursor.executemany(
+            f"INSERT INTO riders_staging ({columns}) VALUES ({placeholders})", rows
+        )
+        # merge the staged riders into the riders table
+        cursor.execute(
+            sql["merge"].format(
+                columns=columns, keys=", ".join(KEY_COLUMNS), updates=updates
+            )
+        )
+        cursor.execute(sql["drop_staging"])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return len(rows)
+
+
+def load_removals(
+    connection, rows: list[tuple], dialect: Literal["mysql", "sqlite"] = "mysql"
+) -> int:
+    """Record riders removed from the riders page in the rider_removals table.
+
+    Loading the same removals twice keeps one row per rider and date.
+
+    Args:
+        connection: The DB-API connection to the database
+        rows (list[tuple]): The rider name, GP class and snapshot date of each removal
+        dialect (Literal): The SQL dialect of the database
+
+    Returns:
+        int: The number of removals loaded
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_RIDER_REMOVALS_TABLE)
+        cursor.executemany(DIALECTS[dialect]["insert_removal"], rows)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return len(rows)
+
+
+def transformed_data_to_rds(
+    keys: list[str],
+    bucket_name: str,
+    connection=None,
+    dialect: Literal["mysql", "sqlite"] = "mysql",
+) -> dict[str, int]:
+    """Load the transformed rider tables from S3 into the RDS riders table.
+
+    The riders table holds one row per rider and snapshot date loaded. Full tables load
+    every rider of the day, so each date is a complete roster. Change tables
+    (incremental mode) only load the riders inserted or updated that day, so a rider's
+    values on a date are their latest row at or before it, and their removed riders are
+    recorded in rider_removals on the date they left the riders page: a rider is listed
+    on a date unless they have a removal at or before it more recent than their latest
+    row.
+
+    Args:
+        keys (list[str]): Key paths to the transformed tables in S3 (one per GP class) -
+            full tables or change tables
+        bucket_name (str): AWS S3 bucket holding the tables
+        connection (optional): The DB-API connection to use (defaults to "rds_conn")
+        dialect (Literal): The SQL dialect of the connection
+
+    Raises:
+        ValueError: If no keys were given, or a key is not in a GP class partition or
+            holds riders of another GP class
+
+    Returns:
+        dict[str, int]: The number of riders (and removals) loaded from each key
+    """
+    # if there are no transformed tables to load
+    if not keys:
+        raise ValueError("Zero transformed rider tables were given to load.")
+
+    # open the RDS connection if none was given
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_rds_connection()
+
+    loaded = {}
+    try:
+        # loop through the transformed table of each GP class
+        for key in keys:
+            # the GP class and date partition of the table
+            partition = parse_partition(key)
+            # read the table - the GP class and snapshot date are columns of the table
+            df = s3_to_df(key, bucket_name)
+            # removed riders of a change table are recorded apart from the riders
+            removed = df.iloc[0:0]
+            if "change_type" in df:
+                removed = df[df["change_type"] == "removed"]
+                df = df[df["change_type"] != "removed"]
+
+            if not (
+                pd.concat([df["gp_class"], removed["gp_class"]])
+                == partition.gp_class.name
+            ).all():
                 raise ValueError(
-                    f"The JSON file '{json_file}' is not a GP class or is not properly named."
+                    f"The table '{key}' holds riders of another GP class than "
+                    f"'{partition.gp_class.name}'."
                 )
 
-            # loop through riders in data
-            for rider in data:
-                # get key values from rider (json object)
-                value = (
-                    data[rider]["rider_name"],
-                    data[rider]["hero_hashtag"],
-                    data[rider]["race_number"],
-                    data[rider]["team"],
-                    data[rider]["bike"],
-                    gp_class,
-                    data[rider]["representing_country"],
-                    data[rider]["place_of_birth"],
-                    data[rider]["date_of_birth"],
-                    data[rider]["height"],
-                    data[rider]["weight"],
+            # load every rider of the class in one batch
+            with telemetry.timer("rds.load_class"):
+                riders = load_riders(connection, df_to_rows(df), dialect)
+                removals = load_removals(
+                    connection,
+                    df_to_rows(removed, columns=KEY_COLUMNS),
+                    dialect,
                 )
+            loaded[key] = riders + removals
+            telemetry.incr("rds.rows_loaded", riders)
+            telemetry.incr("rds.removals_loaded", removals)
+            logger.info(
+                "Loaded %d %s riders (%d removed) of %s from '%s'",
+                riders,
+                partition.gp_class.name,
+                removals,
+                partition.snapshot_date,
+                key,
+            )
+    finally:
+        if owns_connection:
+            connection.close()
 
-            # use Airflow operator (?) to send data to RDS table
-
-    # if there are no json files found in directory
-    else:
-        raise ValueError(f"Zero JSON files have been found in {rider_json_files}")
\ No newline at end of file
+    return loaded
@@ -1,14 +1,187 @@
 from airflow.providers.amazon.aws.hooks.base_aws import AwsBaseHook
 from airflow.providers.amazon.aws.hooks.s3 import S3Hook
 from airflow.exceptions import AirflowException
-import awswrangler as wr
-import pandas as pd
+from botocore.config import Config
+import boto3
 
-from typing import Literal
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator, Literal
 import tempfile
+import logging
 import zipfile
+import shutil
+import time
 import json
-import os
+import io
+
+from ..registry import BUCKET
+from .. import telemetry
+
+# track_s3_requests is re-exported for the callers of the S3 helpers
+from ..telemetry import s3_request_counts, track_s3_requests
+
+# pandas and awswrangler are only imported by the table helpers that use them
+if TYPE_CHECKING:
+    import pandas as pd
+
+# logger for the S3 helpers
+logger = logging.getLogger(__name__)
+
+# size of the botocore connection pool of the shared S3 client - matches the number of
+# parts/ranges the helpers may have in flight at once
+S3_MAX_POOL_CONNECTIONS = 32
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """Write-only file object that streams its bytes into an S3 multipart upload.
+
+    At most one part is buffered in memory - as soon as `part_size` bytes have been
+    written, the part is uploaded and the buffer is released.
+
+    Args:
+        client: The boto3 S3 client
+        bucket_name (str): AWS S3 bucket where the object will be uploaded to
+        key (str): Path to the uploaded object in S3
+        part_size (int): The size of each uploaded part in bytes (S3 minimum is 5 MiB)
+    """
+
+    def __init__(
+        self, client, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._parts = []
+        self._position = 0
+        # start the multipart upload
+        self._upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=key)[
+            "UploadId"
+        ]
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        # zipfile needs the stream position to build the central directory
+        return self._position
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        # upload every full part that is buffered
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def close(self) -> None:
+        """Upload the last part and complete the multipart upload."""
+        if not self.closed:
+            # the last part may be smaller than the minimum part size
+            if self._buffer or not self._parts:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        super().close()
+
+    def abort(self) -> None:
+        """Abort the multipart upload and discard the uploaded parts."""
+        if not self.closed:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id
+            )
+            self._buffer.clear()
+        super().close()
+
+    def _upload_part(self, data: bytes) -> None:
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+
+class S3ZipWriter:
+    """Zip file streamed into an S3 multipart upload, one entry at a time.
+
+    Entries are compressed and uploaded part by part as they are written, so memory use
+    is bounded by one part and nothing is staged on local disk.
+
+    Args:
+        key (str): The file path of the zip file (key) in the S3 bucket
+        bucket_name (str): AWS S3 bucket where the zip file will be uploaded to
+        codec (Literal): "deflate" for standard zip entries, or "zstd" for zstandard
+            compressed entries stored with a ".zst" suffix
+        compresslevel (int, optional): The compression level of the codec
+    """
+
+    def __init__(
+        self,
+        key: str,
+        bucket_name: str = BUCKET,
+        codec: Literal["deflate", "zstd"] = "deflate",
+        compresslevel: int = None,
+    ) -> None:
+        # zstd entries are compressed before being added to the zip file
+        if codec == "zstd":
+            import zstandard
+
+            self._zstd = zstandard.ZstdCompressor(level=compresslevel or 3)
+            compression, self._suffix = zipfile.ZIP_STORED, ".zst"
+        else:
+            self._zstd = None
+            compression, self._suffix = zipfile.ZIP_DEFLATED, ""
+
+        # open the multipart upload
+        self._writer = S3MultipartWriter(
+            client=get_s3_client(), bucket_name=bucket_name, key=key
+        )
+        # open zip file - entries are written straight into the upload
+        self._zipf = zipfile.ZipFile(
+            self._writer, "w", compression, compresslevel=compresslevel
+        )
+
+    def __enter__(self) -> "S3ZipWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, filename: str, content: bytes) -> None:
+        """Compress and add an entry to the zip file.
+
+        Args:
+            filename (str): The name of the entry (the codec suffix is appended)
+            content (bytes): The content of the entry
+        """
+        if self._zstd:
+            content = self._zstd.compress(content)
+        # write the bytes to the zip file
+        self._zipf.writestr(filename + self._suffix, content)
+
+    def close(self) -> None:
+        """Write the central directory and complete the upload."""
+        self._zipf.close()
+        self._writer.close()
+
+    def abort(self) -> None:
+        """Abort the upload - no incomplete multipart upload is left behind."""
+        self._writer.abort()
 
 
 def zip_to_s3_upload(
@@ -16,46 +189,57 @@ def zip_to_s3_upload(
     iterative_filename: str,
     _list: list,
     _type: Literal["dict", "response"],
+    codec: Literal["deflate", "zstd"] = "deflate",
+    compresslevel: int = None,
+    bucket_name: str = BUCKET,
 ):
-    """Construct a Zipfile from list and upload to S3 bucket.
+    """Stream a Zipfile built from a list into an S3 multipart upload.
+
+    Entries are compressed and uploaded part by part, so memory use is bounded by one
+    part and nothing is staged on local disk.
 
     Args:
         key_name (str): The file path of the zip file (key) in the S3 bucket
         iterative_filename (str): The file name of each individual file in the zip file
         _list (list): The files to be zipped
         _type (Literal): The data type of the files in _list
+        codec (Literal): "deflate" for standard zip entries, or "zstd" for zstandard
+            compressed entries stored with a ".zst" suffix
+        compresslevel (int, optional): The compression level of the codec
+        bucket_name (str): AWS S3 bucket where the zip file will be uploaded to
 
     Raises:
-        ValueError: If the value passed to the _list parameter is empty
+        ValueError: If the value passed to the _list parameter is empty, or _type is not
+            "dict" or "response"
     """
 
+    # check the data type before the multipart upload is started
+    if _type not in ("dict", "response"):
+        raise ValueError(
+            f"Unknown data type '{_type}' passed to the function parameter '_type'. "
+            "Accepted types: 'dict', 'response'."
+        )
+
     # check that the object_list is NOT empty
     if _list:
         # drop None elements in _list
         _list = [elem for elem in _list if elem is not None]
 
-        # create temporary directory
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            # define zip file path in tmp_dir
-            zip_file_path = os.path.join(tmp_dir, "tmp_data.zip")
-            # open zip file
-            with zipfile.ZipFile(zip_file_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                # iterate over elements in _list
-                for i, data in enumerate(_list):
-                    # if the element data type is of "dict"
-                    if _type == "dict":
-                        # convert data (dict) to json string, then encode as bytes
-                        json_data_bytes = json.dumps(data).encode("utf-8")
-                        # write the JSON bytes to the zip file
-                        zipf.writestr(f"{iterative_filename}_{i}.json", json_data_bytes)
-                    # if the element data type is of "httpx.Response"
-                    elif _type == "response":
-                        zipf.writestr(f"{iterative_filename}_{i}.txt", data.content)
-
-            # upload zip_file to S3 bucket
-            upload_to_s3(
-                filepath=zip_file_path, key=key_name, bucket_name="motogp-data-project"
-            )
+        # the upload is aborted if an entry fails
+        with S3ZipWriter(key_name, bucket_name, codec, compresslevel) as zipf:
+            # iterate over elements in _list
+            for i, data in enumerate(_list):
+                # if the element data type is of "dict"
+                if _type == "dict":
+                    # convert data (dict) to json string, then encode as bytes
+                    filename = f"{iterative_filename}_{i}.json"
+                    content = json.dumps(data).encode("utf-8")
+                # if the element data type is of "httpx.Response"
+                elif _type == "response":
+                    filename = f"{iterative_filename}_{i}.txt"
+                    content = data.content
+
+                zipf.write(filename, content)
 
     # if object_list IS empty
     else:
@@ -73,69 +257,322 @@ def upload_to_s3(filepath: str, key: str, bucket_name: str) -> None:
         bucket_name (str): AWS S3 bucket where the file will be uploaded to
     """
 
-    # get hook from airflow instance connections
-    hook = S3Hook("s3_conn")
-    # upload file to S3
-    hook.load_file(filename=filepath, key=key, bucket_name=bucket_name, replace=True)
+    # upload file to S3 with the shared client
+    get_s3_client().upload_file(Filename=filepath, Bucket=bucket_name, Key=key)
 
 
 def download_from_s3(key: str, bucket_name: str, local_path: str) -> str:
-    # get hook from airflow instance connections
-    hook = S3Hook("s3_conn")
-
-    # check if key exists in bucket
-    key_exists = S3Hook.check_for_key(hook, key=key, bucket_name=bucket_name)
-    if key_exists is True:
-        # download file from S3 bucket to local
-        downloaded_key_path = hook.download_file(
-            key=key, bucket_name=bucket_name, local_path=local_path
-        )
-    else:
+    """Download a file from an AWS S3 bucket into a local directory.
+
+    Args:
+        key (str): Path to the file in S3
+        bucket_name (str): AWS S3 bucket holding the file
+        local_path (str): Local directory the file is downloaded to
+
+    Raises:
+        AirflowException: If the key does not exist in the bucket
+
+    Returns:
+        str: The local path of the downloaded file
+    """
+    client = get_s3_client()
+
+    # the GET itself tells if the key exists - no HEAD round trip beforehand
+    try:
+        response = client.get_object(Bucket=bucket_name, Key=key)
+    except client.exceptions.NoSuchKey as err:
         # raise an AirflowException
         raise AirflowException(
             f"The key '{key}' does not exist in the AWS S3 bucket '{bucket_name}'"
-        )
+        ) from err
+
+    # stream the body into a temporary file in local_path (same as S3Hook.download_file)
+    with tempfile.NamedTemporaryFile(
+        dir=local_path, prefix="airflow_tmp_", delete=False
+    ) as f:
+        shutil.copyfileobj(response["Body"], f)
 
     # return the name of the file
-    return downloaded_key_path
+    return f.name
 
 
-def unzip_s3_key_to_list(key: str, bucket_name: str) -> list[str]:
-    # initialize list to store unzipped files as objects
-    unzipped_content = []
-
-    # create temporary directory
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        # download zip file in tmp_dir
-        zipped_filepath = download_from_s3(
-            key=key, bucket_name=bucket_name, local_path=f"{tmp_dir}/"
+class S3RangeReader(io.RawIOBase):
+    """Seekable read-only file object over an S3 object, backed by ranged GETs.
+
+    Only the block around the current position is held in memory, so a zip file can be
+    read member by member through its central directory without downloading it.
+
+    Args:
+        client: The boto3 S3 client
+        bucket_name (str): AWS S3 bucket holding the object
+        key (str): Path to the object in S3
+        block_size (int): The number of bytes fetched by each ranged GET
+
+    Raises:
+        AirflowException: If the key does not exist in the bucket
+        ClientError: If the object could not be read for another reason (ex. access)
+    """
+
+    def __init__(
+        self, client, bucket_name: str, key: str, block_size: int = 1024 * 1024
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.block_size = block_size
+        self._position = 0
+        self._block_start = 0
+        self._block = b""
+
+        try:
+            # fetch the last block - zip files are read from their end, and the
+            # Content-Range of the response gives the size of the object
+            response = client.get_object(
+                Bucket=bucket_name, Key=key, Range=f"bytes=-{block_size}"
+            )
+        except client.exceptions.ClientError as err:
+            # access, throttling and server errors are raised as they are
+            if err.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            raise AirflowException(
+                f"The key '{key}' does not exist in the AWS S3 bucket '{bucket_name}'"
+            ) from err
+        self.size = int(response["ContentRange"].rsplit("/", 1)[1])
+        self._block = response["Body"].read()
+        self._block_start = self.size - len(self._block)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.size + offset
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        # nothing left to read
+        if self._position >= self.size:
+            return 0
+
+        # fetch the block holding the current position if it is not buffered
+        offset = self._position - self._block_start
+        if not 0 <= offset < len(self._block):
+            self._fetch_block(self._position)
+            offset = 0
+
+        # copy as much of the buffered block as fits
+        data = self._block[offset : offset + len(buffer)]
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def _fetch_block(self, start: int) -> None:
+        end = min(start + self.block_size, self.size) - 1
+        response = self.client.get_object(
+            Bucket=self.bucket_name, Key=self.key, Range=f"bytes={start}-{end}"
         )
-        # unzip file
-        with zipfile.ZipFile(zipped_filepath, "r") as zipf:
-            # loop through files in zipf
-            for filename in zipf.namelist():
-                # open file
-                with zipf.open(filename) as file:
-                    # append file to unzipped_content
-                    unzipped_content.append(file.read().decode("utf-8"))
+        self._block = response["Body"].read()
+        self._block_start = start
+
+
+def iter_s3_zip_members(
+    key: str, bucket_name: str, decode: bool = False
+) -> Iterator[bytes | str]:
+    """Lazily yield the members of a zip file in S3, one at a time.
+
+    The zip file is streamed with ranged GETs and its central directory is used to read
+    each member on demand, so only one member is held in memory.
+
+    Args:
+        key (str): Path to the zip file in S3
+        bucket_name (str): AWS S3 bucket holding the zip file
+        decode (bool): Yield UTF-8 decoded strings instead of bytes
+
+    Yields:
+        bytes | str: The content of each member, in archive order
+    """
+    reader = S3RangeReader(client=get_s3_client(), bucket_name=bucket_name, key=key)
+    # open zip file - only the central directory is read here
+    with zipfile.ZipFile(io.BufferedReader(reader), "r") as zipf:
+        # loop through members in zipf
+        for info in zipf.infolist():
+            content = zipf.read(info)
+            # decompress zstd entries
+            if info.filename.endswith(".zst"):
+                import zstandard
+
+                content = zstandard.ZstdDecompressor().decompress(content)
+
+            yield content.decode("utf-8") if decode else content
+
+
+def unzip_s3_key_to_list(key: str, bucket_name: str) -> list[str]:
+    """Read every member of a zip file in S3 into a list of strings.
+
+    Args:
+        key (str): Path to the zip file in S3
+        bucket_name (str): AWS S3 bucket holding the zip file
+
+    Returns:
+        list[str]: The decoded content of each member, in archive order
+    """
+    return list(iter_s3_zip_members(key, bucket_name, decode=True))
+
+
+@lru_cache(maxsize=1)
+def get_boto3_session() -> boto3.Session:
+    """Get the boto3 session of the "s3_conn" connection, created once per process.
+
+    The Airflow connection is only looked up on the first call. Every S3 call made by
+    the clients of the session is counted in `s3_request_counts` and timed by the
+    telemetry of the task.
+
+    Returns:
+        boto3.Session: The cached boto3 session
+    """
+    # get hook from airflow instance connections
+    session = S3Hook("s3_conn").get_session()
+    # clients created from the session (including awswrangler's) inherit the handler
+    session.events.register("before-call.s3", _count_s3_request)
+    session.events.register("after-call.s3", _time_s3_request)
+    return session
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Get the S3 client shared by the helpers, created once per process.
+
+    The client is created lazily on first use and reused by every task run in the same
+    worker process, with a connection pool sized for concurrent part/range requests.
+
+    Returns:
+        botocore.client.S3: The cached S3 client
+    """
+    return get_boto3_session().client(
+        "s3", config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+    )
+
 
-    # return the list of files as objects in a list
-    return unzipped_content
+def _count_s3_request(model, context: dict = None, **kwargs) -> None:
+    s3_request_counts[model.name] += 1
+    # the request context is handed to the after-call handler of the same call
+    if telemetry.ENABLED and context is not None:
+        context["telemetry_start"] = time.perf_counter()
 
 
-def dict_to_df_in_s3(data: dict, key: str, bucket_name: str) -> None:
-    # convert dict to dataframe
-    df = pd.DataFrame.from_dict(data, orient="index")
+def _time_s3_request(model, parsed: dict, context: dict = None, **kwargs) -> None:
+    start = (context or {}).get("telemetry_start")
+    if start is None:
+        return
+    telemetry.timing(f"s3.{model.name}.latency", time.perf_counter() - start)
+    # the size of downloaded objects and ranges
+    if model.name == "GetObject":
+        telemetry.observe("s3.bytes_downloaded", parsed.get("ContentLength", 0))
 
+
+def df_to_s3(
+    df: "pd.DataFrame",
+    key: str,
+    bucket_name: str,
+    file_format: Literal["parquet", "csv"] = "parquet",
+    dtype: dict[str, str] = None,
+) -> None:
+    """Write a DataFrame to an AWS S3 bucket in a single PUT.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to upload
+        key (str): Path to the uploaded file in S3
+        bucket_name (str): AWS S3 bucket where the file will be uploaded to
+        file_format (Literal): Write the file as Parquet (typed, columnar) or CSV
+        dtype (dict[str, str], optional): Parquet (Athena) types forced on some columns
+
+    Raises:
+        AirflowException: If the upload failed
+    """
+    import awswrangler as wr
+
+    path = f"s3://{bucket_name}/{key}"
+    # count the rows written to the bucket
+    telemetry.incr("s3.rows_written", len(df))
     try:
-        # get hook from airflow instance connections
-        hook = S3Hook("s3_conn")
-        # upload dataframe to S3 bucket
-        wr.s3.to_csv(
-            df=df,
-            path=f"s3://{bucket_name}/{key}",
-            boto3_session=hook.get_session(),
-        )
-    except:
+        if file_format == "parquet":
+            wr.s3.to_parquet(
+                df=df,
+                path=path,
+                index=False,
+                dtype=dtype,
+                boto3_session=get_boto3_session(),
+            )
+        else:
+            wr.s3.to_csv(
+                df=df, path=path, index=False, boto3_session=get_boto3_session()
+            )
+    except Exception as err:
         # raise AirflowException
-        raise AirflowException(f"FAILED Pandas DataFrame Upload - '{key}'")
+        raise AirflowException(f"FAILED Pandas DataFrame Upload - '{key}'") from err
+
+
+def s3_to_df(key: str, bucket_name: str) -> "pd.DataFrame":
+    """Read a table written by df_to_s3 from an AWS S3 bucket.
+
+    Args:
+        key (str): Path to the table in S3 (the extension selects CSV or Parquet)
+        bucket_name (str): AWS S3 bucket holding the table
+
+    Returns:
+        pd.DataFrame: The table
+    """
+    import awswrangler as wr
+
+    path = f"s3://{bucket_name}/{key}"
+    if key.endswith(".csv"):
+        return wr.s3.read_csv(path, boto3_session=get_boto3_session())
+    return wr.s3.read_parquet(path, boto3_session=get_boto3_session())
+
+
+def json_to_s3(data: dict | list, key: str, bucket_name: str) -> None:
+    """Write a JSON document to an AWS S3 bucket.
+
+    Args:
+        data (dict | list): The JSON-serializable document
+        key (str): Path to the uploaded file in S3
+        bucket_name (str): AWS S3 bucket where the file will be uploaded to
+    """
+    get_s3_client().put_object(
+        Bucket=bucket_name, Key=key, Body=json.dumps(data, indent=2).encode("utf-8")
+    )
+
+
+def find_previous_partition(prefix: str, before: str, bucket_name: str) -> str | None:
+    """Find the latest date partition under a prefix that is older than a given date.
+
+    Partitions are laid out as `{prefix}/{YYYY-MM-DD}/` so they sort chronologically.
+
+    Args:
+        prefix (str): The prefix holding the date partitions (see transformed_partition)
+        before (str): The date in the format YYYY-MM-DD the partition must be older than
+        bucket_name (str): AWS S3 bucket holding the partitions
+
+    Returns:
+        str | None: The date of the previous partition, or None if there is none
+    """
+    import awswrangler as wr
+
+    directories = wr.s3.list_directories(
+        f"s3://{bucket_name}/{prefix.rstrip('/')}/", boto3_session=get_boto3_session()
+    )
+    # the last path segment of each directory is its date
+    dates = [directory.rstrip("/").rsplit("/", 1)[-1] for directory in directories]
+    dates = [partition for partition in dates if partition < before]
+    return max(dates) if dates else None
@@ -0,0 +1,320 @@
+from airflow.exceptions import AirflowException
+from botocore.exceptions import ClientError
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from collections import deque
+from typing import Iterator, Literal
+import hashlib
+import logging
+import json
+import gzip
+
+from .aws_s3 import (
+    find_previous_partition,
+    get_s3_client,
+    iter_s3_zip_members,
+    json_to_s3,
+)
+from ..registry import (
+    BUCKET,
+    raw_body_key,
+    raw_manifest_key,
+    raw_manifest_partition,
+)
+from .. import telemetry
+
+# logger for the raw html store
+logger = logging.getLogger(__name__)
+
+# number of bodies uploaded or downloaded at the same time - stays below the connection
+# pool of the shared S3 client
+RAW_STORE_WORKERS = 16
+
+
+def body_digest(content: bytes) -> str:
+    """Get the content address of a page body.
+
+    Args:
+        content (bytes): The raw body of the page
+
+    Returns:
+        str: The SHA-256 hex digest of the body
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def compress_body(content: bytes, codec: Literal["deflate", "zstd"]) -> bytes:
+    """Compress a page body with the codec of the store.
+
+    Args:
+        content (bytes): The raw body of the page
+        codec (Literal): "deflate" (gzip) or "zstd"
+
+    Returns:
+        bytes: The compressed body
+    """
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(content)
+    return gzip.compress(content)
+
+
+def decompress_body(content: bytes, key: str) -> bytes:
+    """Decompress a body read from the store, using the extension of its key.
+
+    Args:
+        content (bytes): The stored body
+        key (str): The S3 key of the body
+
+    Returns:
+        bytes: The raw body of the page
+    """
+    if key.endswith(".zst"):
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(content)
+    return gzip.decompress(content)
+
+
+def read_manifest(key: str, bucket_name: str = BUCKET) -> dict:
+    """Read a daily manifest of the raw store.
+
+    Args:
+        key (str): The S3 key of the manifest
+        bucket_name (str): AWS S3 bucket holding the store
+
+    Raises:
+        AirflowException: If there is no manifest under the key
+
+    Returns:
+        dict: The manifest (the GP class, the date, the codec and the pages)
+    """
+    try:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=key)
+    except ClientError as err:
+        raise AirflowException(f"No raw html manifest at '{key}'.") from err
+    return json.loads(response["Body"].read())
+
+
+def stored_digests(
+    gp_class: str,
+    before: str,
+    codec: Literal["deflate", "zstd"],
+    bucket_name: str = BUCKET,
+) -> set[str]:
+    """Get the digests already stored by the previous manifest of a GP class.
+
+    Args:
+        gp_class (str): The name of the GP class
+        before (str): The date in the format YYYY-MM-DD the manifest must be older than
+        codec (Literal): The codec the bodies must be stored with
+        bucket_name (str): AWS S3 bucket holding the store
+
+    Returns:
+        set[str]: The digests of the bodies of the previous manifest (empty if there is
+            none, or if its bodies were stored with another codec)
+    """
+    previous_date = find_previous_partition(
+        raw_manifest_partition(gp_class), before=before, bucket_name=bucket_name
+    )
+    if previous_date is None:
+        return set()
+    manifest = read_manifest(raw_manifest_key(gp_class, previous_date), bucket_name)
+    if manifest["codec"] != codec:
+        return set()
+    return {page["sha256"] for page in manifest["pages"]}
+
+
+class RawStoreWriter:
+    """Daily snapshot of the rider pages of a GP class in the content-addressed raw store.
+
+    Each body is stored once under its digest - bodies already stored (ex. listed by the
+    previous manifest) are not uploaded again, so the store grows with the pages that
+    changed. The snapshot itself is a manifest of (URL, digest, fetch time) written on
+    close. New bodies are uploaded in worker threads while pages are still written.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+        codec (Literal): The compression codec of the stored bodies
+        bucket_name (str): AWS S3 bucket holding the store
+        known_digests (set[str], optional): The digests already stored (ex. stored_digests)
+        workers (int): The number of bodies uploaded at the same time
+    """
+
+    def __init__(
+        self,
+        gp_class: str,
+        snapshot_date: str,
+        codec: Literal["deflate", "zstd"] = "deflate",
+        bucket_name: str = BUCKET,
+        known_digests: set[str] = None,
+        workers: int = RAW_STORE_WORKERS,
+    ) -> None:
+        self.gp_class = gp_class
+        self.snapshot_date = snapshot_date
+        self.codec = codec
+        self.bucket_name = bucket_name
+        self.key = raw_manifest_key(gp_class, snapshot_date)
+        self.pages = []
+        self._known = set(known_digests or ())
+        self._uploads: list[Future] = []
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self) -> "RawStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, url: str, content: bytes, fetched_at: datetime = None) -> str:
+        """Add a page to the snapshot, uploading its body if it is not stored yet.
+
+        Args:
+            url (str): The URL of the page
+            content (bytes): The raw body of the page
+            fetched_at (datetime, optional): When the page was fetched (defaults to now)
+
+        Returns:
+            str: The digest of the body
+        """
+        digest = body_digest(content)
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        self.pages.append(
+            {"url": url, "sha256": digest, "fetched_at": fetched_at.isoformat()}
+        )
+        # upload each new body once - identical pages of the snapshot share it
+        if digest in self._known:
+            telemetry.incr("raw_store.bodies_reused")
+        else:
+            self._known.add(digest)
+            self._uploads.append(self._executor.submit(self._upload, digest, content))
+        return digest
+
+    def close(self) -> str:
+        """Wait for the uploads, then write the manifest of the snapshot.
+
+        Raises:
+            AirflowException: If a body failed to upload (no manifest is written)
+
+        Returns:
+            str: The S3 key of the manifest
+        """
+        try:
+            for upload in self._uploads:
+                upload.result()
+        except Exception as err:
+            raise AirflowException(
+                f"FAILED raw html upload of {self.gp_class} {self.snapshot_date}"
+            ) from err
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+        manifest = {
+            "gp_class": self.gp_class,
+            "snapshot_date": self.snapshot_date,
+            "codec": self.codec,
+            "pages": self.pages,
+        }
+        # the manifest is written last - a snapshot is only visible once complete
+        json_to_s3(manifest, self.key, self.bucket_name)
+        logger.info(
+            "Stored %d pages of %s (%d new bodies) in '%s'",
+            len(self.pages),
+            self.gp_class,
+            len(self._uploads),
+            self.key,
+        )
+        return self.key
+
+    def abort(self) -> None:
+        """Stop the uploads - bodies already uploaded are reused by the next run."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _upload(self, digest: str, content: bytes) -> None:
+        body = compress_body(content, self.codec)
+        get_s3_client().put_object(
+            Bucket=self.bucket_name,
+            Key=raw_body_key(digest, self.codec),
+            Body=body,
+            ContentType="text/html",
+        )
+        telemetry.incr("raw_store.bodies_uploaded")
+        telemetry.observe("raw_store.uploaded_bytes", len(body))
+
+
+def iter_manifest_pages(
+    key: str,
+    bucket_name: str = BUCKET,
+    decode: bool = False,
+    workers: int = RAW_STORE_WORKERS,
+) -> Iterator[bytes | str]:
+    """Lazily yield the pages of a manifest, downloading the bodies in parallel.
+
+    At most `workers * 2` bodies are downloaded ahead of the consumer.
+
+    Args:
+        key (str): The S3 key of the manifest
+        bucket_name (str): AWS S3 bucket holding the store
+        decode (bool): Yield UTF-8 decoded strings instead of bytes
+        workers (int): The number of bodies downloaded at the same time
+
+    Yields:
+        bytes | str: The body of each page, in manifest order
+    """
+    manifest = read_manifest(key, bucket_name)
+    keys = (
+        raw_body_key(page["sha256"], manifest["codec"]) for page in manifest["pages"]
+    )
+
+    def download(body_key: str) -> bytes:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=body_key)
+        return decompress_body(response["Body"].read(), body_key)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for body_key in keys:
+            pending.append(executor.submit(download, body_key))
+            # bound the number of bodies held in memory
+            if len(pending) >= workers * 2:
+                content = pending.popleft().result()
+                yield content.decode("utf-8") if decode else content
+        while pending:
+            content = pending.popleft().result()
+            yield content.decode("utf-8") if decode else content
+
+
+def read_manifest_pages(key: str, bucket_name: str = BUCKET) -> list[str]:
+    """Read every page of a manifest into a list of strings.
+
+    Args:
+        key (str): The S3 key of the manifest
+        bucket_name (str): AWS S3 bucket holding the store
+
+    Returns:
+        list[str]: The decoded body of each page, in manifest order
+    """
+    return list(iter_manifest_pages(key, bucket_name, decode=True))
+
+
+def iter_raw_pages(
+    key: str, bucket_name: str = BUCKET, decode: bool = False
+) -> Iterator[bytes | str]:
+    """Lazily yield the rider pages of a daily snapshot, whatever its layout.
+
+    Args:
+        key (str): The S3 key of a manifest (".json") or of a zip archive (".zip")
+        bucket_name (str): AWS S3 bucket holding the snapshot
+        decode (bool): Yield UTF-8 decoded strings instead of bytes
+
+    Returns:
+        Iterator[bytes | str]: The body of each page, in snapshot order
+    """
+    if key.endswith(".json"):
+        return iter_manifest_pages(key, bucket_name, decode=decode)
+    return iter_s3_zip_members(key, bucket_name, decode=decode)
@@ -0,0 +1,231 @@
+from airflow.exceptions import AirflowException
+import httpx
+
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, NamedTuple
+import logging
+import sqlite3
+import zlib
+
+# logger for the backfill
+logger = logging.getLogger(__name__)
+
+# work queue of rider pages to fetch - one row per url, with the class and season it
+# was queued for
+CREATE_ITEMS_TABLE = """
+CREATE TABLE IF NOT EXISTS items (
+    gp_class TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT,
+    PRIMARY KEY (gp_class, season, url)
+)
+"""
+# rider pages are queued once whatever the class and season they were listed in
+CREATE_URL_INDEX = "CREATE INDEX IF NOT EXISTS items_url ON items (url)"
+
+
+class WorkItem(NamedTuple):
+    """A rider page of a GP class in a past season."""
+
+    gp_class: str
+    season: int
+    url: str
+
+
+def shard_of(item: WorkItem, num_shards: int) -> int:
+    """Assign a work item to a shard, stable across runs and processes.
+
+    The shard only depends on the URL, so a rider listed in several seasons always lands
+    in the same queue and is only fetched once.
+
+    Args:
+        item (WorkItem): The work item
+        num_shards (int): The number of shards of the queue
+
+    Returns:
+        int: The shard of the item, in [0, num_shards)
+    """
+    return zlib.crc32(item.url.encode("utf-8")) % num_shards
+
+
+def check_season_rosters(rosters: dict[int, dict[str, list[str]]], url: str) -> None:
+    """Check that the riders pages of the seasons are filtered by season.
+
+    A season filter the site ignores serves the current riders page for every season,
+    which would backfill the current riders under every past season.
+
+    Args:
+        rosters (dict[int, dict[str, list[str]]]): The rider URLs of each GP class,
+            by season
+        url (str): The URL template of the riders page of a season, for the error
+
+    Raises:
+        AirflowException: If two seasons list the same riders
+    """
+    seen = {}
+    for season, roster in rosters.items():
+        listing = frozenset(href for urls in roster.values() for href in urls)
+        if listing and listing in seen:
+            raise AirflowException(
+                f"Seasons {seen[listing]} and {season} list the same riders - "
+                f"'{url}' does not seem to filter the riders page by season."
+            )
+        seen[listing] = season
+
+
+class WorkQueue:
+    """Durable queue of backfill work items stored in a SQLite file.
+
+    Every status change is committed immediately, so the file is a checkpoint that can be
+    copied (ex. to S3) at any time and reopened to resume where a crashed run stopped.
+
+    Args:
+        path (str): The local path of the SQLite file (created if it does not exist)
+        max_attempts (int): The number of failed fetches after which an item is given up
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(CREATE_ITEMS_TABLE)
+        self.connection.execute(CREATE_URL_INDEX)
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        self.connection.close()
+
+    def add(self, items: list[WorkItem], num_shards: int = 1) -> int:
+        """Add work items to the queue, ignoring the URLs it already holds.
+
+        A rider's profile page is not season-specific, so only the first item of each
+        URL is queued (ex. the most recent season the rider was listed in).
+
+        Args:
+            items (list[WorkItem]): The work items
+            num_shards (int): The number of shards the items are spread over
+
+        Returns:
+            int: The number of new items
+        """
+        before = self.connection.total_changes
+        self.connection.executemany(
+            "INSERT INTO items (gp_class, season, url, shard) SELECT ?, ?, ?, ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM items WHERE url = ?)",
+            [(*item, shard_of(item, num_shards), item.url) for item in items],
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def pending(self, shard: int = None, limit: int = None) -> list[WorkItem]:
+        """Get the items still to fetch (pending, or failed with attempts left).
+
+        Args:
+            shard (int, optional): Only get the items of a shard
+            limit (int, optional): The maximum number of items
+
+        Returns:
+            list[WorkItem]: The items, in a stable order
+        """
+        query = (
+            "SELECT gp_class, season, url FROM items "
+            "WHERE status != 'done' AND attempts < ?"
+        )
+        params = [self.max_attempts]
+        if shard is not None:
+            query += " AND shard = ?"
+            params.append(shard)
+        query += " ORDER BY season, gp_class, url"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [WorkItem(*row) for row in self.connection.execute(query, params)]
+
+    def mark(self, items: list[WorkItem], status: str) -> None:
+        """Record the outcome of fetching work items.
+
+        Args:
+            items (list[WorkItem]): The work items
+            status (str): "done", or "failed" to count an attempt
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        self.connection.executemany(
+            "UPDATE items SET status = ?, attempts = attempts + ?, updated_at = ? "
+            "WHERE gp_class = ? AND season = ? AND url = ?",
+            [(status, int(status == "failed"), now, *item) for item in items],
+        )
+        self.connection.commit()
+
+    def progress(self, shard: int = None) -> dict[str, int]:
+        """Count the items of the queue by status.
+
+        Args:
+            shard (int, optional): Only count the items of a shard
+
+        Returns:
+            dict[str, int]: The number of items of each status
+        """
+        query = "SELECT status, COUNT(*) FROM items"
+        params = []
+        if shard is not None:
+            query += " WHERE shard = ?"
+            params.append(shard)
+        return dict(self.connection.execute(query + " GROUP BY status", params))
+
+
+async def run_shard(
+    queue: WorkQueue,
+    fetch_many: Callable[[list[str]], Awaitable[list[httpx.Response]]],
+    archive: Callable[[list[WorkItem], list[httpx.Response]], None],
+    checkpoint: Callable[[], None] = None,
+    shard: int = None,
+    batch_size: int = 50,
+) -> dict[str, int]:
+    """Fetch the pending items of a shard batch by batch, checkpointing after each batch.
+
+    Items are only marked done once `archive` (ex. uploading the pages to S3) has
+    returned, so a crash never loses fetched pages and a restarted run skips every
+    archived batch.
+
+    Args:
+        queue (WorkQueue): The work queue
+        fetch_many (Callable): Fetches a list of URLs - a failed URL may be returned as
+            None or as its exception (ex. ScrapeEngine.fetch_many with return_exceptions)
+        archive (Callable): Called with the fetched items of each batch and their responses
+        checkpoint (Callable, optional): Called after the queue of each batch is
+            committed (ex. to upload the queue file to S3)
+        shard (int, optional): The shard to work through (defaults to every item)
+        batch_size (int): The number of items fetched concurrently between checkpoints
+
+    Returns:
+        dict[str, int]: The number of items of the shard by status
+    """
+    while True:
+        batch = queue.pending(shard, limit=batch_size)
+        if not batch:
+            break
+
+        responses = await fetch_many([item.url for item in batch])
+        fetched = [(item, r) for item, r in zip(batch, responses) if _is_page(r)]
+        failed = [item for item, r in zip(batch, responses) if not _is_page(r)]
+
+        if fetched:
+            items, pages = map(list, zip(*fetched))
+            archive(items, pages)
+            queue.mark(items, "done")
+        queue.mark(failed, "failed")
+        if checkpoint:
+            checkpoint()
+        logger.info("Backfill shard %s progress: %s", shard, queue.progress(shard))
+
+    return queue.progress(shard)
+
+
+def _is_page(response) -> bool:
+    # fetch_html returns None (or raises) for pages that were not fetched successfully
+    return isinstance(response, httpx.Response) and response.status_code == 200
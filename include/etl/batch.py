@@ -0,0 +1,203 @@
+from airflow.exceptions import AirflowException
+import pandas as pd
+
+from typing import Iterable
+from datetime import date
+import logging
+
+from .transform import (
+    RIDER_DTYPES,
+    Rider,
+    _parse_in_processes,
+    extract_raw_rider,
+)
+from .countries import unknown_countries
+from .. import telemetry
+
+# logger for the batch transform
+logger = logging.getLogger(__name__)
+
+# string fields the Rider model requires
+REQUIRED_STRINGS = ("rider_name", "hero_hashtag", "representing_country")
+# maximum length of string fields, as constrained on the Rider model
+MAX_LENGTHS = {"representing_country": 2}
+# integer fields of the Rider model: (raw source field, ge, le, required)
+# every integer field is a PositiveInt (gt 0) and a value of 0 means "not available"
+# for the optional ones
+INTEGER_RULES = {
+    "race_number": ("hero_hashtag", 0, 99, True),
+    "height": ("height", 152, 200, False),
+    "weight": ("weight", 40, 115, False),
+}
+# format of the date of birth on a rider's page (same as Rider.parse_dob)
+DOB_FORMAT = "%d/%m/%Y"
+# maximum number of errors included in the exception message
+MAX_REPORTED_ERRORS = 20
+
+
+def validate_riders(raw: pd.DataFrame) -> tuple[pd.DataFrame, list[dict]]:
+    """Validate raw rider fields column by column, enforcing the rules of the Rider model.
+
+    Numbers are extracted, range checked and dates parsed with vectorized pandas
+    operations over whole columns, instead of building one Rider object per row.
+
+    Args:
+        raw (pd.DataFrame): One row per rider with the fields of extract_raw_rider
+
+    Returns:
+        tuple[pd.DataFrame, list[dict]]: The valid riders (Rider fields, RIDER_DTYPES
+            dtypes) and the errors of the invalid ones - each error has the "row" and
+            the same "loc", "type" and "msg" as the pydantic error of the Rider model
+    """
+    raw = raw.astype("string")
+    errors = []
+
+    def flag(mask: pd.Series, field: str, error_type: str, msg: str) -> None:
+        # only the invalid rows are visited
+        for row in raw.index[mask.fillna(False).to_numpy(dtype=bool)]:
+            errors.append({"row": row, "loc": (field,), "type": error_type, "msg": msg})
+
+    riders = pd.DataFrame(index=raw.index)
+
+    # required strings and their maximum lengths
+    for field in Rider.model_fields:
+        if field in INTEGER_RULES or field == "date_of_birth":
+            continue
+        values = raw[field]
+        if field in REQUIRED_STRINGS:
+            flag(values.isna(), field, "string_type", "Input should be a valid string")
+        if field in MAX_LENGTHS:
+            flag(
+                values.str.len() > MAX_LENGTHS[field],
+                field,
+                "string_too_long",
+                f"String should have at most {MAX_LENGTHS[field]} characters",
+            )
+        riders[field] = values
+
+    # integers - the numbers of the text are joined (ex. "176 CM" -> 176)
+    for field, (source, ge, le, required) in INTEGER_RULES.items():
+        text = raw[source]
+        # dots only belong to a number between two digits (ex. "1.5")
+        digits = text.str.replace(r"[^\d.]|(?<!\d)\.|\.(?!\d)", "", regex=True)
+        # text without a number, or with a decimal number, is not an integer
+        unparsable = text.notna() & (
+            (digits == "") | digits.str.contains(".", regex=False)
+        )
+        flag(
+            unparsable,
+            field,
+            "int_parsing",
+            "Input should be a valid integer, unable to parse string as an integer",
+        )
+        values = pd.to_numeric(digits.mask(unparsable), errors="coerce").astype("Int64")
+        if required:
+            flag(text.isna(), field, "int_type", "Input should be a valid integer")
+        else:
+            # 0 means the value is not available
+            values = values.mask(values == 0)
+        # same order of checks as pydantic: ge, then gt 0 (PositiveInt), then le
+        flag(
+            values < ge,
+            field,
+            "greater_than_equal",
+            f"Input should be greater than or equal to {ge}",
+        )
+        flag(
+            (values >= ge) & (values <= 0),
+            field,
+            "greater_than",
+            "Input should be greater than 0",
+        )
+        flag(
+            values > le,
+            field,
+            "less_than_equal",
+            f"Input should be less than or equal to {le}",
+        )
+        riders[field] = values
+
+    # dates of birth - missing or empty dates stay missing
+    text = raw["date_of_birth"].mask(raw["date_of_birth"] == "")
+    parsed = pd.to_datetime(text, format=DOB_FORMAT, errors="coerce")
+    flag(
+        text.notna() & parsed.isna(),
+        "date_of_birth",
+        "value_error",
+        f"Value error, date does not match format '{DOB_FORMAT}'",
+    )
+    riders["date_of_birth"] = [
+        value.date() if not pd.isna(value) else None for value in parsed
+    ]
+
+    # drop the invalid rows and type the columns like riders_to_frame
+    invalid = {error["row"] for error in errors}
+    riders = riders.loc[~riders.index.isin(invalid), list(Rider.model_fields)]
+    riders = riders.astype({field: RIDER_DTYPES[field] for field in Rider.model_fields})
+    return riders, sorted(errors, key=lambda error: error["row"])
+
+
+def parse_html_to_frame(
+    responses: Iterable[str | bytes],
+    gp_class: str,
+    snapshot_date: str,
+    workers: int = None,
+    chunksize: int = 8,
+    min_pages: int = None,
+) -> pd.DataFrame:
+    """Extract the riders of a GP class and validate them as one batch.
+
+    Batch counterpart of `riders_to_frame(parse_html_and_format(responses), ...)`: the
+    raw fields of every page are collected into columns and validated by
+    validate_riders instead of one Rider object per page.
+
+    Args:
+        responses (Iterable[str | bytes]): The HTML of each rider's webpage
+        gp_class (str): The GP class of the riders (ex. "MOTOGP")
+        snapshot_date (str): The date the riders were scraped, in the format YYYY-MM-DD
+        workers (int, optional): The number of worker processes to parse with (serial if
+            None or 0, or below `min_pages` pages)
+        chunksize (int): The number of pages sent to a worker process at a time
+        min_pages (int, optional): The number of pages below which the workers are not
+            used (MIN_PROCESS_PAGES if None)
+
+    Raises:
+        AirflowException: If no rider was extracted, a page could not be extracted or a
+            rider failed validation
+
+    Returns:
+        pd.DataFrame: One row per rider with the columns and dtypes of RIDER_DTYPES
+    """
+    # extract the raw fields in worker processes or in this process
+    results = _parse_in_processes(
+        responses,
+        workers or 0,
+        chunksize,
+        extract=extract_raw_rider,
+        min_pages=min_pages,
+    )
+    raw = pd.DataFrame.from_dict(dict(results), orient="index").sort_index()
+
+    if raw.empty:
+        raise AirflowException("The data extraction from a rider's HTML failed.")
+    # report the country names that could not be converted, here or in the workers
+    if unknown_countries:
+        logger.warning("Unknown country names: %s", dict(unknown_countries))
+
+    riders, errors = validate_riders(raw)
+    # report every invalid rider (up to a limit) instead of only the first one
+    if errors:
+        details = "\n".join(
+            f"rider {error['row']} {error['loc'][0]}: {error['msg']}"
+            for error in errors[:MAX_REPORTED_ERRORS]
+        )
+        raise AirflowException(
+            f"{len({error['row'] for error in errors})} riders failed validation:\n"
+            f"{details}"
+        )
+
+    riders["gp_class"] = pd.Series(gp_class, index=riders.index, dtype="string")
+    riders["snapshot_date"] = date.fromisoformat(snapshot_date)
+    # count the rows of the class table
+    telemetry.incr("transform.rows", len(riders))
+    return riders.reset_index(drop=True).astype(RIDER_DTYPES)
@@ -0,0 +1,317 @@
+from collections import defaultdict, Counter
+import httpx
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import json
+import os
+
+from .. import telemetry
+
+# logger for the HTML cache
+logger = logging.getLogger(__name__)
+
+# number of bodies downloaded/uploaded at the same time when syncing with S3
+SYNC_WORKERS = 16
+
+
+class HtmlCache:
+    """Content-addressed on-disk cache of fetched HTML pages.
+
+    Page bodies are stored once under the SHA-256 of their content and an index maps each
+    URL to its body hash, ETag, Last-Modified value and fetch time. Fresh entries (younger
+    than `ttl`) are served without touching the proxy, stale entries are revalidated with a
+    conditional request.
+
+    The local directory is a working copy: with a bucket, the index and the bodies are
+    pulled from S3 on open and pushed back on save, so the cache survives workers whose
+    local disk does not persist between runs. Entries not confirmed by the origin for
+    `max_age` are evicted on save, then the oldest entries until the bodies fit in
+    `max_bytes`.
+
+    Args:
+        cache_dir (str): The local directory holding the index and the page bodies
+        ttl (timedelta): How long a cached page is served without revalidation (keep it
+            above the schedule interval, or every daily run revalidates every page)
+        max_age (timedelta): How long an entry is kept after its last fetch/revalidation
+        max_bytes (int): The maximum total size of the cached bodies
+        bucket_name (str): AWS S3 bucket mirroring the cache (None to keep it local)
+        prefix (str): The S3 prefix of the cache in the bucket (ex. "html_cache/MOTOGP")
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: timedelta = timedelta(hours=36),
+        max_age: timedelta = timedelta(days=14),
+        max_bytes: int = 256 * 1024 * 1024,
+        bucket_name: str = None,
+        prefix: str = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.bodies_dir = os.path.join(cache_dir, "bodies")
+        # hit/revalidated/miss counts per label (GP class)
+        self.stats = defaultdict(Counter)
+        # bodies written since the cache was opened, pushed to S3 on save
+        self._new_bodies = set()
+
+        # create the cache directories if they do not exist yet
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        # load the URL index from the previous runs
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+        # the S3 copy is the reference when the local disk did not persist
+        if self.bucket_name:
+            self._pull()
+
+    def lookup(self, url: str) -> dict:
+        """Get the cache entry of a URL.
+
+        Args:
+            url (str): The URL of the page
+
+        Returns:
+            dict: The cache entry, or None if the URL is not cached or its body is missing
+        """
+        entry = self.index.get(url)
+        # ignore entries whose body has been removed from disk
+        if entry and os.path.exists(self._body_path(entry["body_hash"])):
+            return entry
+        return None
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Check if a cache entry can be served without revalidation.
+
+        Args:
+            entry (dict): The cache entry of a URL
+
+        Returns:
+            bool: If the entry is younger than the TTL
+        """
+        fetched_at = datetime.fromisoformat(entry["fetched_at"])
+        return datetime.now(timezone.utc) - fetched_at < self.ttl
+
+    def conditional_headers(self, entry: dict) -> dict:
+        """Build the conditional request headers for a cache entry.
+
+        Args:
+            entry (dict): The cache entry of a URL
+
+        Returns:
+            dict: The If-None-Match/If-Modified-Since headers known for the entry
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, response: httpx.Response) -> None:
+        """Store the body and validators of a fetched page.
+
+        Args:
+            url (str): The URL of the page
+            response (httpx.Response): The HTTPX response object
+        """
+        # content address of the page body
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        body_path = self._body_path(body_hash)
+        # identical pages are only written once
+        if not os.path.exists(body_path):
+            with open(body_path, "wb") as f:
+                f.write(response.content)
+            self._new_bodies.add(body_hash)
+
+        self.index[url] = {
+            "body_hash": body_hash,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def refresh(self, url: str) -> None:
+        """Mark a cache entry as fresh after the origin confirmed it is unchanged.
+
+        Args:
+            url (str): The URL of the page
+        """
+        self.index[url]["fetched_at"] = datetime.now(timezone.utc).isoformat()
+
+    def build_response(self, url: str, entry: dict) -> httpx.Response:
+        """Build a response object from a cache entry.
+
+        Args:
+            url (str): The URL of the page
+            entry (dict): The cache entry of the URL
+
+        Returns:
+            httpx.Response: A 200 response holding the cached body
+        """
+        with open(self._body_path(entry["body_hash"]), "rb") as f:
+            content = f.read()
+        return httpx.Response(
+            status_code=200,
+            content=content,
+            headers={"x-cache": "hit"},
+            request=httpx.Request("GET", url),
+        )
+
+    def record(self, label: str, outcome: str) -> None:
+        """Count a cache outcome.
+
+        Args:
+            label (str): The GP class the URL belongs to
+            outcome (str): One of "hit", "revalidated" or "miss"
+        """
+        self.stats[label][outcome] += 1
+        telemetry.incr(f"cache.{outcome}")
+
+    def evict(self) -> set[str]:
+        """Evict the entries older than `max_age`, then the oldest until under `max_bytes`.
+
+        Returns:
+            set[str]: The hashes of the bodies removed from disk
+        """
+        now = datetime.now(timezone.utc)
+        # entries the origin has not confirmed for too long
+        for url, entry in list(self.index.items()):
+            if now - datetime.fromisoformat(entry["fetched_at"]) >= self.max_age:
+                del self.index[url]
+
+        # size of every body on disk, whether still referenced or not
+        sizes = {
+            name[: -len(".html")]: os.path.getsize(os.path.join(self.bodies_dir, name))
+            for name in os.listdir(self.bodies_dir)
+            if name.endswith(".html")
+        }
+        # number of URLs sharing each body
+        references = Counter(entry["body_hash"] for entry in self.index.values())
+        total = sum(size for body_hash, size in sizes.items() if references[body_hash])
+        # oldest entries first, a body is freed once no URL references it
+        by_age = sorted(self.index.items(), key=lambda item: item[1]["fetched_at"])
+        for url, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            references[entry["body_hash"]] -= 1
+            if references[entry["body_hash"]] == 0:
+                total -= sizes.get(entry["body_hash"], 0)
+
+        evicted = {body_hash for body_hash in sizes if not references[body_hash]}
+        for body_hash in evicted:
+            os.remove(self._body_path(body_hash))
+        self._new_bodies -= evicted
+        if evicted:
+            logger.info(
+                f"Evicted {len(evicted)} bodies from the cache {self.cache_dir}."
+            )
+        return evicted
+
+    def save(self) -> None:
+        """Evict old entries, write the URL index to disk and push the cache to S3."""
+        evicted = self.evict()
+        # write to a temp file first so a crash never leaves a truncated index
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        if self.bucket_name:
+            self._push(evicted)
+
+    def _pull(self) -> None:
+        """Merge the S3 index into the local one and download the missing bodies."""
+        from ..cloud.aws_s3 import get_s3_client
+
+        client = get_s3_client()
+        try:
+            response = client.get_object(
+                Bucket=self.bucket_name, Key=f"{self.prefix}/index.json"
+            )
+        except client.exceptions.NoSuchKey:
+            # first run against this bucket, the local index is all there is
+            return
+        # keep the most recently confirmed entry of each URL
+        for url, entry in json.loads(response["Body"].read()).items():
+            local = self.index.get(url)
+            if local is None or local["fetched_at"] < entry["fetched_at"]:
+                self.index[url] = entry
+
+        missing = {
+            entry["body_hash"]
+            for entry in self.index.values()
+            if not os.path.exists(self._body_path(entry["body_hash"]))
+        }
+
+        def download(body_hash: str) -> None:
+            try:
+                response = client.get_object(
+                    Bucket=self.bucket_name, Key=self._body_key(body_hash)
+                )
+            except client.exceptions.NoSuchKey:
+                # lookup() ignores entries without a body, the page is fetched again
+                return
+            with open(self._body_path(body_hash), "wb") as f:
+                f.write(response["Body"].read())
+
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+            list(executor.map(download, missing))
+        logger.info(f"Pulled {len(missing)} bodies into the cache {self.cache_dir}.")
+
+    def _push(self, evicted: set[str]) -> None:
+        """Upload the new bodies and the index to S3 and delete the evicted bodies.
+
+        Args:
+            evicted (set[str]): The hashes of the bodies evicted by this save
+        """
+        from ..cloud.aws_s3 import get_s3_client
+
+        client = get_s3_client()
+
+        def upload(body_hash: str) -> None:
+            with open(self._body_path(body_hash), "rb") as f:
+                client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self._body_key(body_hash),
+                    Body=f.read(),
+                )
+
+        # bodies first, so the index never references a body missing from S3
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+            list(executor.map(upload, self._new_bodies))
+        client.put_object(
+            Bucket=self.bucket_name,
+            Key=f"{self.prefix}/index.json",
+            Body=json.dumps(self.index).encode("utf-8"),
+        )
+        self._new_bodies = set()
+
+        # a delete request takes at most 1000 keys
+        evicted = sorted(evicted)
+        for start in range(0, len(evicted), 1000):
+            client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [
+                        {"Key": self._body_key(body_hash)}
+                        for body_hash in evicted[start : start + 1000]
+                    ]
+                },
+            )
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.bodies_dir, f"{body_hash}.html")
+
+    def _body_key(self, body_hash: str) -> str:
+        return f"{self.prefix}/bodies/{body_hash}.html"
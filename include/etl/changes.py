@@ -0,0 +1,208 @@
+import pandas as pd
+
+from typing import Iterable, Iterator
+from datetime import date, datetime
+import hashlib
+import json
+
+from .transform import RIDER_DTYPES, Rider, parse_html_and_format, riders_to_frame
+
+# column identifying a rider between two snapshots of a GP class
+RIDER_KEY = "rider_name"
+# the Rider fields compared between snapshots
+RECORD_FIELDS = list(Rider.model_fields)
+
+
+def page_fingerprint(page: str | bytes) -> str:
+    """Fingerprint the raw HTML of a rider's page.
+
+    Args:
+        page (str | bytes): The HTML of the page
+
+    Returns:
+        str: The SHA-256 hex digest of the page
+    """
+    if isinstance(page, str):
+        page = page.encode("utf-8")
+    return hashlib.sha256(page).hexdigest()
+
+
+def record_fingerprint(record: dict) -> str:
+    """Fingerprint the validated fields of a rider.
+
+    Args:
+        record (dict): The rider data (as returned by extract_rider_data)
+
+    Returns:
+        str: The SHA-256 hex digest of the rider's fields
+    """
+    values = {field: record.get(field) for field in RECORD_FIELDS}
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def frame_to_records(df: pd.DataFrame) -> list[dict]:
+    """Convert a rider table back to rider data in the format of extract_rider_data.
+
+    Args:
+        df (pd.DataFrame): The riders of a GP class (see riders_to_frame)
+
+    Returns:
+        list[dict]: The JSON-compatible fields of each rider, in table order
+    """
+    # tables read back from CSV lose their integer dtypes (ex. 176 -> 176.0)
+    values = df[RECORD_FIELDS].astype(
+        {field: RIDER_DTYPES[field] for field in RECORD_FIELDS}
+    )
+
+    records = []
+    for row in values.astype(object).itertuples(index=False):
+        record = {}
+        for field, value in zip(RECORD_FIELDS, row):
+            # missing values (pd.NA/NaN/NaT) become None
+            if pd.isna(value):
+                value = None
+            elif isinstance(value, datetime):
+                # Parquet readers may return timestamps for date columns
+                value = value.date().isoformat()
+            elif isinstance(value, date):
+                value = value.isoformat()
+            elif hasattr(value, "item"):
+                # numpy scalars to python types
+                value = value.item()
+            record[field] = value
+        records.append(record)
+    return records
+
+
+def transform_incremental(
+    pages: Iterable[str | bytes],
+    previous: pd.DataFrame | None,
+    gp_class: str,
+    snapshot_date: str,
+    workers: int = None,
+    min_pages: int = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Transform the pages of a GP class, only parsing pages that changed.
+
+    Pages whose fingerprint is in the previous snapshot reuse the previous rider record,
+    every other page is parsed and validated. The new snapshot is then diffed against
+    the previous one rider by rider.
+
+    Args:
+        pages (Iterable[str | bytes]): The HTML of each rider's webpage
+        previous (pd.DataFrame | None): The previous snapshot of the class, if any
+        gp_class (str): The GP class of the riders (ex. "MOTOGP")
+        snapshot_date (str): The date the riders were scraped, in the format YYYY-MM-DD
+        workers (int, optional): The number of worker processes to parse with
+        min_pages (int, optional): The number of changed pages below which the workers
+            are not used (MIN_PROCESS_PAGES if None)
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, dict]: The full snapshot, the changed riders
+            and the change manifest
+    """
+    # records of the previous snapshot keyed by page fingerprint
+    known_pages = {}
+    if previous is not None and "page_fingerprint" in previous:
+        known_pages = dict(
+            zip(previous["page_fingerprint"], frame_to_records(previous))
+        )
+
+    fingerprints = []
+    reused = {}
+    parsed_positions = []
+
+    def changed_pages() -> Iterator[str | bytes]:
+        # fingerprint every page and only hand the unknown ones to the parser
+        for i, page in enumerate(pages):
+            fingerprint = page_fingerprint(page)
+            fingerprints.append(fingerprint)
+            if fingerprint in known_pages:
+                reused[i] = known_pages[fingerprint]
+            else:
+                parsed_positions.append(i)
+                yield page
+
+    parsed = parse_html_and_format(
+        changed_pages(), workers=workers, min_pages=min_pages
+    )
+
+    # merge the reused and parsed riders back into page order
+    data = dict(reused)
+    data.update({parsed_positions[j]: record for j, record in parsed.items()})
+    data = dict(sorted(data.items()))
+
+    snapshot = riders_to_frame(data, gp_class, snapshot_date)
+    snapshot["page_fingerprint"] = pd.array(
+        [fingerprints[i] for i in data], dtype="string"
+    )
+
+    changes, manifest = diff_snapshots(snapshot, previous, snapshot_date)
+    manifest["gp_class"] = gp_class
+    manifest["snapshot_date"] = snapshot_date
+    manifest["pages_parsed"] = len(parsed_positions)
+    manifest["pages_reused"] = len(reused)
+    return snapshot, changes, manifest
+
+
+def diff_snapshots(
+    current: pd.DataFrame, previous: pd.DataFrame | None, snapshot_date: str
+) -> tuple[pd.DataFrame, dict]:
+    """Compare two snapshots of a GP class rider by rider.
+
+    Args:
+        current (pd.DataFrame): The new snapshot of the class (can be empty)
+        previous (pd.DataFrame | None): The previous snapshot of the class, if any
+        snapshot_date (str): The date of the new snapshot, in the format YYYY-MM-DD
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The inserted, updated and removed riders (with a
+            "change_type" column) and the change manifest
+    """
+    # fingerprint each rider of both snapshots
+    current_prints = dict(
+        zip(current[RIDER_KEY], map(record_fingerprint, frame_to_records(current)))
+    )
+    previous_prints = {}
+    if previous is not None:
+        previous_prints = dict(
+            zip(
+                previous[RIDER_KEY], map(record_fingerprint, frame_to_records(previous))
+            )
+        )
+
+    change_types = {}
+    for rider, fingerprint in current_prints.items():
+        if rider not in previous_prints:
+            change_types[rider] = "inserted"
+        elif previous_prints[rider] != fingerprint:
+            change_types[rider] = "updated"
+    removed = [rider for rider in previous_prints if rider not in current_prints]
+
+    # new and changed riders come from the current snapshot
+    changes = current[current[RIDER_KEY].isin(change_types)].copy()
+    changes["change_type"] = changes[RIDER_KEY].map(change_types)
+    # removed riders keep their last known values, dated to the current snapshot
+    if removed:
+        gone = previous[previous[RIDER_KEY].isin(removed)].copy()
+        gone["snapshot_date"] = date.fromisoformat(snapshot_date)
+        gone["change_type"] = "removed"
+        changes = pd.concat(
+            [changes, gone.reindex(columns=changes.columns)], ignore_index=True
+        )
+    changes["change_type"] = changes["change_type"].astype("string")
+
+    manifest = {
+        "previous_snapshot_date": (
+            str(previous["snapshot_date"].iloc[0])
+            if previous is not None and len(previous)
+            else None
+        ),
+        "inserted": [r for r, c in change_types.items() if c == "inserted"],
+        "updated": [r for r, c in change_types.items() if c == "updated"],
+        "removed": removed,
+        "unchanged": len(current_prints) - len(change_types),
+    }
+    return changes.reset_index(drop=True), manifest
@@ -0,0 +1,116 @@
+from collections import Counter
+from functools import lru_cache
+
+import logging
+import json
+import os
+import re
+
+# logger for country resolution
+logger = logging.getLogger(__name__)
+
+# value returned for names that cannot be resolved (same as country_converter)
+NOT_FOUND = "not found"
+# optional prebuilt lookup file - skips importing country_converter at start up
+LOOKUP_PATH_ENV = "COUNTRY_LOOKUP_PATH"
+
+# exact-name index and regex fallbacks, built once per process
+_lookup = None
+# names that could not be resolved, with the number of times they were seen
+unknown_countries = Counter()
+
+
+def build_lookup() -> dict:
+    """Build the country lookup tables from country_converter's data.
+
+    Returns:
+        dict: The exact-name index ("names") and the ordered regex fallbacks ("regexes")
+    """
+    import country_converter as coco
+
+    # country_converter loads its full data table once here
+    data = coco.CountryConverter().data
+
+    names = {}
+    regexes = []
+    for row in data[
+        ["name_short", "name_official", "ISO2", "ISO3", "regex"]
+    ].itertuples():
+        # some codes are stored as input regexes (ex. "^GB$|^UK$") - keep the first code
+        iso2, iso3 = (_clean_code(code) for code in (row.ISO2, row.ISO3))
+        # every exact spelling of the country resolves to its ISO2 code
+        for name in (row.name_short, row.name_official, iso2, iso3):
+            names.setdefault(name.strip().lower(), iso2)
+        regexes.append([row.regex, iso2])
+
+    return {"names": names, "regexes": regexes}
+
+
+def _clean_code(code: str) -> str:
+    return code.split("|")[0].strip("^$")
+
+
+def write_lookup_file(path: str) -> None:
+    """Write the country lookup tables to a JSON file for `COUNTRY_LOOKUP_PATH`.
+
+    Args:
+        path (str): The local path of the lookup file
+    """
+    with open(path, "w") as f:
+        json.dump(build_lookup(), f)
+
+
+def _get_lookup() -> dict:
+    global _lookup
+
+    if _lookup is None:
+        path = os.environ.get(LOOKUP_PATH_ENV)
+        # load the prebuilt lookup file if there is one
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                lookup = json.load(f)
+        else:
+            lookup = build_lookup()
+        # compile the regex fallbacks once
+        lookup["regexes"] = [
+            (re.compile(pattern, re.IGNORECASE), iso2)
+            for pattern, iso2 in lookup["regexes"]
+        ]
+        _lookup = lookup
+
+    return _lookup
+
+
+def to_iso2(country_name: str) -> str:
+    """Convert a country name to its ISO2 code (2 letter abbreviation).
+
+    Args:
+        country_name (str): The name of the country (ex. "ITALY", "Great Britain")
+
+    Returns:
+        str: The ISO2 code, or "not found" if the name cannot be resolved
+    """
+    iso2 = _resolve(country_name)
+    if iso2:
+        return iso2
+
+    # count and report the name instead of silently dropping it
+    unknown_countries[country_name] += 1
+    logger.warning("Country '%s' could not be converted to ISO2", country_name)
+    return NOT_FOUND
+
+
+@lru_cache(maxsize=512)
+def _resolve(country_name: str) -> str:
+    lookup = _get_lookup()
+
+    # exact match on a known spelling
+    iso2 = lookup["names"].get(country_name.strip().lower())
+    if iso2:
+        return iso2
+
+    # same regex matching as country_converter - a name must match exactly one country
+    matches = {iso2 for regex, iso2 in lookup["regexes"] if regex.search(country_name)}
+    if len(matches) == 1:
+        return matches.pop()
+    return None
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from functools import lru_cache
+from typing import Callable
+import threading
+import logging
+import time
+
+# logger for credential refreshes
+logger = logging.getLogger(__name__)
+
+# Airflow Variable holding the ScrapeOps proxy API key
+SCRAPE_OPS_VARIABLE = "secret_scrape_ops"
+
+
+class CachedCredential:
+    """Secret resolved once and reused until its TTL expires.
+
+    The loader (ex. an Airflow Variable or secrets backend lookup) is only called when
+    the cached value is older than `ttl` or has been invalidated, so a rotated secret is
+    picked up without a restart while the hot path never hits the metadata database.
+
+    Args:
+        loader (Callable[[], str]): Returns the current value of the secret
+        ttl (timedelta): How long a resolved value is reused before being loaded again
+        clock (Callable[[], float]): Monotonic clock in seconds (injectable for tests)
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], str],
+        ttl: timedelta = timedelta(minutes=15),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.clock = clock
+        self.loads = 0
+        self._value = None
+        self._expires_at = float("-inf")
+        # the engine may resolve the secret from several threads
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """Get the secret, loading it again if it has expired.
+
+        Returns:
+            str: The value of the secret
+        """
+        with self._lock:
+            if self.clock() >= self._expires_at:
+                self._value = self.loader()
+                self._expires_at = self.clock() + self.ttl.total_seconds()
+                self.loads += 1
+            return self._value
+
+    def invalidate(self) -> None:
+        """Force the next `get` to load the secret again (ex. after it was rejected)."""
+        with self._lock:
+            self._expires_at = float("-inf")
+        logger.info("Credential invalidated - it will be loaded again on next use")
+
+
+def variable_credential(
+    key: str, ttl: timedelta = timedelta(minutes=15)
+) -> CachedCredential:
+    """Create a cached credential backed by an Airflow Variable.
+
+    Args:
+        key (str): The key of the Variable (also looked up in the secrets backend)
+        ttl (timedelta): How long a resolved value is reused before being loaded again
+
+    Returns:
+        CachedCredential: The cached credential
+    """
+
+    def load() -> str:
+        # imported here so the scraper can run without an Airflow metadata DB
+        from airflow.models import Variable
+
+        return Variable.get(key)
+
+    return CachedCredential(load, ttl=ttl)
+
+
+@lru_cache(maxsize=1)
+def scrape_ops_api_key() -> CachedCredential:
+    """Get the process-wide credential of the ScrapeOps proxy API key.
+
+    Returns:
+        CachedCredential: The cached credential of the "secret_scrape_ops" Variable
+    """
+    return variable_credential(SCRAPE_OPS_VARIABLE)
@@ -0,0 +1,129 @@
+from collections import deque
+import statistics
+import asyncio
+import time
+
+
+class AdaptiveLimiter:
+    """AIMD (additive increase, multiplicative decrease) concurrency limiter.
+
+    The limit grows by roughly one slot per window of healthy requests and is cut by
+    `decrease_factor` when a request times out, returns a 5xx status code or a block page.
+
+    Args:
+        initial_limit (int): The number of concurrent requests allowed at start up
+        min_limit (int): The lowest the limit can be decreased to
+        max_limit (int): The highest the limit can be increased to
+        latency_target (float): Seconds above which a successful request does not grow the limit
+        decrease_factor (float): The factor the limit is multiplied by on a failed request
+        cooldown (float): Minimum seconds between two consecutive decreases
+        window (int): The number of latencies kept to compute percentiles
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 20,
+        latency_target: float = 15.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 2.0,
+        window: int = 200,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        # the limit is a float so additive increases can be fractional
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = float("-inf")
+        self._condition = None
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def limit(self) -> int:
+        """The current number of concurrent requests allowed."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests currently holding a slot."""
+        return self._in_flight
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        # create the condition lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            # wait until there is a free slot under the current limit
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            # wake waiters - the limit may have grown while the slot was held
+            self._condition.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        """Record a healthy request and grow the limit if latency is within target.
+
+        Args:
+            latency (float): Seconds taken by the request
+        """
+        self.successes += 1
+        self._latencies.append(latency)
+        # additive increase - about one slot per `limit` healthy requests
+        if latency <= self.latency_target:
+            self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+
+    def record_failure(self, latency: float = None) -> None:
+        """Record a timeout, 5xx response or block page and back off the limit.
+
+        Args:
+            latency (float, optional): Seconds taken by the request, if a response was received
+        """
+        self.failures += 1
+        if latency is not None:
+            self._latencies.append(latency)
+
+        # multiplicative decrease - at most once per cooldown so a burst of
+        # concurrent failures does not collapse the limit to the minimum
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._limit = max(self._limit * self.decrease_factor, float(self.min_limit))
+            self._last_decrease = now
+
+    def latency_percentiles(self) -> dict[str, float]:
+        """Get the p50 and p95 latency of the most recent requests.
+
+        Returns:
+            dict[str, float]: The observed latencies in seconds (None if nothing was recorded)
+        """
+        # percentiles need at least two data points
+        if len(self._latencies) < 2:
+            latency = self._latencies[0] if self._latencies else None
+            return {"p50": latency, "p95": latency}
+
+        # split the latencies into 100 buckets
+        cuts = statistics.quantiles(self._latencies, n=100, method="inclusive")
+        return {"p50": cuts[49], "p95": cuts[94]}
+
+    def stats(self) -> dict:
+        """Get a snapshot of the limiter state for logging and tuning.
+
+        Returns:
+            dict: The current limit, in-flight requests, outcomes and latency percentiles
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            **self.latency_percentiles(),
+        }
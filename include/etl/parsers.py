@@ -0,0 +1,193 @@
+from bs4 import BeautifulSoup
+
+import importlib.util
+import re
+
+
+def is_installed(module: str) -> bool:
+    """Check if an optional parser module can be imported.
+
+    Args:
+        module (str): The name of the module
+
+    Returns:
+        bool: If the module is installed
+    """
+    return importlib.util.find_spec(module) is not None
+
+
+# fastest BeautifulSoup tree builder installed - html.parser is always available
+SOUP_FEATURES = "lxml" if is_installed("lxml") else "html.parser"
+# C-based parser with its own CSS engine, used when installed
+HAS_SELECTOLAX = is_installed("selectolax")
+
+
+def make_soup(markup: str | bytes, features: str = None) -> BeautifulSoup:
+    """Parse HTML with the fastest installed BeautifulSoup tree builder.
+
+    Args:
+        markup (str | bytes): The HTML to parse
+        features (str, optional): Force a tree builder (ex. "lxml", "html.parser")
+
+    Returns:
+        BeautifulSoup: The BeautifulSoup object containing the parsed HTML
+    """
+    return BeautifulSoup(markup, features or SOUP_FEATURES)
+
+
+class ExtractionSpec:
+    """Declarative extraction spec compiled once and applied in a single pass over a page.
+
+    Each field is the first `tag` element whose class attribute contains the given class
+    fragment (same as `tag[class*='fragment']`). The optional table collects the text of
+    every `table_tag[class='table_class'] > div > p + p` element, in document order.
+
+    Args:
+        fields (dict[str, tuple[str, str]]): The (tag, class fragment) of each field
+        table (tuple[str, str], optional): The (tag, exact class) of the table
+        table_field (str): The key the table texts are returned under
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, tuple[str, str]],
+        table: tuple[str, str] = None,
+        table_field: str = "table",
+    ) -> None:
+        self.fields = fields
+        self.table = table
+        self.table_field = table_field
+
+        # one alternation over every class fragment - group N matches field N
+        self._field_names = list(fields)
+        self._pattern = re.compile(
+            "|".join(f"({re.escape(fragment)})" for _, fragment in fields.values())
+        )
+        # tags worth looking at during the walk
+        self._tags = {tag for tag, _ in fields.values()}
+        if table:
+            self._tags.add(table[0])
+
+        # the same spec as one CSS selector group for the selectolax backend
+        selectors = [f"{tag}[class*='{fragment}']" for tag, fragment in fields.values()]
+        if table:
+            selectors.append(f"{table[0]}[class='{table[1]}'] > div > p + p")
+        self._css = ", ".join(selectors)
+
+        # extraction function of each parser backend
+        self.backends = {
+            "html.parser": lambda markup: self._extract_soup(markup, "html.parser"),
+            "lxml": self._extract_lxml,
+            "selectolax": self._extract_selectolax,
+        }
+
+    def extract(self, markup: str | bytes, backend: str = None) -> dict:
+        """Extract the text of every field from a page.
+
+        Args:
+            markup (str | bytes): The HTML of the page
+            backend (str, optional): The parser backend (defaults to the fastest installed)
+
+        Returns:
+            dict: The stripped text of each field (None if not found) and the table texts
+        """
+        return self.backends[backend or EXTRACTION_BACKEND](markup)
+
+    def _empty_result(self) -> dict:
+        result = dict.fromkeys(self.fields)
+        if self.table:
+            result[self.table_field] = []
+        return result
+
+    def _match_fields(self, result: dict, tag: str, class_attr: str, get_text) -> None:
+        # assign the element to every field it matches that is still empty
+        for match in self._pattern.finditer(class_attr):
+            field = self._field_names[match.lastindex - 1]
+            if result[field] is None and self.fields[field][0] == tag:
+                result[field] = get_text()
+
+    def _extract_soup(self, markup: str | bytes, features: str) -> dict:
+        result = self._empty_result()
+        soup = BeautifulSoup(markup, features)
+
+        # single walk over the tags of the spec
+        for element in soup.find_all(self._tags, class_=True):
+            class_attr = " ".join(element["class"])
+            self._match_fields(
+                result,
+                element.name,
+                class_attr,
+                lambda: element.get_text(strip=True),
+            )
+            # collect the "p + p" cells of each row of the table
+            if self.table and (element.name, class_attr) == self.table:
+                for row in element.find_all("div", recursive=False):
+                    cells = row.find_all(True, recursive=False)
+                    result[self.table_field].extend(
+                        cell.get_text(strip=True)
+                        for previous, cell in zip(cells, cells[1:])
+                        if previous.name == "p" and cell.name == "p"
+                    )
+
+        return result
+
+    def _extract_lxml(self, markup: str | bytes) -> dict:
+        import lxml.html
+
+        result = self._empty_result()
+        # lxml reads undeclared bytes as latin-1 - the pages are UTF-8
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        root = lxml.html.fromstring(markup, parser=parser)
+
+        # single walk over the tags of the spec (filtered in C)
+        for element in root.iter(*self._tags):
+            class_attr = element.get("class")
+            if not class_attr:
+                continue
+            self._match_fields(
+                result, element.tag, class_attr, lambda: _lxml_text(element)
+            )
+            # collect the "p + p" cells of each row of the table
+            if self.table and (element.tag, class_attr) == self.table:
+                for row in element.iterchildren("div"):
+                    cells = [cell for cell in row if isinstance(cell.tag, str)]
+                    result[self.table_field].extend(
+                        _lxml_text(cell)
+                        for previous, cell in zip(cells, cells[1:])
+                        if previous.tag == "p" and cell.tag == "p"
+                    )
+
+        return result
+
+    def _extract_selectolax(self, markup: str | bytes) -> dict:
+        from selectolax.lexbor import LexborHTMLParser
+
+        result = self._empty_result()
+        tree = LexborHTMLParser(markup)
+
+        # the whole spec is a single CSS query evaluated in C
+        for node in tree.css(self._css):
+            text = node.text(deep=True, separator="", strip=True)
+            # table cells are the only paragraphs in the query
+            if self.table and node.tag == "p":
+                result[self.table_field].append(text)
+            else:
+                self._match_fields(
+                    result, node.tag, node.attributes.get("class") or "", lambda: text
+                )
+
+        return result
+
+
+def _lxml_text(element) -> str:
+    # same as BeautifulSoup's get_text(strip=True)
+    return "".join(text.strip() for text in element.itertext())
+
+
+# fastest installed backend for ExtractionSpec
+if HAS_SELECTOLAX:
+    EXTRACTION_BACKEND = "selectolax"
+elif is_installed("lxml"):
+    EXTRACTION_BACKEND = "lxml"
+else:
+    EXTRACTION_BACKEND = "html.parser"
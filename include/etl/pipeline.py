@@ -0,0 +1,142 @@
+from airflow.exceptions import AirflowException
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+import logging
+import asyncio
+
+from .scrape import ScrapeEngine
+from .transform import (
+    _collect_chunk,
+    _extract_chunk,
+    extract_rider_data,
+    get_parse_pool,
+    riders_to_frame,
+)
+
+# logger for the streaming pipeline
+logger = logging.getLogger(__name__)
+
+
+async def stream_class(
+    engine: ScrapeEngine,
+    gp_class: str,
+    urls: list[str],
+    snapshot_date: str,
+    archive: Callable[[str, bytes], None] = None,
+    workers: int = 0,
+    queue_size: int = 32,
+) -> pd.DataFrame:
+    """Fetch, parse and archive the rider pages of a GP class in one streaming pass.
+
+    Each page is handed to the parsers through a bounded queue as soon as it is fetched,
+    so parsing overlaps fetching and the table is ready shortly after the last page
+    arrives. The raw pages are archived side by side (ex. into `RawStoreWriter.write`), in
+    the order of urls, so the archive matches the one of the extract task.
+
+    Args:
+        engine (ScrapeEngine): The open crawler engine
+        gp_class (str): The GP class of the riders (ex. "MOTOGP")
+        urls (list[str]): The URL of each rider's webpage
+        snapshot_date (str): The date the riders were scraped, in the format YYYY-MM-DD
+        archive (Callable, optional): Called in a worker thread with the URL and the
+            content of each fetched page
+        workers (int): The number of worker processes to parse with (0 parses in a thread)
+        queue_size (int): The maximum number of fetched pages waiting to be parsed
+
+    Raises:
+        AirflowException: If a page could not be parsed or archived, or no page was fetched
+
+    Returns:
+        pd.DataFrame: One row per rider, as returned by riders_to_frame
+    """
+    # fetched pages waiting to be parsed and archived - full queues pause the fetches
+    parse_queue = asyncio.Queue(maxsize=queue_size)
+    archive_queue = asyncio.Queue(maxsize=queue_size) if archive else None
+    records, errors = {}, []
+
+    async def produce() -> None:
+        # hand each page off in completion order
+        async def fetch(i: int, url: str) -> None:
+            response = await engine.fetch(url, gp_class)
+            # pages that were not fetched are skipped, as in the extract task
+            content = response.content if response is not None else None
+            if content is None:
+                logger.warning("The rider page '%s' was not fetched", url)
+            else:
+                await parse_queue.put((i, content))
+            if archive_queue:
+                await archive_queue.put((i, content))
+
+        await asyncio.gather(*(fetch(i, url) for i, url in enumerate(urls)))
+
+    async def parse(executor: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            i, content = await parse_queue.get()
+            try:
+                # parsing is CPU bound - keep it off the event loop
+                if executor:
+                    [(_, data)] = _collect_chunk(
+                        await loop.run_in_executor(
+                            executor,
+                            _extract_chunk,
+                            [(i, content)],
+                            extract_rider_data,
+                        )
+                    )
+                else:
+                    data = await asyncio.to_thread(extract_rider_data, content)
+                if data:
+                    records[i] = data
+                else:
+                    errors.append(f"The data extraction from '{urls[i]}' failed.")
+            except Exception as err:
+                errors.append(f"The data extraction from '{urls[i]}' failed: {err}")
+            finally:
+                parse_queue.task_done()
+
+    async def write_archive() -> None:
+        # pages arrive out of order - buffer them until the next page in url order arrives
+        pending, next_i = {}, 0
+        while True:
+            i, content = await archive_queue.get()
+            pending[i] = content
+            try:
+                while next_i in pending:
+                    content = pending.pop(next_i)
+                    next_i += 1
+                    if content is not None and not errors:
+                        await asyncio.to_thread(archive, urls[next_i - 1], content)
+            except Exception as err:
+                # keep draining the queue so that the fetches are never blocked
+                errors.append(f"The archiving of the rider html failed: {err}")
+            finally:
+                archive_queue.task_done()
+
+    # the worker processes are shared with the other GP classes of the task run
+    executor = get_parse_pool(workers) if workers else None
+    consumers = [asyncio.create_task(parse(executor)) for _ in range(max(1, workers))]
+    if archive_queue:
+        consumers.append(asyncio.create_task(write_archive()))
+
+    try:
+        await produce()
+        # wait for the queued pages to be parsed and archived
+        await parse_queue.join()
+        if archive_queue:
+            await archive_queue.join()
+    finally:
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+
+    if errors:
+        raise AirflowException("\n".join(errors[:20]))
+    if not records:
+        raise AirflowException(f"No rider page of {gp_class} was fetched.")
+
+    # renumber the riders in url order, as parse_html_and_format does for the archive
+    data = dict(enumerate(records[i] for i in sorted(records)))
+    return riders_to_frame(data, gp_class, snapshot_date)
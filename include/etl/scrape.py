@@ -1,16 +1,27 @@
-from airflow.models import Variable
 from bs4 import BeautifulSoup
 import httpx
 
 from urllib.parse import urlencode
+from typing import Callable
 from tenacity import (
     retry,
     stop_after_attempt,
-    wait_fixed,
-    retry_if_exception_type,
+    wait_random_exponential,
+    retry_if_exception,
     retry_if_result,
 )
+import logging
 import asyncio
+import time
+
+from .credentials import CachedCredential, scrape_ops_api_key
+from .limiter import AdaptiveLimiter
+from .cache import HtmlCache
+from .signatures import find_block_signature
+from .. import telemetry
+
+# logger for the scraping engine
+logger = logging.getLogger(__name__)
 
 
 def is_retryable_exception(exception: httpx._exceptions) -> bool:
@@ -34,84 +45,281 @@ def is_retryable_status_code(response: httpx.Response) -> bool:
     Returns:
         bool: If the HTTP status code of the request is in the specified error status codes
     """
-    return response.status_code in [500, 502, 503, 504]
+    return response is not None and response.status_code in [500, 502, 503, 504]
 
 
-def is_retryable_content(response: httpx.Response) -> bool:
-    """Define the conditions for retrying based on response content.
+def is_rejected_credential(response: httpx.Response) -> bool:
+    """Define the conditions for retrying with a reloaded proxy API key.
 
     Args:
         response (httpx.Response): The HTTPX response object
 
     Returns:
-        bool: If a failing phrase has been found in the response's HTML
+        bool: If the proxy rejected the API key (ex. it was rotated)
     """
+    return response is not None and response.status_code == 401
+
 
-    # set found_failing_phrase to False
-    found_failing_phrase = False
-    # list of phrases that indicate a failing request
-    failing_phrases = ["you are blocked"]
+def is_retryable_content(response: httpx.Response) -> bool:
+    """Define the conditions for retrying based on response content.
+
+    The raw body is scanned once for the failure phrases of the site (see
+    `include.etl.signatures`), and the result is reused by later checks of the response.
 
-    # loop through phrases
-    for phrase in failing_phrases:
-        # if the phrase has been found in the HTML response
-        if phrase in response.text.lower():
-            # set the bool var to True
-            found_failing_phrase = True
+    Args:
+        response (httpx.Response): The HTTPX response object
 
-    # return the bool indicating if a "failing phrase" was found in the response's HTML
-    return found_failing_phrase
+    Returns:
+        bool: If a failing phrase has been found in the response's HTML
+    """
+    # if there is no response to check
+    if response is None:
+        return False
+    # if a failing phrase has been found near the top of the response's HTML
+    return find_block_signature(response) is not None
 
 
 # retry conditions and parameters if below function fails to get HTML response
 @retry(
     retry=(
-        retry_if_exception_type(is_retryable_exception)
+        retry_if_exception(is_retryable_exception)
         | retry_if_result(is_retryable_status_code)
         | retry_if_result(is_retryable_content)
+        | retry_if_result(is_rejected_credential)
     ),
     stop=stop_after_attempt(3),
-    wait=wait_fixed(5),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    before_sleep=lambda retry_state: telemetry.incr("proxy.retries"),
 )
 async def fetch_html(
-    client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str
+    client: httpx.AsyncClient,
+    limiter: AdaptiveLimiter,
+    url: str,
+    cache: HtmlCache = None,
+    gp_class: str = None,
+    credentials: CachedCredential = None,
 ) -> httpx.Response:
     """The the response object of a GP rider.
 
     Args:
         client (httpx.AsyncClient): The HTTPX asynchronous client to manage asynchronous HTTP requests
-        semaphore (asyncio.Semaphore): The asynchronous limiter
+        limiter (AdaptiveLimiter): The adaptive asynchronous limiter
         url (str): The URL that will be requested in the HTTP GET request
+        cache (HtmlCache, optional): The HTML cache to serve and revalidate pages from
+        gp_class (str, optional): The GP class of the URL, used for the cache stats
+        credentials (CachedCredential, optional): The proxy API key (defaults to the
+            "secret_scrape_ops" Variable)
 
     Returns:
         httpx.Response: The HTTPX response object
     """
-    # rate limit with semaphore
-    async with semaphore:
+    # get the cache entry of the url
+    entry = cache.lookup(url) if cache else None
+    # if the cached page is still fresh - skip the proxy entirely
+    if entry and cache.is_fresh(entry):
+        cache.record(gp_class, "hit")
+        return cache.build_response(url, entry)
+
+    # rate limit with the adaptive limiter
+    async with limiter:
         # define the proxy parameters
         proxy_params = {
-            "api_key": Variable.get("secret_scrape_ops"),
+            "api_key": (credentials or scrape_ops_api_key()).get(),
             "url": url,
         }
-        # make HTTP GET request
-        response = await client.get(
-            url="https://proxy.scrapeops.io/v1/",
-            params=urlencode(proxy_params),
-            timeout=60,
-        )
+        # send the cached validators so an unchanged page comes back as 304
+        headers = cache.conditional_headers(entry) if entry else {}
+        if headers:
+            # ask the proxy to forward our headers to the origin
+            proxy_params["keep_headers"] = "true"
+        # start timing the request
+        start = time.perf_counter()
+        try:
+            # make HTTP GET request
+            response = await client.get(
+                url="https://proxy.scrapeops.io/v1/",
+                params=urlencode(proxy_params),
+                headers=headers,
+                timeout=60,
+            )
+        except (httpx.TimeoutException, httpx.ConnectError):
+            # timeouts and connection errors mean the proxy is struggling - back off
+            limiter.record_failure()
+            telemetry.incr("proxy.connection_errors")
+            raise
+        # the time taken by the request
+        latency = time.perf_counter() - start
+        # record the request, its latency and the size of the page
+        telemetry.incr("proxy.requests")
+        telemetry.incr(f"proxy.status.{response.status_code}")
+        telemetry.timing("proxy.latency", latency)
+        telemetry.observe("proxy.response_bytes", len(response.content))
+
+        # if the API key was rotated - reload it before the request is retried
+        if is_rejected_credential(response):
+            (credentials or scrape_ops_api_key()).invalidate()
+            return response
+
+        # if the proxy is throttling or serving a block page
+        if is_retryable_status_code(response) or is_retryable_content(response):
+            # back off and return the response so that it is retried
+            limiter.record_failure(latency)
+            telemetry.incr("proxy.throttled")
+            return response
+        # otherwise let the limiter grow
+        limiter.record_success(latency)
+
+        # if the page has not changed since it was cached
+        if entry and response.status_code == 304:
+            cache.refresh(url)
+            cache.record(gp_class, "revalidated")
+            return cache.build_response(url, entry)
 
         # if the response status code is 200 - OK
         if response.status_code == 200:
+            # store the new page in the cache
+            if cache:
+                cache.store(url, response)
+                cache.record(gp_class, "miss")
             # return the response
             return response
         # if the request status code is NOT 200
+        logger.debug("HTTP ERROR (%s) for the url: '%s'", response.status_code, url)
+
+
+class ScrapeEngine:
+    """Long-lived crawler that shares one pooled HTTP client and one concurrency budget.
+
+    Every request made through the engine goes through the same `httpx.AsyncClient`
+    (HTTP/2 capable, with keep-alive connections to the proxy) and the same adaptive
+    limiter, so the rider pages of all GP classes can be fetched concurrently in one
+    event loop.
+
+    Args:
+        initial_concurrency (int, optional): The number of in-flight requests allowed at
+            start up (defaults to a quarter of max_concurrency, so the limit has room to grow)
+        max_concurrency (int): The maximum number of in-flight requests across all GP classes
+        http2 (bool): If the client should negotiate HTTP/2 with the proxy
+        max_keepalive_connections (int): The number of idle connections kept open in the pool
+        keepalive_expiry (float): Seconds an idle connection is kept open before being closed
+        cache (HtmlCache, optional): The HTML cache to serve and revalidate pages from
+        credentials (CachedCredential, optional): The proxy API key, resolved once and
+            refreshed after its TTL (defaults to the "secret_scrape_ops" Variable)
+        transport (httpx.AsyncBaseTransport, optional): The transport of the client
+            (ex. httpx.MockTransport to run the engine without network access)
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = None,
+        max_concurrency: int = 20,
+        http2: bool = True,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        cache: HtmlCache = None,
+        credentials: CachedCredential = None,
+        transport: httpx.AsyncBaseTransport = None,
+    ) -> None:
+        self.cache = cache
+        self.transport = transport
+        # proxy API key shared by every request made through the engine
+        self.credentials = credentials or scrape_ops_api_key()
+        self.http2 = http2
+        # start below the maximum - the AIMD limiter can only shrink from its cap
+        if initial_concurrency is None:
+            initial_concurrency = max(1, max_concurrency // 4)
+        # limiter shared by every request made through the engine
+        self.limiter = AdaptiveLimiter(
+            initial_limit=initial_concurrency, max_limit=max_concurrency
+        )
+        # connection pool shared by every request made through the engine
+        self.limits = httpx.Limits(
+            max_connections=max(max_concurrency, max_keepalive_connections),
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.client = None
+
+    async def __aenter__(self) -> "ScrapeEngine":
+        # create the pooled async client used for every request
+        self.client = httpx.AsyncClient(
+            http2=self.http2, limits=self.limits, transport=self.transport
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # close every pooled connection
+        await self.client.aclose()
+        # log the limiter state to tune it against the proxy quota
+        logger.info("Scrape limiter stats: %s", self.limiter.stats())
+        # persist the cache index and report the hit/miss counts per class
+        if self.cache:
+            self.cache.save()
+            for gp_class, counts in self.cache.stats.items():
+                logger.info("HTML cache stats for %s: %s", gp_class, dict(counts))
+
+    async def fetch(self, url: str, gp_class: str = None) -> httpx.Response:
+        """Fetch one URL under the engine's concurrency budget.
+
+        Args:
+            url (str): The URL to fetch html from
+            gp_class (str, optional): The GP class of the URL, used for the cache stats
+
+        Returns:
+            httpx.Response: The response object
         """
-        else:
-            # log the error
-            request_log.error(
-                f"HTTP ERROR ({response.status_code}) for the url: '{url}'"
-            )
+        return await fetch_html(
+            self.client, self.limiter, url, self.cache, gp_class, self.credentials
+        )
+
+    async def fetch_many(
+        self, urls: list[str], gp_class: str = None, return_exceptions: bool = False
+    ) -> list[httpx.Response]:
+        """Fetch a list of URLs concurrently under the engine's concurrency budget.
+
+        Args:
+            urls (list[str]): The list of URLs to fetch html from
+            gp_class (str, optional): The GP class of the URLs, used for the cache stats
+            return_exceptions (bool): Return the exception of a URL that failed every
+                retry in place of its response, instead of raising it
+
+        Returns:
+            list[httpx.Response]: The response objects, in the same order as urls
         """
+        # create one async task per url
+        tasks = [asyncio.create_task(self.fetch(url, gp_class)) for url in urls]
+        # wait for every task to complete
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    async def fetch_by_class(
+        self,
+        urls_by_class: dict[str, list[str]],
+        on_class_complete: Callable[[str, list[httpx.Response]], None] = None,
+    ) -> dict[str, list[httpx.Response]]:
+        """Fetch the rider pages of every GP class concurrently.
+
+        Args:
+            urls_by_class (dict[str, list[str]]): The rider URLs keyed by GP class
+            on_class_complete (Callable, optional): Called in a worker thread with the GP
+                class and its responses as soon as that class is fetched
+
+        Returns:
+            dict[str, list[httpx.Response]]: The response objects keyed by GP class
+        """
+
+        async def fetch_class(gp_class: str, urls: list[str]) -> list[httpx.Response]:
+            responses = await self.fetch_many(urls, gp_class)
+            # hand the class off (ex. upload to S3) while other classes are still fetching
+            if on_class_complete:
+                await asyncio.to_thread(on_class_complete, gp_class, responses)
+            return responses
+
+        # run the requests of all GP classes at the same time
+        results = await asyncio.gather(
+            *(fetch_class(gp_class, urls) for gp_class, urls in urls_by_class.items())
+        )
+        # group the responses back by GP class
+        return dict(zip(urls_by_class.keys(), results))
 
 
 async def execute_async_requests(urls: list[str]) -> list[httpx.Response]:
@@ -119,27 +327,38 @@ async def execute_async_requests(urls: list[str]) -> list[httpx.Response]:
 
     Args:
         urls (list[str]): The list of URLs to fetch html from
-        semaphore (asyncio.Semaphore): The asynchronous limiter
 
     Returns:
-        httpx.Response: The response object from the HTTP GET request
+        list[httpx.Response]: The response objects from the HTTP GET requests
     """
-    # initialize list to store async tasks
-    tasks = []
+    # create the crawler engine for this batch of urls
+    async with ScrapeEngine() as engine:
+        # return the response objects from all fetch_html tasks
+        return await engine.fetch_many(urls)
 
-    # create semaphore (async limiter)
-    semaphore = asyncio.Semaphore(5)
-    # create async client with httpx to make requests
-    async with httpx.AsyncClient() as client:
-        # loop through urls
-        tasks = [
-            asyncio.create_task(fetch_html(client, semaphore, url)) for url in urls
-        ]
-        # append function call as async task
-        responses = await asyncio.gather(*tasks)
 
-    # return the response objects from all fetch_html tasks
-    return responses
+async def execute_async_requests_by_class(
+    urls_by_class: dict[str, list[str]],
+    cache: HtmlCache = None,
+    on_class_complete: Callable[[str, list[httpx.Response]], None] = None,
+    max_concurrency: int = 20,
+) -> dict[str, list[httpx.Response]]:
+    """Execute the async HTTP requests of every GP class in a single event loop.
+
+    Args:
+        urls_by_class (dict[str, list[str]]): The rider URLs keyed by GP class
+        cache (HtmlCache, optional): The HTML cache to serve and revalidate pages from
+        on_class_complete (Callable, optional): Called in a worker thread with the GP
+            class and its responses as soon as that class is fetched
+        max_concurrency (int): The maximum number of in-flight requests of the engine
+
+    Returns:
+        dict[str, list[httpx.Response]]: The response objects keyed by GP class
+    """
+    # share one client and one concurrency budget across all GP classes
+    async with ScrapeEngine(max_concurrency=max_concurrency, cache=cache) as engine:
+        # return the responses grouped by GP class
+        return await engine.fetch_by_class(urls_by_class, on_class_complete)
 
 
 def extract_text(soup: BeautifulSoup, selector: str) -> str:
@@ -158,9 +377,8 @@ def extract_text(soup: BeautifulSoup, selector: str) -> str:
         return soup.select_one(selector).get_text(strip=True).upper()
     # if the attribute is NOT found
     except AttributeError as err:
-        # log error to parsing_log
-        """
-        parsing_log.error(f"{err} from selector '{selector}'")
-        """
+        # log the missing selector
+        logger.debug("%s from selector '%s'", err, selector)
+        telemetry.incr("transform.missing_fields")
         # return None
         return None
@@ -0,0 +1,114 @@
+import httpx
+
+from typing import Iterable, Optional
+import re
+
+from ..registry import URL_PREFIX
+
+# number of leading bytes of a page searched for a block page marker - block pages
+# put their marker in the title or near the top of the body
+DEFAULT_SCAN_BYTES = 16 * 1024
+# phrases that indicate the proxy served a block page instead of the page
+DEFAULT_PHRASES = ["you are blocked"]
+
+# key of the cached scan result in response.extensions
+_EXTENSION_KEY = "block_signature"
+
+
+class BlockSignatures:
+    """Failure phrases of a site, compiled into one case-insensitive bytes pattern.
+
+    The raw body is searched once for every phrase at the same time, without decoding
+    or lowercasing it, and only within its first `scan_bytes` bytes.
+
+    Args:
+        phrases (Iterable[str]): The ASCII phrases that mark a block page
+        scan_bytes (int): The number of leading bytes of a page that are searched
+    """
+
+    def __init__(
+        self, phrases: Iterable[str], scan_bytes: int = DEFAULT_SCAN_BYTES
+    ) -> None:
+        self.phrases = list(phrases)
+        self.scan_bytes = scan_bytes
+        # one alternation of every phrase - the regex engine scans the body in one pass
+        self.pattern = re.compile(
+            b"|".join(re.escape(phrase.encode("ascii")) for phrase in self.phrases),
+            re.IGNORECASE,
+        )
+
+    def search(self, content: bytes) -> Optional[str]:
+        """Find the first failure phrase within the leading bytes of a page.
+
+        Args:
+            content (bytes): The raw body of the page
+
+        Returns:
+            str | None: The matched phrase (lowercase), or None if there is none
+        """
+        # the memoryview slice does not copy the body
+        match = self.pattern.search(memoryview(content)[: self.scan_bytes])
+        return match.group().decode("ascii").lower() if match else None
+
+
+# signatures used for sites without their own
+DEFAULT_SIGNATURES = BlockSignatures(DEFAULT_PHRASES)
+# signatures of each site, keyed by host
+SITE_SIGNATURES = {httpx.URL(URL_PREFIX).host: DEFAULT_SIGNATURES}
+
+
+def register_site_signatures(
+    host: str, phrases: Iterable[str], scan_bytes: int = DEFAULT_SCAN_BYTES
+) -> BlockSignatures:
+    """Configure the failure phrases of a site.
+
+    Args:
+        host (str): The host of the site (ex. "www.motogp.com")
+        phrases (Iterable[str]): The ASCII phrases that mark a block page of the site
+        scan_bytes (int): The number of leading bytes of a page that are searched
+
+    Returns:
+        BlockSignatures: The compiled signatures of the site
+    """
+    SITE_SIGNATURES[host] = BlockSignatures(phrases, scan_bytes)
+    return SITE_SIGNATURES[host]
+
+
+def signatures_for(response: httpx.Response) -> BlockSignatures:
+    """Get the signatures of the site a response was fetched from.
+
+    Requests made through the proxy carry the page's URL in their "url" parameter.
+
+    Args:
+        response (httpx.Response): The HTTPX response object
+
+    Returns:
+        BlockSignatures: The signatures of the site, or the default ones
+    """
+    try:
+        url = response.request.url
+    except RuntimeError:
+        # the response was not built from a request
+        return DEFAULT_SIGNATURES
+    target = url.params.get("url")
+    host = httpx.URL(target).host if target else url.host
+    return SITE_SIGNATURES.get(host, DEFAULT_SIGNATURES)
+
+
+def find_block_signature(response: httpx.Response) -> Optional[str]:
+    """Find the failure phrase of a block page, scanning each response only once.
+
+    The result is stored in `response.extensions`, so the check made by fetch_html and
+    the one made by the retry condition on the same response share a single scan.
+
+    Args:
+        response (httpx.Response): The HTTPX response object
+
+    Returns:
+        str | None: The matched phrase, or None if the page is not a block page
+    """
+    if _EXTENSION_KEY not in response.extensions:
+        response.extensions[_EXTENSION_KEY] = signatures_for(response).search(
+            response.content
+        )
+    return response.extensions[_EXTENSION_KEY]
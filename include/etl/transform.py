@@ -1,14 +1,80 @@
 from pydantic import Field, BaseModel, validator, PositiveInt
 from airflow.exceptions import AirflowException
-import country_converter as coco
-from bs4 import BeautifulSoup
+import pandas as pd
 import httpx
 
-from typing import Optional
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from typing import Callable, Iterable, Iterator, Optional
+from collections import Counter
+from itertools import chain, islice
 from datetime import datetime, date
+import multiprocessing
+import threading
+import logging
+import os
 import re
 
-from .scrape import extract_text
+from .parsers import HAS_SELECTOLAX, ExtractionSpec, make_soup
+from ..registry import (
+    CONTAINER_CLASS_PATTERN,
+    GP_CLASSES,
+    GP_CLASSES_BY_SLUG,
+    GRID_CLASS_PATTERN,
+    GRID_LINK_SELECTOR,
+    GRID_SELECTOR,
+    URL_PREFIX,
+)
+from .countries import to_iso2, unknown_countries
+from .. import telemetry
+
+# logger for the transform stage
+logger = logging.getLogger(__name__)
+
+# pandas dtypes of the rider table - the date columns hold datetime.date objects
+RIDER_DTYPES = {
+    "rider_name": "string",
+    "hero_hashtag": "string",
+    "race_number": "Int8",
+    "team": "string",
+    "bike": "string",
+    "representing_country": "string",
+    "place_of_birth": "string",
+    "date_of_birth": "object",
+    "height": "Int16",
+    "weight": "Int16",
+    "gp_class": "string",
+    "snapshot_date": "object",
+}
+# Parquet types of the date columns - kept as dates even when every value is missing
+RIDER_PARQUET_TYPES = {"date_of_birth": "date", "snapshot_date": "date"}
+
+# default number of pages below which the process-pool mode parses in this process -
+# below a GP class (~30 pages), so a class is split between the workers when they are
+# asked for (the "transform_min_process_pages" Variable raises it on small machines)
+MIN_PROCESS_PAGES = 24
+# worker processes beyond the CPUs of the machine only add overhead
+MAX_PARSE_WORKERS = os.cpu_count() or 1
+
+# worker processes shared by the parses of this process, with their settings
+_parse_pool: tuple[ProcessPoolExecutor, tuple[int, bool]] = None
+_parse_pool_lock = threading.Lock()
+
+# (tag, class fragment) of each rider field and the "Rider Bio" table on a rider's page
+RIDER_SPEC = ExtractionSpec(
+    fields={
+        "rider_name": ("span", "rider-hero__info-name"),
+        "hero_hashtag": ("span", "rider-hero__info-hashtag"),
+        "team": ("span", "rider-hero__details-team"),
+        "representing_country": ("span", "rider-hero__details-country"),
+    },
+    table=("div", "rider-bio__table"),
+    table_field="rider_bio",
+)
 
 
 class Rider(BaseModel):
@@ -43,14 +109,42 @@ class Rider(BaseModel):
             return datetime.strptime(value, "%d/%m/%Y").date()
 
 
-def parse_html_and_format(responses: list[str]) -> dict:
+def parse_html_and_format(
+    responses: Iterable[str | bytes],
+    workers: int = None,
+    chunksize: int = 8,
+    min_pages: int = None,
+) -> dict:
+    """Extract and validate the rider data from each rider's HTML.
+
+    Pages are consumed lazily, so `responses` can be a generator that reads each page on
+    demand (ex. `iter_s3_zip_members`).
+
+    Args:
+        responses (Iterable[str | bytes]): The HTML of each rider's webpage
+        workers (int, optional): The number of worker processes to parse with (serial if
+            None or 0, or below `min_pages` pages)
+        chunksize (int): The number of pages sent to a worker process at a time
+        min_pages (int, optional): The number of pages below which the workers are not
+            used (MIN_PROCESS_PAGES if None)
+
+    Raises:
+        AirflowException: If the data extraction from a rider's HTML failed (ex. a rider
+            failed the Rider model validation), in both modes
+
+    Returns:
+        dict: The rider data keyed by the position of the HTML in responses
+    """
     # initialize dict to store riders
     consolidated_data = {}
 
-    # loop through GP classes
-    for i, response in enumerate(responses):
-        # call function to scrape rider data from each response in responses
-        data = extract_rider_data(response)
+    # parse the responses in worker processes or in this process
+    results = _parse_in_processes(
+        responses, workers or 0, chunksize, min_pages=min_pages
+    )
+
+    # loop through the parsed riders as they complete
+    for i, data in results:
         # if data is NOT None
         if data:
             # update consolidated_data with data
@@ -59,159 +153,397 @@ def parse_html_and_format(responses: list[str]) -> dict:
             # raise AirflowException
             raise AirflowException("The data extraction from a rider's HTML failed.")
 
-    # return dict of parsed HTML data for each class
-    return consolidated_data
+    # report the country names that could not be converted, here or in the workers
+    if unknown_countries:
+        logger.warning("Unknown country names: %s", dict(unknown_countries))
+
+    # return dict of parsed HTML data for each class - in the order of responses
+    return dict(sorted(consolidated_data.items()))
+
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Get the worker processes shared by the parses of this process.
+
+    The processes are started once and reused by every call (ex. one per GP class), so
+    the interpreters and their imports are only paid for once per task run.
+
+    Args:
+        workers (int): The number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: The pool of worker processes
+    """
+    global _parse_pool
+
+    # the workers record metrics if this process does (see telemetry.set_enabled)
+    key = (workers, telemetry.ENABLED)
+    with _parse_pool_lock:
+        pool, pool_key = _parse_pool or (None, None)
+        # start new workers if their settings changed or one died (ex. out of memory)
+        if pool_key != key or pool._broken:
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+            # spawn fresh interpreters - forking the Airflow task process is not fork-safe
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_parse_worker,
+                initargs=(telemetry.ENABLED,),
+            )
+            _parse_pool = (pool, key)
+        return pool
+
+
+def shutdown_parse_pool() -> None:
+    """Stop the shared worker processes (they are started again on the next parse)."""
+    global _parse_pool
+
+    with _parse_pool_lock:
+        if _parse_pool:
+            _parse_pool[0].shutdown(wait=True, cancel_futures=True)
+            _parse_pool = None
+
+
+def _init_parse_worker(telemetry_enabled: bool) -> None:
+    # spawned workers read MOTOGP_TELEMETRY, not the flag set by the task
+    telemetry.set_enabled(telemetry_enabled)
+    # import the parsers and build the country lookup before the first chunk arrives
+    to_iso2("Italy")
+
+
+def _parse_in_processes(
+    responses: Iterable[str | bytes],
+    workers: int,
+    chunksize: int,
+    extract: Callable[[str | bytes], dict] = None,
+    min_pages: int = None,
+) -> Iterator[tuple[int, dict]]:
+    extract = extract or extract_rider_data
+    min_pages = MIN_PROCESS_PAGES if min_pages is None else min_pages
+    responses = iter(responses)
+
+    # small batches stay in this process - sending the pages to the workers costs more
+    # than parsing them, and more workers than CPUs only adds overhead
+    head = list(islice(responses, min_pages))
+    workers = min(workers, MAX_PARSE_WORKERS)
+    if workers < 2 or len(head) < min_pages:
+        seen = unknown_countries.copy()
+        for i, response in enumerate(chain(head, responses)):
+            try:
+                data = extract(response)
+            except Exception as err:
+                # fail as the workers do, whichever mode parsed the pages
+                raise _extraction_error(err, unknown_countries - seen) from err
+            yield i, data
+        return
+
+    # lazily split the responses into chunks of (index, html) pairs
+    indexed = enumerate(chain(head, responses))
+    chunks = iter(lambda: list(islice(indexed, chunksize)), [])
+
+    executor = get_parse_pool(workers)
+    pending = set()
+    try:
+        for chunk in chunks:
+            pending.add(executor.submit(_extract_chunk, chunk, extract))
+            # bound the number of pages held in memory - wait for a chunk to complete
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # stream the riders back as each chunk completes
+                for future in done:
+                    yield from _collect_chunk(future.result())
+        for future in as_completed(pending):
+            yield from _collect_chunk(future.result())
+    finally:
+        # stop the remaining chunks if a rider failed - the workers are kept
+        for future in pending:
+            future.cancel()
+
+
+def _extract_chunk(
+    chunk: list[tuple[int, str | bytes]], extract: Callable[[str | bytes], dict]
+) -> tuple[list[tuple[int, dict]], Counter, tuple[dict, dict]]:
+    # runs in a worker process - country names are counted in the worker's copy of
+    # unknown_countries and metrics in the worker's summary
+    seen = unknown_countries.copy()
+    # drop the metrics of a previous chunk that failed
+    telemetry.summary.drain()
+    try:
+        records = [(i, extract(response)) for i, response in chunk]
+    except Exception as err:
+        # pydantic errors cannot be pickled back to the parent process
+        raise _extraction_error(err, unknown_countries - seen) from None
+    # send the names counted and the metrics recorded by this chunk back with the riders
+    return records, unknown_countries - seen, telemetry.summary.drain()
+
+
+def _extraction_error(err: Exception, unknown: Counter) -> AirflowException:
+    # the error of a failed page, with the country names it could not convert
+    return AirflowException(
+        f"The data extraction from a rider's HTML failed: {err}"
+        + (f" (unknown country names: {dict(unknown)})" if unknown else "")
+    )
+
 
+def _collect_chunk(
+    result: tuple[list[tuple[int, dict]], Counter, tuple[dict, dict]],
+) -> list[tuple[int, dict]]:
+    records, unknown, metrics = result
+    # report the country names the workers could not convert from this process
+    unknown_countries.update(unknown)
+    # the task summary includes the metrics of the workers (already sent to StatsD)
+    telemetry.summary.merge(*metrics)
+    return records
 
-def collect_gp_urls(response: httpx.Response) -> dict[list[str]]:
-    """Scrapes the riders or teams pageon  motogp.com for links to each rider/team in the class.
+
+def riders_to_frame(data: dict, gp_class: str, snapshot_date: str) -> pd.DataFrame:
+    """Collect the parsed riders of a GP class into one typed table.
 
     Args:
-        response (requests_html.HTMLResponse): The HTTP response object
-        gp_class (str): The GP class (ex. "MotoGP", "Moto2", "Moto3", "MotoE")
-        webpage (Literal): Describes the webpage origin
+        data (dict): The rider data returned by parse_html_and_format
+        gp_class (str): The GP class of the riders (ex. "MOTOGP")
+        snapshot_date (str): The date the riders were scraped, in the format YYYY-MM-DD
 
     Returns:
-        dict[list[str]]: The list of URLs to each rider in the specified GP class.
+        pd.DataFrame: One row per rider with the columns and dtypes of RIDER_DTYPES
     """
+    # one row per rider, in the order of data
+    df = pd.DataFrame(list(data.values()), columns=list(Rider.model_fields))
+    df["gp_class"] = gp_class
+    df["snapshot_date"] = date.fromisoformat(snapshot_date)
+    # ISO date strings to datetime.date objects (missing dates stay None)
+    df["date_of_birth"] = [
+        date.fromisoformat(value) if value else None for value in df["date_of_birth"]
+    ]
+    # count the rows of the class table
+    telemetry.incr("transform.rows", len(df))
+    return df.astype(RIDER_DTYPES)
+
+
+def collect_gp_urls(response: httpx.Response, required: bool = True) -> dict[list[str]]:
+    """Scrapes the riders page on motogp.com for links to each rider in every GP class.
+
+    The page is parsed once and the links of all GP classes are collected in the same pass.
+
+    Args:
+        response (httpx.Response): The HTTP response object of the riders page
+        required (bool): Fail if a GP class has no rider grid, otherwise skip the class
+            (ex. the MotoE grid on the pages of seasons before 2019)
+
+    Raises:
+        AirflowException: If the rider grid of a GP class is not found on the page and
+            required is True
+
+    Returns:
+        dict[list[str]]: The deduplicated list of URLs to each rider, keyed by GP class
+    """
+
+    # collect the hrefs of every rider grid with the fastest installed parser
+    if HAS_SELECTOLAX:
+        grid_hrefs = _grid_hrefs_selectolax(response.content)
+    else:
+        grid_hrefs = _grid_hrefs_soup(response.content)
 
     # initalize dict to store rider urls from all GP classes
     all_rider_urls = {}
 
-    # list of GP classes
-    gp_classes = ["MOTOGP", "MOTO2", "MOTO3", "MOTOE"]
-
-    # loop through gp_classes
-    for gp_class in gp_classes:
-        # define the CSS selector for the parent and child element
-        parent = f"div[class*='rider-grid__{gp_class.lower()}']"
-        child = "div[class*='rider-list__container'] a"
-        # define url prefix
-        url_prefix = "https://www.motogp.com"
-
-        # parse HTML with beautifulsoup
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # initialize list to store urls in GP class
-        urls = []
-
-        # find all rider/team elements
-        elements = soup.select_one(parent)
-        # loop through attributes for each rider element
-        for attribs in elements.select(child):
-            # get href attribute
-            url = attribs["href"]
-
-            # if url is not an empty string
-            if url:
-                # append url prefix to url
-                complete_url = url_prefix + url
-                # append url to rider_urls
-                urls.append(complete_url)
+    # loop through the registered GP classes
+    for gp_class in GP_CLASSES:
+        # if the rider grid of the class is not on the page
+        if gp_class.name not in grid_hrefs:
+            if required:
+                raise AirflowException(
+                    f"The rider grid for '{gp_class.name}' was not found."
+                )
+            logger.warning("No rider grid for %s, skipping the class", gp_class.name)
+            continue
+
+        # prefix non-empty hrefs and drop duplicates while keeping page order
+        urls = list(
+            dict.fromkeys(
+                URL_PREFIX + href for href in grid_hrefs[gp_class.name] if href
+            )
+        )
+        logger.info("Collected %d rider URLs for %s", len(urls), gp_class.name)
 
         # update all_rider_urls with the list of URLs from that class
-        all_rider_urls.update({gp_class: urls})
+        all_rider_urls.update({gp_class.name: urls})
 
     # return the list of rider_urls
     return all_rider_urls
 
 
-def extract_rider_data(response_content: str) -> dict:
-    # parse HTML from response using beautiful soup
-    soup = BeautifulSoup(response_content, "html.parser")
+def _grid_hrefs_soup(content: bytes) -> dict[str, list[str]]:
+    # parse HTML once with the fastest installed tree builder
+    soup = make_soup(content)
 
-    # the name of the rider
-    rider_name = extract_text(soup, "span[class*='rider-hero__info-name']")
+    grid_hrefs = {}
+    # one walk over the document finds the grids of every GP class
+    for grid in soup.find_all("div", class_=GRID_CLASS_PATTERN):
+        slug = GRID_CLASS_PATTERN.search(" ".join(grid["class"])).group(1)
+        gp_class = GP_CLASSES_BY_SLUG[slug].name
+        # keep the first grid of a class (same as select_one)
+        if gp_class in grid_hrefs:
+            continue
+        # only the grid's subtree is searched for rider links
+        grid_hrefs[gp_class] = [
+            link.get("href")
+            for container in grid.find_all("div", class_=CONTAINER_CLASS_PATTERN)
+            for link in container.find_all("a")
+        ]
 
-    # the name abbreviation + race number as a hashtag
-    hero_hashtag = extract_text(soup, "span[class*='rider-hero__info-hashtag']")
-    # if hero hashtag is NOT None
-    if hero_hashtag:
-        # extract numbers from hero_hashtag to get race number
-        race_number = int("".join(re.findall(r"\d+\.\d+|\d+", hero_hashtag)))
-    # if hero_hashtag is None
-    else:
-        # set race_number to None
-        race_number = None
+    return grid_hrefs
 
-    # associated MotoGP team
-    team = extract_text(soup, "span[class*='rider-hero__details-team']")
 
-    # country where rider was born
-    representing_country = extract_text(
-        soup, "span[class*='rider-hero__details-country']"
-    )
+def _grid_hrefs_selectolax(content: bytes) -> dict[str, list[str]]:
+    from selectolax.lexbor import LexborHTMLParser
+
+    # parse HTML once with selectolax (lexbor backend)
+    tree = LexborHTMLParser(content)
+
+    grid_hrefs = {}
+    for grid in tree.css(GRID_SELECTOR):
+        match = GRID_CLASS_PATTERN.search(grid.attributes.get("class") or "")
+        # skip grid elements that are not a GP class (or a class already collected)
+        if not match or GP_CLASSES_BY_SLUG[match.group(1)].name in grid_hrefs:
+            continue
+        grid_hrefs[GP_CLASSES_BY_SLUG[match.group(1)].name] = [
+            link.attributes.get("href") for link in grid.css(GRID_LINK_SELECTOR)
+        ]
+
+    return grid_hrefs
+
+
+def extract_raw_rider(response_content: str | bytes, backend: str = None) -> dict:
+    """Extract the raw (unvalidated) rider fields from a rider's HTML.
+
+    Args:
+        response_content (str | bytes): The HTML of the rider's webpage
+        backend (str, optional): The parser backend (defaults to the fastest installed)
+
+    Returns:
+        dict: The uppercased text of each field of RAW_RIDER_FIELDS (None if not found)
+    """
+    # extract the text of every rider field in a single pass over the HTML
+    fields = RIDER_SPEC.extract(response_content, backend)
+
+    raw = {
+        # the name of the rider
+        "rider_name": _upper(fields["rider_name"]),
+        # the name abbreviation + race number as a hashtag
+        "hero_hashtag": _upper(fields["hero_hashtag"]),
+        # associated MotoGP team
+        "team": _upper(fields["team"]),
+        # country where rider was born
+        "representing_country": _upper(fields["representing_country"]),
+        "bike": None,
+        "place_of_birth": None,
+        "date_of_birth": None,
+        "height": None,
+        "weight": None,
+    }
     # if representing_country is NOT None
-    if representing_country:
-        # create country converter object
-        cc = coco.CountryConverter()
+    if raw["representing_country"]:
         # convert country name to country code 'ISO2' - 2 letter abbreviation
-        representing_country = cc.convert(names=representing_country, to="ISO2")
+        raw["representing_country"] = to_iso2(raw["representing_country"])
 
-    # define the CSS selector for the table "Rider Bio" stats
-    table_selector = "div[class='rider-bio__table']"
-    # elements in "Rider Bio" table
-    bio_elements = soup.select(f"{table_selector} > div > p + p")
+    # values in "Rider Bio" table
+    bio_elements = fields["rider_bio"]
 
     # if the table has been found
     if bio_elements:
         # bike that the rider is on
-        bike = bio_elements[0].get_text(strip=True).upper()
+        bike = bio_elements[0].upper()
         # if bike == "-" (meaning that the rider is a test rider)
         if bike == "-":
             # set bike to None
             bike = None
 
         # date of birth of rider
-        date_of_birth = bio_elements[1].get_text(strip=True)
+        date_of_birth = bio_elements[1]
         # if "-" is in date_of_birth  (meaning that there is NO date)
         if "-" in date_of_birth:
             # set date_of_birth to None
             date_of_birth = None
+        raw["date_of_birth"] = date_of_birth
 
         # where rider was born
-        place_of_birth = bio_elements[2].get_text(strip=True).upper()
+        place_of_birth = bio_elements[2].upper()
         # if place_of_birth is "-" (meaning the data is not available)
-        if place_of_birth == "-":
-            place_of_birth = None
+        if place_of_birth != "-":
+            raw["place_of_birth"] = place_of_birth
 
         # if "MotoGP" is NOT in bike (meaning that the rider is NOT a legend - extract non-legend stats from rider_bio table)
         if bike and "MOTOGP" not in bike:
-            # height of the rider (in centimeters)
-            str_height = bio_elements[3].get_text(strip=True).upper()
-            # extract numbers from str_height
-            height = int("".join(re.findall(r"\d+\.\d+|\d+", str_height)))
-            # if height is 0cm - set weight to None
-            if height == 0:
-                height = None
-
-            # height of the rider (in centimeters)
-            str_weight = bio_elements[4].get_text(strip=True)
-            # extract numbers from str_height
-            weight = int("".join(re.findall(r"\d+\.\d+|\d+", str_weight)))
-            # if weight is 0kg - set weight to None
-            if weight == 0:
-                weight = None
-        # if rider is a legend
-        else:
-            # set rider bio attributes not included with legends to None
-            bike = None
-            height = None
-            weight = None
+            raw["bike"] = bike
+            # height (in centimeters) and weight (in kilograms) of the rider
+            raw["height"] = bio_elements[3].upper()
+            raw["weight"] = bio_elements[4]
+
+    return raw
+
+
+def extract_rider_data(response_content: str | bytes, backend: str = None) -> dict:
+    """Extract and validate a rider from a rider's HTML with the Rider model.
+
+    Args:
+        response_content (str | bytes): The HTML of the rider's webpage
+        backend (str, optional): The parser backend (defaults to the fastest installed)
+
+    Raises:
+        ValidationError: If the rider does not satisfy the Rider model
+
+    Returns:
+        dict: The validated rider, JSON serialized
+    """
+    # time the parse of each page (in the worker process when parsing in processes)
+    with telemetry.timer("transform.parse_page"):
+        return validate_raw_rider(extract_raw_rider(response_content, backend))
+
+
+def validate_raw_rider(raw: dict) -> dict:
+    """Convert and validate the raw fields of one rider with the Rider model.
+
+    Args:
+        raw (dict): The raw rider fields (see extract_raw_rider)
+
+    Raises:
+        ValidationError: If the rider does not satisfy the Rider model
+
+    Returns:
+        dict: The validated rider, JSON serialized
+    """
+    # extract numbers from hero_hashtag to get race number
+    race_number = _to_int(raw["hero_hashtag"])
+    # a height of 0cm or a weight of 0kg means the data is not available
+    height = _to_int(raw["height"]) or None
+    weight = _to_int(raw["weight"]) or None
 
     # create new Rider class object
     new_rider = Rider(
-        rider_name=rider_name,
-        hero_hashtag=hero_hashtag,
+        rider_name=raw["rider_name"],
+        hero_hashtag=raw["hero_hashtag"],
         race_number=race_number,
-        team=team,
-        bike=bike,
-        representing_country=representing_country,
-        place_of_birth=place_of_birth,
-        date_of_birth=date_of_birth,
+        team=raw["team"],
+        bike=raw["bike"],
+        representing_country=raw["representing_country"],
+        place_of_birth=raw["place_of_birth"],
+        date_of_birth=raw["date_of_birth"],
         height=height,
         weight=weight,
     )
 
     # return new_rider as a dict
     return new_rider.model_dump(mode="json")
+
+
+def _to_int(text: str) -> int:
+    # join the numbers found in the text (ex. "176 CM" -> 176), keeping None as None
+    if text is None:
+        return None
+    return int("".join(re.findall(r"\d+\.\d+|\d+", text)))
+
+
+def _upper(text: str) -> str:
+    # uppercase extracted text, keeping missing elements as None
+    return text.upper() if text is not None else None
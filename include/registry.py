@@ -0,0 +1,250 @@
+from typing import NamedTuple, Literal
+import re
+
+# AWS S3 bucket holding every stage's data
+BUCKET = "motogp-data-project"
+# prefix of the rider links on the riders page
+URL_PREFIX = "https://www.motogp.com"
+# riders page listing the riders of every GP class
+RIDERS_PAGE_URL = f"{URL_PREFIX}/en/riders/motogp"
+
+# top-level S3 prefixes of each stage
+HTML_PREFIX = "html_responses"
+RAW_BODIES_PREFIX = "raw_html_bodies"
+RAW_MANIFESTS_PREFIX = "raw_html_manifests"
+TRANSFORMED_PREFIX = "transformed_rider_data"
+BACKFILL_PREFIX = "html_backfill"
+BACKFILL_QUEUE_PREFIX = "backfill/queues"
+HTML_CACHE_PREFIX = "html_cache"
+
+# class attribute of the containers holding the rider links in a grid
+CONTAINER_CLASS = "rider-list__container"
+
+
+class GPClass(NamedTuple):
+    """A GP class (series) scraped from the riders page.
+
+    Args:
+        name (str): The name of the class, used in S3 keys and tables (ex. "MOTO2")
+        slug (str): The suffix of the class's rider grid on the riders page (ex. "moto2")
+    """
+
+    name: str
+    slug: str
+
+
+# every GP class, in the order they are processed - add a series here
+GP_CLASSES = (
+    GPClass("MOTOGP", "motogp"),
+    GPClass("MOTO2", "moto2"),
+    GPClass("MOTO3", "moto3"),
+    GPClass("MOTOE", "motoe"),
+)
+# names of every GP class (ex. for task mapping)
+GP_CLASS_NAMES = [gp_class.name for gp_class in GP_CLASSES]
+# O(1) lookups by name and by grid slug
+GP_CLASSES_BY_NAME = {gp_class.name: gp_class for gp_class in GP_CLASSES}
+GP_CLASSES_BY_SLUG = {gp_class.slug: gp_class for gp_class in GP_CLASSES}
+
+# class attribute of the rider grid of each GP class - group 1 is the slug
+GRID_CLASS_PATTERN = re.compile(
+    "rider-grid__(" + "|".join(re.escape(c.slug) for c in GP_CLASSES) + ")"
+)
+# class attribute of the containers holding the rider links
+CONTAINER_CLASS_PATTERN = re.compile(re.escape(CONTAINER_CLASS))
+# CSS selector of every rider grid (candidates are checked with GRID_CLASS_PATTERN)
+GRID_SELECTOR = "div[class*='rider-grid__']"
+# CSS selector of the rider links inside a grid
+GRID_LINK_SELECTOR = f"div[class*='{CONTAINER_CLASS}'] a"
+
+
+def html_archive_key(gp_class: str, snapshot_date: str) -> str:
+    """Key of the zipped rider html of a GP class scraped on a date.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{HTML_PREFIX}/{gp_class}/{snapshot_date}/rider_responses.zip"
+
+
+def html_cache_prefix(gp_class: str) -> str:
+    """Prefix of the HTML cache of the rider pages of a GP class.
+
+    Args:
+        gp_class (str): The name of the GP class
+
+    Returns:
+        str: The S3 prefix, without a trailing slash
+    """
+    return f"{HTML_CACHE_PREFIX}/{gp_class}"
+
+
+def raw_body_key(digest: str, codec: Literal["deflate", "zstd"]) -> str:
+    """Key of a rider page body in the content-addressed raw store.
+
+    Args:
+        digest (str): The SHA-256 hex digest of the uncompressed body
+        codec (Literal): The compression codec of the stored body
+
+    Returns:
+        str: The S3 key (fanned out by the first two characters of the digest)
+    """
+    extension = "zst" if codec == "zstd" else "gz"
+    return f"{RAW_BODIES_PREFIX}/{digest[:2]}/{digest}.html.{extension}"
+
+
+def raw_manifest_partition(gp_class: str) -> str:
+    """Prefix of the daily raw html manifests of a GP class.
+
+    Args:
+        gp_class (str): The name of the GP class
+
+    Returns:
+        str: The S3 prefix, without a trailing slash
+    """
+    return f"{RAW_MANIFESTS_PREFIX}/{gp_class}"
+
+
+def raw_manifest_key(gp_class: str, snapshot_date: str) -> str:
+    """Key of the manifest of the rider pages of a GP class scraped on a date.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{raw_manifest_partition(gp_class)}/{snapshot_date}/manifest.json"
+
+
+def transformed_partition(gp_class: str, snapshot_date: str = None) -> str:
+    """Prefix of the transformed tables of a GP class, or of one of its dates.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str, optional): The date in the format YYYY-MM-DD
+
+    Returns:
+        str: The S3 prefix, without a trailing slash
+    """
+    prefix = f"{TRANSFORMED_PREFIX}/{gp_class}"
+    return f"{prefix}/{snapshot_date}" if snapshot_date else prefix
+
+
+def riders_table_key(
+    gp_class: str, snapshot_date: str, file_format: Literal["parquet", "csv"]
+) -> str:
+    """Key of the riders table of a GP class on a date.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+        file_format (Literal): The file format of the table
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{transformed_partition(gp_class, snapshot_date)}/riders.{file_format}"
+
+
+def changes_table_key(
+    gp_class: str, snapshot_date: str, file_format: Literal["parquet", "csv"]
+) -> str:
+    """Key of the changed riders table of a GP class on a date.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+        file_format (Literal): The file format of the table
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{transformed_partition(gp_class, snapshot_date)}/changes.{file_format}"
+
+
+def changes_manifest_key(gp_class: str, snapshot_date: str) -> str:
+    """Key of the change manifest of a GP class on a date.
+
+    Args:
+        gp_class (str): The name of the GP class
+        snapshot_date (str): The date in the format YYYY-MM-DD
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{transformed_partition(gp_class, snapshot_date)}/changes.json"
+
+
+def backfill_archive_key(gp_class: str, season: int, batch: str) -> str:
+    """Key of a batch of backfilled rider html, without its extension.
+
+    Args:
+        gp_class (str): The name of the GP class
+        season (int): The season of the riders
+        batch (str): The unique name of the batch
+
+    Returns:
+        str: The S3 key of the batch (".zip" for the archive, ".json" for its URLs)
+    """
+    return f"{BACKFILL_PREFIX}/{gp_class}/{season}/{batch}"
+
+
+def backfill_roster_key(gp_class: str, season: int) -> str:
+    """Key of the rider URLs listed for a GP class in a past season.
+
+    Args:
+        gp_class (str): The name of the GP class
+        season (int): The season of the riders
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{backfill_archive_key(gp_class, season, 'roster')}.json"
+
+
+def backfill_queue_key(shard: int, num_shards: int) -> str:
+    """Key of the checkpointed work queue of a backfill shard.
+
+    Items are assigned to shards by the number of shards, so each shard count has its
+    own queues (a queue of another shard count is never resumed with the wrong items).
+
+    Args:
+        shard (int): The shard of the queue
+        num_shards (int): The number of shards of the backfill
+
+    Returns:
+        str: The S3 key
+    """
+    return f"{BACKFILL_QUEUE_PREFIX}/queue_shard_{shard}_of_{num_shards}.sqlite"
+
+
+class Partition(NamedTuple):
+    """The GP class and date partition a key belongs to."""
+
+    gp_class: GPClass
+    snapshot_date: str
+
+
+def parse_partition(key: str) -> Partition:
+    """Get the GP class and date of a key laid out as `{prefix}/{class}/{date}/...`.
+
+    Args:
+        key (str): The S3 key (ex. "transformed_rider_data/MOTO2/2023-10-25/riders.parquet")
+
+    Raises:
+        ValueError: If the key is not in a GP class partition
+
+    Returns:
+        Partition: The GP class and the date of the key
+    """
+    parts = key.split("/")
+    gp_class = GP_CLASSES_BY_NAME.get(parts[1]) if len(parts) > 3 else None
+    if gp_class is None:
+        raise ValueError(f"The key '{key}' is not in a GP class partition.")
+    return Partition(gp_class, parts[2])
@@ -0,0 +1,271 @@
+from contextlib import ContextDecorator, contextmanager
+from collections import Counter
+from typing import Iterator
+from datetime import timedelta
+import threading
+import logging
+import time
+import os
+
+# logger for the telemetry summaries
+logger = logging.getLogger(__name__)
+
+# prefix of every metric emitted to StatsD (ex. "motogp.proxy.requests")
+PREFIX = "motogp"
+# metrics are only recorded when this environment variable is "true" - the parse worker
+# processes are given the flag of the task instead (see transform.get_parse_pool)
+ENABLED = os.environ.get("MOTOGP_TELEMETRY", "false").lower() == "true"
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turn the recording of metrics on or off in this process.
+
+    Parse worker processes started afterwards record metrics the same way.
+
+    Args:
+        enabled (bool): Record metrics
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def _stats():
+    # imported on first use - the DAG files import this module when they are parsed
+    from airflow.stats import Stats
+
+    return Stats
+
+
+class Summary:
+    """Aggregate of the metrics recorded in a process, logged at the end of each task.
+
+    Counters are summed, and timers (in seconds) and histograms keep their count, total,
+    minimum and maximum, so memory stays constant however many values are recorded.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.distributions = {}
+
+    def incr(self, name: str, count: int) -> None:
+        # metrics are recorded from the event loop and from worker threads
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            # [count, total, min, max]
+            stats = self.distributions.get(name)
+            if stats is None:
+                self.distributions[name] = [1, value, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+
+    def drain(self) -> tuple[dict, dict]:
+        """Take the recorded metrics and start again from an empty summary.
+
+        Returns:
+            tuple[dict, dict]: The counters and the [count, total, min, max] of each
+                timer and histogram (see merge)
+        """
+        with self._lock:
+            drained = (self.counters, self.distributions)
+            self.counters, self.distributions = {}, {}
+        return drained
+
+    def merge(self, counters: dict, distributions: dict) -> None:
+        """Add the metrics drained from another summary (ex. of a parse worker process).
+
+        Args:
+            counters (dict): The counters to add
+            distributions (dict): The [count, total, min, max] of each timer and histogram
+        """
+        with self._lock:
+            for name, count in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + count
+            for name, (count, total, low, high) in distributions.items():
+                stats = self.distributions.get(name)
+                if stats is None:
+                    self.distributions[name] = [count, total, low, high]
+                else:
+                    stats[0] += count
+                    stats[1] += total
+                    stats[2] = min(stats[2], low)
+                    stats[3] = max(stats[3], high)
+
+    def as_dict(self) -> dict:
+        """Get the summary as JSON serializable values (ex. for an XCom).
+
+        Returns:
+            dict: The counters, and the count, total, mean, min and max of each
+                timer and histogram
+        """
+        with self._lock:
+            distributions = {
+                name: {
+                    "count": count,
+                    "total": round(total, 6),
+                    "mean": round(total / count, 6),
+                    "min": round(low, 6),
+                    "max": round(high, 6),
+                }
+                for name, (count, total, low, high) in self.distributions.items()
+            }
+            return {"counters": dict(self.counters), "distributions": distributions}
+
+
+# metrics of the running task
+summary = Summary()
+# S3 API calls made by this process, by operation name (ex. "GetObject")
+s3_request_counts = Counter()
+
+
+def incr(name: str, count: int = 1) -> None:
+    """Add to a counter (ex. the number of proxy requests).
+
+    Args:
+        name (str): The name of the counter, without the prefix
+        count (int): The amount added
+    """
+    # a single flag check when telemetry is disabled
+    if not ENABLED:
+        return
+    summary.incr(name, count)
+    _stats().incr(f"{PREFIX}.{name}", count)
+
+
+def observe(name: str, value: float) -> None:
+    """Record a value of a histogram (ex. the size of a page in bytes).
+
+    StatsD timers are distributions, so histograms are emitted as timers.
+
+    Args:
+        name (str): The name of the histogram, without the prefix
+        value (float): The recorded value
+    """
+    if not ENABLED:
+        return
+    summary.observe(name, value)
+    _stats().timing(f"{PREFIX}.{name}", value)
+
+
+def timing(name: str, seconds: float) -> None:
+    """Record a duration measured by the caller (ex. the latency of a request).
+
+    Args:
+        name (str): The name of the timer, without the prefix
+        seconds (float): The duration in seconds
+    """
+    if not ENABLED:
+        return
+    summary.observe(name, seconds)
+    _stats().timing(f"{PREFIX}.{name}", timedelta(seconds=seconds))
+
+
+class timer(ContextDecorator):
+    """Time a block (or each call of a decorated function) into a timer.
+
+    When telemetry is disabled, the block runs without reading the clock.
+
+    Args:
+        name (str): The name of the timer, without the prefix
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._start = None
+
+    def _recreate_cm(self) -> "timer":
+        # each call of a decorated function gets its own start time (ex. across threads)
+        return timer(self.name)
+
+    def __enter__(self) -> "timer":
+        if ENABLED:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._start is not None:
+            timing(self.name, time.perf_counter() - self._start)
+            self._start = None
+
+
+class task_telemetry(ContextDecorator):
+    """Record the metrics of a task run and log (and push as an XCom) their summary.
+
+    Decorate a task function (under `@task`) to reset the summary at the start of each
+    run. The summary is pushed under the "telemetry" XCom key when run inside a task.
+
+    Args:
+        label (str): The name of the task in the log and in its duration metric
+    """
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self._start = None
+
+    def _recreate_cm(self) -> "task_telemetry":
+        return task_telemetry(self.label)
+
+    def __enter__(self) -> Summary:
+        global summary
+        if ENABLED:
+            # start the summary of the run from scratch
+            summary = Summary()
+            self._start = time.perf_counter()
+        return summary
+
+    def __exit__(self, *exc_info) -> None:
+        if self._start is None:
+            return
+        # the duration of the run is part of its summary
+        timing(f"task.{self.label}", time.perf_counter() - self._start)
+        self._start = None
+        result = summary.as_dict()
+        logger.info("%s telemetry: %s", self.label, result)
+        _push_xcom(result)
+
+
+def _push_xcom(result: dict) -> None:
+    from airflow.exceptions import AirflowException
+    from airflow.operators.python import get_current_context
+
+    try:
+        context = get_current_context()
+    except AirflowException:
+        # not running inside a task (ex. in a test)
+        return
+    context["ti"].xcom_push(key="telemetry", value=result)
+
+
+@contextmanager
+def track_s3_requests(label: str) -> Iterator[Counter]:
+    """Count the S3 calls made inside a block (ex. one task) and log them on exit.
+
+    Can also decorate a function (ex. a task) to count the calls of each of its runs.
+
+    Args:
+        label (str): The name of the block in the log (ex. the task id)
+
+    Yields:
+        Counter: The S3 calls made inside the block so far, by operation name
+    """
+    start = s3_request_counts.copy()
+    requests = Counter()
+    try:
+        yield requests
+    finally:
+        requests.update(s3_request_counts)
+        requests.subtract(start)
+        # drop operations that were not called inside the block
+        requests += Counter()
+        logger.info(
+            "%s made %d S3 requests: %s",
+            label,
+            sum(requests.values()),
+            dict(requests),
+        )
@@ -0,0 +1,159 @@
+"""Offline benchmark harness for the scrape, transform and S3 hot paths.
+
+The benchmarks are skipped by default. Run them with
+
+    MOTOGP_BENCHMARKS=1 pytest tests/benchmarks -s
+
+to report the throughput and peak memory of each hot path and fail on a regression
+against `baseline.json`, or with MOTOGP_BENCHMARKS=update to record a new baseline
+(ex. after an intended change).
+
+Throughput is stored relative to a reference workload timed in the same run (the
+standard library's HTML tokenizer over the same pages), so the baseline holds ratios
+that carry over between machines instead of absolute timings. The pages are the
+synthetic fixtures of tests/fixtures/html, which mirror the structure of the
+motogp.com pages.
+"""
+
+from html.parser import HTMLParser
+from pathlib import Path
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import pytest
+
+BASELINE = Path(__file__).parent / "baseline.json"
+FIXTURES_DIR = Path(__file__).parents[1] / "fixtures" / "html"
+
+# "1" compares against the baseline, "update" records it
+MODE = os.environ.get("MOTOGP_BENCHMARKS", "")
+# allowed slowdown (and growth of peak memory) before a benchmark fails
+TOLERANCE = float(os.environ.get("MOTOGP_BENCHMARK_TOLERANCE", 0.5))
+
+# results of the session, reported at the end of the run
+RESULTS = {}
+
+
+def pytest_collection_modifyitems(config, items):
+    if MODE:
+        return
+    skip = pytest.mark.skip(reason="set MOTOGP_BENCHMARKS=1 to run the benchmarks")
+    for item in items:
+        if Path(str(item.fspath)).parent == Path(__file__).parent:
+            item.add_marker(skip)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if MODE == "update" and RESULTS:
+        # keep the entries of the benchmarks that did not run
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        # absolute rates depend on the machine - only the ratios are recorded
+        baseline.update(
+            {
+                name: {key: result[key] for key in ("relative_speed", "peak_kib")}
+                for name, result in RESULTS.items()
+            }
+        )
+        BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+    terminalreporter.section("benchmarks")
+    for name, result in sorted(RESULTS.items()):
+        terminalreporter.write_line(
+            f"{name:<32} {result['items_per_second']:>12,.1f} items/s "
+            f"{result['relative_speed']:>8.3f}x ref {result['peak_kib']:>12,.1f} KiB peak"
+        )
+
+
+def median_seconds(func, *args, rounds: int = 5, **kwargs) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+@pytest.fixture(scope="session")
+def reference_rate(rider_pages) -> float:
+    """Pages per second of the reference workload, tokenizing the pages with html.parser."""
+
+    def tokenize():
+        for page in rider_pages:
+            parser = HTMLParser()
+            parser.feed(page.decode("utf-8"))
+            parser.close()
+
+    tokenize()
+    return len(rider_pages) / median_seconds(tokenize, rounds=9)
+
+
+@pytest.fixture
+def bench(request, reference_rate):
+    """Time a hot path and trace its peak memory, then check it against the baseline.
+
+    Call it with the function, its arguments and the number of items (pages, files...)
+    one call processes. The median of `rounds` timed calls is used, after a warm-up call
+    whose result is returned.
+    """
+
+    def run(func, *args, items: int = 1, rounds: int = 5, **kwargs):
+        name = request.node.name.removeprefix("test_")
+        # warm up (imports, lazily compiled patterns, connection pools...)
+        result = func(*args, **kwargs)
+        seconds = median_seconds(func, *args, rounds=rounds, **kwargs)
+
+        # trace a separate call - tracing slows the calls down
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        RESULTS[name] = {
+            "items_per_second": round(items / seconds, 1),
+            # throughput in units of the reference workload of this run
+            "relative_speed": round(items / seconds / reference_rate, 3),
+            "peak_kib": round(peak / 1024, 1),
+        }
+        if MODE != "update":
+            check_regression(name, RESULTS[name])
+        return result
+
+    return run
+
+
+def check_regression(name: str, result: dict) -> None:
+    baseline = json.loads(BASELINE.read_text()).get(name) if BASELINE.exists() else None
+    if baseline is None:
+        return
+    min_speed = baseline["relative_speed"] * (1 - TOLERANCE)
+    max_peak = baseline["peak_kib"] * (1 + TOLERANCE)
+    assert (
+        result["relative_speed"] >= min_speed
+    ), f"{name} throughput regressed: {result} vs baseline {baseline}"
+    assert (
+        result["peak_kib"] <= max_peak
+    ), f"{name} peak memory regressed: {result} vs baseline {baseline}"
+
+
+@pytest.fixture(scope="session")
+def rider_pages() -> list[bytes]:
+    """The synthetic rider profile pages, repeated into a class sized workload."""
+    pages = [
+        path.read_bytes() for path in sorted(FIXTURES_DIR.glob("rider_page_*.html"))
+    ]
+    return (pages * 10)[:30]
+
+
+@pytest.fixture(scope="session")
+def riders_page() -> bytes:
+    """The synthetic riders page listing the riders of every GP class."""
+    return (FIXTURES_DIR / "riders_page.html").read_bytes()
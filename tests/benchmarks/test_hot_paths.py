@@ -0,0 +1,115 @@
+"""Benchmarks of the scrape, transform and S3 hot paths on synthetic motogp.com pages."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from include.cloud.aws_s3 import unzip_s3_key_to_list, zip_to_s3_upload
+from include.cloud.raw_store import RawStoreWriter, read_manifest_pages
+from include.etl.credentials import CachedCredential
+from include.etl.scrape import ScrapeEngine
+from include.etl.transform import (
+    collect_gp_urls,
+    extract_rider_data,
+    parse_html_and_format,
+)
+
+BUCKET = "motogp-data-project"
+KEY = "html_responses/MOTOGP/2023-10-25/rider_responses.zip"
+
+
+def replay_proxy(pages: list[bytes]) -> httpx.MockTransport:
+    # the proxy serves the fixture page of each rider URL
+    def handler(request: httpx.Request) -> httpx.Response:
+        i = int(request.url.params["url"].rsplit("-", 1)[1])
+        return httpx.Response(200, content=pages[i])
+
+    return httpx.MockTransport(handler)
+
+
+def test_collect_gp_urls(bench, riders_page):
+    response = httpx.Response(200, content=riders_page)
+
+    rider_urls = bench(collect_gp_urls, response)
+
+    assert sum(map(len, rider_urls.values())) > 0
+
+
+def test_extract_rider_data(bench, rider_pages):
+    def extract_all():
+        return [extract_rider_data(page) for page in rider_pages]
+
+    riders = bench(extract_all, items=len(rider_pages))
+
+    assert all(riders)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_parse_html_and_format(bench, rider_pages, workers):
+    # several classes worth of pages, split between the workers
+    pages = rider_pages * 10
+    riders = bench(
+        parse_html_and_format,
+        pages,
+        workers=workers,
+        items=len(pages),
+        rounds=3,
+    )
+
+    assert len(riders) == len(pages)
+
+
+def test_execute_async_requests(bench, rider_pages):
+    urls = [
+        f"https://www.motogp.com/en/riders/profile/rider-{i}"
+        for i in range(len(rider_pages))
+    ]
+
+    async def fetch_all():
+        # the engine of execute_async_requests, replaying the proxy
+        async with ScrapeEngine(
+            credentials=CachedCredential(lambda: "key"),
+            transport=replay_proxy(rider_pages),
+        ) as engine:
+            return await engine.fetch_many(urls)
+
+    responses = bench(lambda: asyncio.run(fetch_all()), items=len(urls))
+
+    assert [r.content for r in responses] == rider_pages
+
+
+@pytest.mark.parametrize("codec", ["deflate", "zstd"])
+def test_zip_to_s3_upload(bench, s3_client, rider_pages, codec):
+    responses = [httpx.Response(200, content=page) for page in rider_pages]
+
+    bench(
+        zip_to_s3_upload,
+        KEY,
+        "rider_html",
+        responses,
+        "response",
+        codec=codec,
+        items=len(responses),
+    )
+
+    assert s3_client.head_object(Bucket=BUCKET, Key=KEY)["ContentLength"] > 0
+
+
+def test_unzip_s3_key_to_list(bench, s3_client, rider_pages):
+    responses = [httpx.Response(200, content=page) for page in rider_pages]
+    zip_to_s3_upload(KEY, "rider_html", responses, "response")
+
+    htmls = bench(unzip_s3_key_to_list, KEY, BUCKET, items=len(rider_pages))
+
+    assert [html.encode() for html in htmls] == rider_pages
+
+
+def test_read_manifest_pages(bench, s3_client, rider_pages):
+    with RawStoreWriter("MOTOGP", "2023-10-25") as store:
+        for i, page in enumerate(rider_pages):
+            store.write(f"https://www.motogp.com/en/riders/profile/rider-{i}", page)
+
+    htmls = bench(read_manifest_pages, store.key, BUCKET, items=len(rider_pages))
+
+    assert [html.encode() for html in htmls] == rider_pages
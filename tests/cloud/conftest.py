@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def rider_data() -> dict:
+    """Parsed riders as returned by parse_html_and_format."""
+    return {
+        0: {
+            "rider_name": "FRANCESCO BAGNAIA",
+            "hero_hashtag": "#FB1",
+            "race_number": 1,
+            "team": "DUCATI LENOVO TEAM",
+            "bike": "DUCATI",
+            "representing_country": "IT",
+            "place_of_birth": "TURIN",
+            "date_of_birth": "1997-01-14",
+            "height": 176,
+            "weight": 67,
+        },
+        1: {
+            "rider_name": "VALENTINO ROSSI",
+            "hero_hashtag": "#VR46",
+            "race_number": 46,
+            "team": "LEGEND",
+            "bike": None,
+            "representing_country": "IT",
+            "place_of_birth": None,
+            "date_of_birth": None,
+            "height": None,
+            "weight": None,
+        },
+    }
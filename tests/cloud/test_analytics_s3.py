@@ -0,0 +1,84 @@
+"""Tests for listing the transformed partitions of the DuckDB analytics in S3."""
+
+from botocore.credentials import Credentials
+import pytest
+
+pytest.importorskip("duckdb")
+
+from include.analytics import RiderAnalytics
+from include.cloud import aws_s3
+from include.registry import riders_table_key
+
+BUCKET = "motogp-data-project"
+
+
+def test_s3_partitions_are_listed_by_class(s3_client):
+    for gp_class, snapshot_date in [
+        ("MOTOGP", "2023-10-24"),
+        ("MOTOGP", "2023-10-25"),
+        ("MOTO2", "2023-10-25"),
+    ]:
+        key = riders_table_key(gp_class, snapshot_date, "parquet")
+        s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"")
+        s3_client.put_object(
+            Bucket=BUCKET, Key=key.replace("riders.", "changes."), Body=b""
+        )
+
+    analytics = RiderAnalytics()
+
+    assert analytics.partitions(["MOTOGP"]) == [
+        (
+            "MOTOGP",
+            "2023-10-24",
+            f"s3://{BUCKET}/transformed_rider_data/MOTOGP/2023-10-24/riders.parquet",
+        ),
+        (
+            "MOTOGP",
+            "2023-10-25",
+            f"s3://{BUCKET}/transformed_rider_data/MOTOGP/2023-10-25/riders.parquet",
+        ),
+    ]
+    analytics.close()
+
+
+class RecordingConnection:
+    """Records the statements of a DuckDB connection, without the S3 ones."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        # the httpfs extension is not installed in the test environment
+        if sql.startswith(("LOAD", "SET s3")):
+            return self.connection
+        return self.connection.execute(sql, params or [])
+
+
+def test_credentials_are_refreshed_for_each_query(monkeypatch):
+    tokens = iter(["token-1", "token-2"])
+
+    class Session:
+        region_name = "eu-west-1"
+
+        def get_credentials(self):
+            # temporary credentials rotated between the queries
+            return Credentials("key", "secret", next(tokens))
+
+    monkeypatch.setattr(aws_s3, "get_boto3_session", Session)
+    analytics = RiderAnalytics(root=f"s3://{BUCKET}/transformed_rider_data")
+    connection = analytics.connection
+    analytics.connection = RecordingConnection(connection)
+
+    analytics._prepare()
+    analytics._prepare()
+
+    statements = analytics.connection.statements
+    assert statements.count("LOAD httpfs") == 1
+    assert not any(sql.startswith("INSTALL") for sql in statements)
+    assert [sql for sql in statements if "s3_session_token" in sql] == [
+        "SET s3_session_token = 'token-1'",
+        "SET s3_session_token = 'token-2'",
+    ]
+    connection.close()
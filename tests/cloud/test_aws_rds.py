@@ -0,0 +1,180 @@
+"""Tests for the bulk RDS loader against a local SQLite stand-in."""
+
+from datetime import date
+import sqlite3
+
+import pytest
+
+from include.cloud.aws_rds import (
+    KEY_COLUMNS,
+    RIDER_COLUMNS,
+    df_to_rows,
+    load_riders,
+    transformed_data_to_rds,
+)
+from include.cloud.aws_s3 import df_to_s3
+from include.etl.changes import diff_snapshots
+from include.etl.transform import RIDER_PARQUET_TYPES, riders_to_frame
+from include.registry import changes_table_key, riders_table_key
+
+BUCKET = "motogp-data-project"
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    yield connection
+    connection.close()
+
+
+class RecordingConnection:
+    """A DB-API connection that records the statements of the MySQL dialect."""
+
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+
+    def executemany(self, statement, rows):
+        self.statements.append((statement, rows))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def fetch_riders(connection):
+    return connection.execute(
+        "SELECT rider_name, team, race_number, snapshot_date FROM riders "
+        "ORDER BY snapshot_date, rider_name"
+    ).fetchall()
+
+
+def test_load_riders_is_idempotent(connection, rider_data):
+    rows = df_to_rows(riders_to_frame(rider_data, "MOTOGP", "2023-10-25"))
+
+    assert load_riders(connection, rows, dialect="sqlite") == 2
+    load_riders(connection, rows, dialect="sqlite")
+
+    assert fetch_riders(connection) == [
+        ("FRANCESCO BAGNAIA", "DUCATI LENOVO TEAM", 1, "2023-10-25"),
+        ("VALENTINO ROSSI", "LEGEND", 46, "2023-10-25"),
+    ]
+
+
+def test_load_riders_upserts_and_keeps_history(connection, rider_data):
+    load_riders(
+        connection,
+        df_to_rows(riders_to_frame(rider_data, "MOTOGP", "2023-10-25")),
+        dialect="sqlite",
+    )
+
+    rider_data[0]["team"] = "PRAMAC RACING"
+    # same day rerun updates the row, next day adds a new snapshot
+    for snapshot_date in ["2023-10-25", "2023-10-26"]:
+        load_riders(
+            connection,
+            df_to_rows(riders_to_frame({0: rider_data[0]}, "MOTOGP", snapshot_date)),
+            dialect="sqlite",
+        )
+
+    assert fetch_riders(connection) == [
+        ("FRANCESCO BAGNAIA", "PRAMAC RACING", 1, "2023-10-25"),
+        ("VALENTINO ROSSI", "LEGEND", 46, "2023-10-25"),
+        ("FRANCESCO BAGNAIA", "PRAMAC RACING", 1, "2023-10-26"),
+    ]
+
+
+def test_df_to_rows_uses_none_for_missing_values(rider_data):
+    rows = df_to_rows(riders_to_frame(rider_data, "MOTOGP", "2023-10-25"))
+
+    assert rows[1][4] is None and rows[1][8] is None and rows[1][9] is None
+
+
+def test_load_riders_keeps_a_permanent_staging_table(connection, rider_data):
+    connection.execute("CREATE TABLE riders_staging (note TEXT)")
+
+    load_riders(
+        connection,
+        df_to_rows(riders_to_frame(rider_data, "MOTOGP", "2023-10-25")),
+        dialect="sqlite",
+    )
+
+    # only the temporary staging table is dropped
+    assert connection.execute("SELECT * FROM main.riders_staging").fetchall() == []
+    assert len(fetch_riders(connection)) == 2
+
+
+def test_load_riders_mysql_statements(rider_data):
+    rows = df_to_rows(riders_to_frame(rider_data, "MOTOGP", "2023-10-25"))
+    connection = RecordingConnection()
+
+    load_riders(connection, rows, dialect="mysql")
+
+    statements = [statement for statement, _ in connection.statements]
+    assert statements[1:] == [
+        "DROP TEMPORARY TABLE IF EXISTS riders_staging",
+        "CREATE TEMPORARY TABLE riders_staging LIKE riders",
+        "INSERT INTO riders_staging (rider_name, hero_hashtag, race_number, team, bike, "
+        "gp_class, representing_country, place_of_birth, date_of_birth, height, weight, "
+        "snapshot_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        "INSERT INTO riders (rider_name, hero_hashtag, race_number, team, bike, "
+        "gp_class, representing_country, place_of_birth, date_of_birth, height, weight, "
+        "snapshot_date) SELECT rider_name, hero_hashtag, race_number, team, bike, "
+        "gp_class, representing_country, place_of_birth, date_of_birth, height, weight, "
+        "snapshot_date FROM riders_staging ON DUPLICATE KEY UPDATE "
+        "hero_hashtag = VALUES(hero_hashtag), race_number = VALUES(race_number), "
+        "team = VALUES(team), bike = VALUES(bike), "
+        "representing_country = VALUES(representing_country), "
+        "place_of_birth = VALUES(place_of_birth), "
+        "date_of_birth = VALUES(date_of_birth), height = VALUES(height), "
+        "weight = VALUES(weight)",
+        "DROP TEMPORARY TABLE IF EXISTS riders_staging",
+    ]
+    # the staged values are bound in the order of the column list
+    staged = dict(zip(RIDER_COLUMNS, connection.statements[3][1][0]))
+    assert {column: staged[column] for column in KEY_COLUMNS} == {
+        "rider_name": "FRANCESCO BAGNAIA",
+        "gp_class": "MOTOGP",
+        "snapshot_date": date(2023, 10, 25),
+    }
+    assert staged["race_number"] == 1 and staged["team"] == "DUCATI LENOVO TEAM"
+    assert connection.committed
+
+
+def test_change_tables_load_removals(s3_client, connection, rider_data):
+    first = riders_to_frame(rider_data, "MOTOGP", "2023-10-25")
+    df_to_s3(first, riders_table_key("MOTOGP", "2023-10-25", "parquet"), BUCKET)
+    # the second rider is no longer on the riders page the next day
+    second = riders_to_frame({0: rider_data[0]}, "MOTOGP", "2023-10-26")
+    changes, _ = diff_snapshots(second, first, "2023-10-26")
+    changes_key = changes_table_key("MOTOGP", "2023-10-26", "parquet")
+    df_to_s3(changes, changes_key, BUCKET, dtype=RIDER_PARQUET_TYPES)
+
+    loaded = transformed_data_to_rds(
+        [riders_table_key("MOTOGP", "2023-10-25", "parquet"), changes_key],
+        BUCKET,
+        connection=connection,
+        dialect="sqlite",
+    )
+    # a rerun of the day does not duplicate the removal
+    transformed_data_to_rds([changes_key], BUCKET, connection, dialect="sqlite")
+
+    assert list(loaded.values()) == [2, 1]
+    assert fetch_riders(connection) == [
+        ("FRANCESCO BAGNAIA", "DUCATI LENOVO TEAM", 1, "2023-10-25"),
+        ("VALENTINO ROSSI", "LEGEND", 46, "2023-10-25"),
+    ]
+    assert connection.execute("SELECT * FROM rider_removals").fetchall() == [
+        ("VALENTINO ROSSI", "MOTOGP", "2023-10-26")
+    ]
@@ -0,0 +1,209 @@
+"""Tests for the S3 archive helpers against a moto S3 stand-in."""
+
+import io
+
+from airflow.exceptions import AirflowException
+from botocore.exceptions import ClientError
+import pyarrow.parquet as pq
+import httpx
+import pytest
+
+from include.cloud.aws_s3 import (
+    df_to_s3,
+    download_from_s3,
+    find_previous_partition,
+    get_s3_client,
+    track_s3_requests,
+    s3_to_df,
+    S3MultipartWriter,
+    S3RangeReader,
+    iter_s3_zip_members,
+    unzip_s3_key_to_list,
+    zip_to_s3_upload,
+)
+from include.etl.changes import diff_snapshots
+from include import telemetry
+from include.etl.transform import RIDER_PARQUET_TYPES, riders_to_frame
+
+BUCKET = "motogp-data-project"
+
+
+def make_responses(count: int) -> list[httpx.Response]:
+    return [
+        httpx.Response(200, content=f"<html>rider {i}</html>".encode() * 500)
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("codec", ["deflate", "zstd"])
+def test_zip_roundtrip(s3_client, codec):
+    responses = make_responses(20)
+    key = "html_responses/MOTOGP/2023-10-25/rider_responses.zip"
+
+    zip_to_s3_upload(key, "rider_html", responses + [None], "response", codec=codec)
+
+    assert unzip_s3_key_to_list(key, BUCKET) == [r.text for r in responses]
+
+
+def test_zip_rejects_unknown_type(s3_client):
+    key = "html_responses/MOTOGP/2023-10-25/rider_responses.zip"
+
+    with pytest.raises(ValueError, match="'dict', 'response'"):
+        zip_to_s3_upload(key, "rider_html", make_responses(2), "rider_html")
+
+    # no multipart upload is left behind
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=BUCKET)
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=BUCKET)
+
+
+def test_multipart_writer_buffers_one_part(s3_client):
+    part_size = 5 * 1024 * 1024
+    writer = S3MultipartWriter(s3_client, BUCKET, "blob.bin", part_size=part_size)
+    for _ in range(12):
+        writer.write(b"x" * 1024 * 1024)
+        assert len(writer._buffer) < part_size
+    writer.close()
+
+    body = s3_client.get_object(Bucket=BUCKET, Key="blob.bin")["Body"].read()
+    assert len(body) == 12 * 1024 * 1024
+    assert len(writer._parts) == 3
+
+
+def test_multipart_writer_abort(s3_client):
+    writer = S3MultipartWriter(s3_client, BUCKET, "aborted.bin")
+    writer.write(b"partial")
+    writer.abort()
+
+    assert s3_client.list_multipart_uploads(Bucket=BUCKET).get("Uploads") is None
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=BUCKET)
+
+
+def test_iter_s3_zip_members_is_lazy(s3_client):
+    responses = make_responses(5)
+    key = "html_responses/MOTO2/2023-10-25/rider_responses.zip"
+    zip_to_s3_upload(key, "rider_html", responses, "response")
+
+    members = iter_s3_zip_members(key, BUCKET)
+
+    assert next(members) == responses[0].content
+    assert list(members) == [r.content for r in responses[1:]]
+
+
+def test_range_reader_seeks(s3_client):
+    body = bytes(range(256)) * 100
+    s3_client.put_object(Bucket=BUCKET, Key="blob.bin", Body=body)
+    reader = S3RangeReader(s3_client, BUCKET, "blob.bin", block_size=1000)
+
+    reader.seek(-10, io.SEEK_END)
+    assert reader.read(100) == body[-10:]
+    # reads spanning several blocks
+    buffered = io.BufferedReader(reader)
+    buffered.seek(2500)
+    assert buffered.read(4500) == body[2500:7000]
+
+
+def test_range_reader_missing_key(s3_client):
+    with pytest.raises(AirflowException):
+        S3RangeReader(s3_client, BUCKET, "missing.zip")
+
+
+def test_range_reader_raises_other_errors_unchanged(s3_client, monkeypatch):
+    def get_object(**kwargs):
+        raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+
+    monkeypatch.setattr(s3_client, "get_object", get_object)
+
+    with pytest.raises(ClientError) as excinfo:
+        S3RangeReader(s3_client, BUCKET, "rider_responses.zip")
+    assert excinfo.value.response["Error"]["Code"] == "AccessDenied"
+
+
+def test_download_from_s3_skips_head_request(s3_client, tmp_path):
+    s3_client.put_object(Bucket=BUCKET, Key="rider.html", Body=b"<html></html>")
+
+    with track_s3_requests("download") as requests:
+        path = download_from_s3("rider.html", BUCKET, str(tmp_path))
+        with pytest.raises(AirflowException):
+            download_from_s3("missing.html", BUCKET, str(tmp_path))
+
+    assert open(path, "rb").read() == b"<html></html>"
+    assert requests == {"GetObject": 2}
+
+
+def test_s3_client_is_shared_and_counted(s3_client):
+    responses = make_responses(3)
+    key = "html_responses/MOTOE/2023-10-25/rider_responses.zip"
+
+    with track_s3_requests("zip") as requests:
+        zip_to_s3_upload(key, "rider_html", responses, "response")
+        unzip_s3_key_to_list(key, BUCKET)
+
+    assert get_s3_client() is get_s3_client()
+    assert get_s3_client().meta.config.max_pool_connections == 32
+    # the size of the archive comes from the first ranged GET - no HEAD request
+    assert "HeadObject" not in requests
+    assert requests["CreateMultipartUpload"] == requests["UploadPart"] == 1
+
+
+def test_s3_calls_are_timed_by_the_task_telemetry(s3_client, rider_data):
+    df = riders_to_frame(rider_data, "MOTOGP", "2023-10-25")
+    key = "transformed_rider_data/MOTOGP/2023-10-25/riders.parquet"
+
+    telemetry.set_enabled(True)
+    try:
+        with telemetry.task_telemetry("transform") as summary:
+            df_to_s3(df, key, BUCKET, dtype=RIDER_PARQUET_TYPES)
+            s3_to_df(key, BUCKET)
+    finally:
+        telemetry.set_enabled(False)
+
+    result = summary.as_dict()
+    assert result["counters"]["s3.rows_written"] == len(rider_data)
+    assert result["distributions"]["s3.PutObject.latency"]["count"] == 1
+    assert result["distributions"]["s3.bytes_downloaded"]["total"] > 0
+
+
+def test_riders_table_roundtrip(s3_client, rider_data):
+    df = riders_to_frame(rider_data, "MOTOGP", "2023-10-25")
+    key = "transformed_rider_data/MOTOGP/2023-10-25/riders.parquet"
+
+    df_to_s3(df, key, BUCKET, dtype=RIDER_PARQUET_TYPES)
+
+    table = pq.read_table(
+        io.BytesIO(s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+    )
+    assert table.num_rows == len(rider_data)
+    assert str(table.schema.field("race_number").type) == "int8"
+    assert str(table.schema.field("date_of_birth").type) == "date32[day]"
+    assert table.column("gp_class").to_pylist() == ["MOTOGP"] * len(rider_data)
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "csv"])
+def test_previous_snapshot_roundtrip(s3_client, rider_data, file_format):
+    for snapshot_date in ["2023-10-23", "2023-10-24", "2023-10-25"]:
+        df_to_s3(
+            riders_to_frame(rider_data, "MOTOGP", snapshot_date),
+            f"transformed_rider_data/MOTOGP/{snapshot_date}/riders.{file_format}",
+            BUCKET,
+            file_format=file_format,
+            dtype=RIDER_PARQUET_TYPES,
+        )
+
+    previous_date = find_previous_partition(
+        "transformed_rider_data/MOTOGP", before="2023-10-25", bucket_name=BUCKET
+    )
+    assert previous_date == "2023-10-24"
+    assert (
+        find_previous_partition("transformed_rider_data/MOTOGP", "2023-10-23", BUCKET)
+        is None
+    )
+
+    previous = s3_to_df(
+        f"transformed_rider_data/MOTOGP/{previous_date}/riders.{file_format}", BUCKET
+    )
+    # riders read back from S3 fingerprint the same as the ones written
+    _, manifest = diff_snapshots(
+        riders_to_frame(rider_data, "MOTOGP", "2023-10-25"), previous, "2023-10-25"
+    )
+    assert manifest["unchanged"] == len(rider_data)
+    assert manifest["previous_snapshot_date"] == "2023-10-24"
@@ -0,0 +1,88 @@
+"""Tests for the HTML cache: eviction and the S3 mirror of its index and bodies."""
+
+from datetime import datetime, timedelta, timezone
+import os
+
+import httpx
+
+from include.etl.cache import HtmlCache
+from include.registry import html_cache_prefix
+
+BUCKET = "motogp-data-project"
+URL = "https://www.motogp.com/en/riders/profile/rider-{}"
+
+
+def page(i: int, size: int = 10) -> httpx.Response:
+    return httpx.Response(200, content=f"{i}".encode() * size)
+
+
+def age(cache: HtmlCache, url: str, delta: timedelta) -> None:
+    fetched_at = datetime.now(timezone.utc) - delta
+    cache.index[url]["fetched_at"] = fetched_at.isoformat()
+
+
+def test_default_ttl_outlasts_the_daily_schedule(tmp_path):
+    cache = HtmlCache(str(tmp_path))
+    cache.store(URL.format(0), page(0))
+    age(cache, URL.format(0), timedelta(hours=25))
+
+    assert cache.is_fresh(cache.lookup(URL.format(0)))
+
+
+def test_evicts_old_entries_and_their_bodies(tmp_path):
+    cache = HtmlCache(str(tmp_path), max_age=timedelta(days=7))
+    for i in range(3):
+        cache.store(URL.format(i), page(i))
+    # the same body stays referenced by a recent URL
+    cache.store(URL.format(3), page(0))
+    age(cache, URL.format(0), timedelta(days=8))
+    age(cache, URL.format(1), timedelta(days=8))
+
+    cache.save()
+
+    assert sorted(cache.index) == [URL.format(2), URL.format(3)]
+    assert len(os.listdir(cache.bodies_dir)) == 2
+    assert sorted(HtmlCache(str(tmp_path)).index) == [URL.format(2), URL.format(3)]
+
+
+def test_evicts_oldest_entries_past_the_size_limit(tmp_path):
+    cache = HtmlCache(str(tmp_path), max_bytes=250)
+    for i in range(4):
+        cache.store(URL.format(i), page(i, size=100))
+        age(cache, URL.format(i), timedelta(hours=4 - i))
+
+    cache.save()
+
+    assert sorted(cache.index) == [URL.format(2), URL.format(3)]
+    assert len(os.listdir(cache.bodies_dir)) == 2
+
+
+def test_cache_survives_a_fresh_worker_through_s3(s3_client, tmp_path):
+    prefix = html_cache_prefix("MOTOGP")
+    cache = HtmlCache(str(tmp_path / "worker_1"), bucket_name=BUCKET, prefix=prefix)
+    for i in range(3):
+        cache.store(URL.format(i), page(i))
+    cache.save()
+
+    # another worker, with an empty local disk
+    cache = HtmlCache(str(tmp_path / "worker_2"), bucket_name=BUCKET, prefix=prefix)
+
+    assert sorted(cache.index) == [URL.format(i) for i in range(3)]
+    response = cache.build_response(URL.format(1), cache.lookup(URL.format(1)))
+    assert response.content == page(1).content
+
+
+def test_evicted_bodies_are_deleted_from_s3(s3_client, tmp_path):
+    prefix = html_cache_prefix("MOTOGP")
+    cache = HtmlCache(
+        str(tmp_path), max_age=timedelta(days=7), bucket_name=BUCKET, prefix=prefix
+    )
+    for i in range(2):
+        cache.store(URL.format(i), page(i))
+    cache.save()
+    age(cache, URL.format(0), timedelta(days=8))
+
+    cache.save()
+
+    response = s3_client.list_objects_v2(Bucket=BUCKET, Prefix=f"{prefix}/bodies/")
+    assert len(response["Contents"]) == 1
@@ -0,0 +1,96 @@
+"""Tests for the content-addressed raw html store against a moto S3 stand-in."""
+
+from airflow.exceptions import AirflowException
+import httpx
+import pytest
+
+from include.cloud.aws_s3 import track_s3_requests, zip_to_s3_upload
+from include.cloud.raw_store import (
+    RawStoreWriter,
+    body_digest,
+    iter_raw_pages,
+    read_manifest,
+    read_manifest_pages,
+    stored_digests,
+)
+from include.registry import RAW_BODIES_PREFIX, raw_manifest_key
+
+BUCKET = "motogp-data-project"
+URLS = [f"https://www.motogp.com/en/riders/profile/rider-{i}" for i in range(4)]
+
+
+def snapshot(pages: list[bytes], snapshot_date: str, codec: str = "deflate") -> str:
+    known = stored_digests("MOTOGP", snapshot_date, codec)
+    with RawStoreWriter("MOTOGP", snapshot_date, codec, known_digests=known) as store:
+        for url, page in zip(URLS, pages):
+            store.write(url, page)
+    return store.key
+
+
+def stored_bodies(s3_client) -> list[str]:
+    response = s3_client.list_objects_v2(Bucket=BUCKET, Prefix=RAW_BODIES_PREFIX)
+    return [item["Key"] for item in response.get("Contents", [])]
+
+
+@pytest.mark.parametrize("codec", ["deflate", "zstd"])
+def test_snapshot_roundtrip(s3_client, codec):
+    pages = [f"<html>rider {i}</html>".encode() * 100 for i in range(4)]
+
+    key = snapshot(pages, "2023-10-25", codec)
+
+    assert key == raw_manifest_key("MOTOGP", "2023-10-25")
+    manifest = read_manifest(key)
+    assert [page["url"] for page in manifest["pages"]] == URLS
+    assert [page["sha256"] for page in manifest["pages"]] == list(
+        map(body_digest, pages)
+    )
+    assert read_manifest_pages(key) == [page.decode() for page in pages]
+    assert len(stored_bodies(s3_client)) == 4
+
+
+def test_unchanged_pages_are_stored_once(s3_client):
+    day_one = [
+        b"<html>a</html>",
+        b"<html>b</html>",
+        b"<html>c</html>",
+        b"<html>a</html>",
+    ]
+    day_two = [
+        b"<html>a</html>",
+        b"<html>b</html>",
+        b"<html>C</html>",
+        b"<html>a</html>",
+    ]
+
+    with track_s3_requests("day one") as first:
+        snapshot(day_one, "2023-10-25")
+    with track_s3_requests("day two") as second:
+        key = snapshot(day_two, "2023-10-26")
+
+    # duplicates within a day and pages unchanged since the day before are not uploaded
+    assert first["PutObject"] == 3 + 1
+    assert second["PutObject"] == 1 + 1
+    assert len(stored_bodies(s3_client)) == 4
+    # both days can still be read in full
+    assert read_manifest_pages(raw_manifest_key("MOTOGP", "2023-10-25")) == [
+        page.decode() for page in day_one
+    ]
+    assert list(iter_raw_pages(key)) == day_two
+
+
+def test_failed_upload_writes_no_manifest(s3_client):
+    store = RawStoreWriter("MOTOGP", "2023-10-25", bucket_name="missing-bucket")
+    store.write(URLS[0], b"<html>a</html>")
+
+    with pytest.raises(AirflowException):
+        store.close()
+    with pytest.raises(AirflowException):
+        read_manifest(store.key)
+
+
+def test_zip_archives_are_still_readable(s3_client):
+    key = "html_responses/MOTOGP/2023-10-25/rider_responses.zip"
+    responses = [httpx.Response(200, content=b"<html>a</html>")]
+    zip_to_s3_upload(key, "rider_html", responses, "response")
+
+    assert list(iter_raw_pages(key, decode=True)) == ["<html>a</html>"]
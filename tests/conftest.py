@@ -0,0 +1,23 @@
+import boto3
+import pytest
+from moto import mock_s3
+
+from include.cloud.aws_s3 import get_boto3_session, get_s3_client
+
+BUCKET = "motogp-data-project"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """A moto S3 stand-in with the project bucket, reachable through the "s3_conn" hook."""
+    monkeypatch.setenv("AIRFLOW_CONN_S3_CONN", "aws://")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    # the shared session and client are created again for each test
+    get_boto3_session.cache_clear()
+    get_s3_client.cache_clear()
+    with mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
@@ -0,0 +1,72 @@
+"""Import time budget of the DAG files, measured with `python -X importtime`.
+
+The scheduler parses the DAG files over and over, so a DAG file must not import the
+heavy dependencies of its tasks at module level.
+"""
+
+from pathlib import Path
+import os
+import subprocess
+import sys
+
+import pytest
+
+DAGS_DIR = Path(__file__).parents[2] / "dags"
+# dependencies that may only be imported inside the tasks
+HEAVY_MODULES = [
+    "awswrangler",
+    "pandas",
+    "boto3",
+    "country_converter",
+    "bs4",
+    "httpx",
+    "tenacity",
+    "mysql",
+]
+# import time of a DAG file on top of Airflow itself, in microseconds
+IMPORT_BUDGET_US = 100_000
+
+# Airflow is imported first (it is already loaded when the scheduler parses a file),
+# then the DAG file is loaded like the DagBag does
+SCRIPT = """
+import importlib.util, sys
+import airflow.decorators, airflow.models, airflow.models.param, pendulum
+print("-- dag --", file=sys.stderr, flush=True)
+spec = importlib.util.spec_from_file_location("dag_under_test", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+"""
+
+
+def import_dag(path: Path) -> dict[str, int]:
+    """Get the modules imported by a DAG file with their self import time (us)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT, str(path)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(DAGS_DIR.parent)},
+        check=True,
+    )
+    lines = result.stderr.split("-- dag --", 1)[1].splitlines()
+    modules = {}
+    for line in lines:
+        # "import time: self [us] | cumulative | imported package"
+        if line.startswith("import time:") and "|" in line:
+            self_us, _, name = line.removeprefix("import time:").split("|")
+            if self_us.strip().isdigit():
+                modules[name.strip()] = int(self_us)
+    return modules
+
+
+@pytest.mark.parametrize(
+    "path", sorted(DAGS_DIR.glob("*.py")), ids=lambda path: path.name
+)
+def test_dag_file_imports_are_light(path):
+    modules = import_dag(path)
+
+    heavy = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+    assert not heavy, f"{path.name} imports heavy modules when parsed: {heavy}"
+    total = sum(modules.values())
+    assert total < IMPORT_BUDGET_US, (
+        f"{path.name} imports take {total} us: "
+        f"{sorted(modules.items(), key=lambda item: -item[1])[:10]}"
+    )
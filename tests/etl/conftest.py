@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import pytest
+
+from include.etl import transform
+
+FIXTURES_DIR = Path(__file__).parents[1] / "fixtures" / "html"
+
+
+@pytest.fixture(scope="session")
+def rider_pages() -> list[str]:
+    """The HTML of the stored rider profile fixtures (racer, test rider and legend)."""
+    return [path.read_text() for path in sorted(FIXTURES_DIR.glob("rider_page_*.html"))]
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    """Parse in worker processes whatever the number of pages and CPUs."""
+    monkeypatch.setattr(transform, "MIN_PROCESS_PAGES", 0)
+    monkeypatch.setattr(transform, "MAX_PARSE_WORKERS", 2)
+    yield
+    transform.shutdown_parse_pool()
@@ -0,0 +1,136 @@
+"""Tests for the resumable backfill work queue."""
+
+import asyncio
+
+from airflow.exceptions import AirflowException
+import httpx
+import pytest
+
+from include.etl.backfill import (
+    WorkItem,
+    WorkQueue,
+    check_season_rosters,
+    run_shard,
+    shard_of,
+)
+
+ITEMS = [
+    WorkItem(
+        gp_class,
+        season,
+        f"https://www.motogp.com/en/riders/profile/{gp_class}-{season}-{i}",
+    )
+    for gp_class in ["MOTOGP", "MOTO2"]
+    for season in [2019, 2020]
+    for i in range(10)
+]
+
+
+class Crash(Exception):
+    pass
+
+
+def fetcher(fail: set = frozenset(), calls: list = None):
+    async def fetch_many(urls: list[str]) -> list:
+        if calls is not None:
+            calls.extend(urls)
+        return [
+            httpx.ConnectError("down") if url in fail else httpx.Response(200, text=url)
+            for url in urls
+        ]
+
+    return fetch_many
+
+
+def test_add_is_idempotent_and_sharded(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+
+    assert queue.add(ITEMS, num_shards=4) == len(ITEMS)
+    assert queue.add(ITEMS, num_shards=4) == 0
+
+    shards = [queue.pending(shard) for shard in range(4)]
+    assert sorted(item for shard in shards for item in shard) == sorted(ITEMS)
+    assert all(
+        shard_of(item, 4) == n for n, shard in enumerate(shards) for item in shard
+    )
+
+
+def test_rider_pages_are_queued_once(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    # the same riders listed in an earlier season, one of them in another class
+    earlier = [
+        WorkItem("MOTO2" if i == 0 else item.gp_class, 2018, item.url)
+        for i, item in enumerate(ITEMS[:10])
+    ]
+
+    assert queue.add(ITEMS[:10] + earlier, num_shards=4) == 10
+    assert queue.add(earlier, num_shards=4) == 0
+
+    assert sorted(queue.pending()) == sorted(ITEMS[:10])
+    # a rider lands in the same shard whatever the season it was listed in
+    assert all(shard_of(a, 4) == shard_of(b, 4) for a, b in zip(ITEMS, earlier))
+
+
+def test_resume_skips_completed_batches(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path)
+    queue.add(ITEMS)
+    archived = []
+
+    def crash_on_third_batch(items, responses):
+        if len(archived) == 2:
+            raise Crash()
+        archived.append(items)
+
+    with pytest.raises(Crash):
+        asyncio.run(run_shard(queue, fetcher(), crash_on_third_batch, batch_size=15))
+    queue.close()
+
+    # the restarted run only fetches what was not archived
+    queue = WorkQueue(path)
+    calls = []
+    progress = asyncio.run(
+        run_shard(
+            queue,
+            fetcher(calls=calls),
+            lambda items, responses: archived.append(items),
+            batch_size=15,
+        )
+    )
+
+    assert progress == {"done": len(ITEMS)}
+    assert len(calls) == len(ITEMS) - 30
+    assert sorted(item for batch in archived for item in batch) == sorted(ITEMS)
+
+
+def test_failed_items_are_retried_then_given_up(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=3)
+    queue.add(ITEMS)
+    checkpoints = []
+
+    progress = asyncio.run(
+        run_shard(
+            queue,
+            fetcher(fail={ITEMS[0].url}),
+            lambda items, responses: None,
+            lambda: checkpoints.append(queue.progress()),
+        )
+    )
+
+    assert progress == {"done": len(ITEMS) - 1, "failed": 1}
+    assert queue.pending() == []
+    # one checkpoint for the first batch and one per retry of the failed item
+    assert len(checkpoints) == 3
+
+
+def test_identical_season_rosters_are_rejected():
+    rosters = {
+        season: {"MOTOGP": [item.url for item in ITEMS if item.season == season]}
+        for season in [2019, 2020]
+    }
+    check_season_rosters(rosters, "riders?season={season}")
+
+    # the filter is ignored - every season lists the current riders
+    rosters[2018] = rosters[2020]
+    with pytest.raises(AirflowException, match="Seasons 2020 and 2018"):
+        check_season_rosters(rosters, "riders?season={season}")
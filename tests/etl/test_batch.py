@@ -0,0 +1,107 @@
+"""Tests for the vectorized (batch) validation of the transform stage."""
+
+from pydantic import ValidationError
+from airflow.exceptions import AirflowException
+import pandas as pd
+import pytest
+
+from include.etl.batch import parse_html_to_frame, validate_riders
+from include.etl.transform import (
+    parse_html_and_format,
+    riders_to_frame,
+    validate_raw_rider,
+)
+
+VALID = {
+    "rider_name": "FRANCESCO BAGNAIA",
+    "hero_hashtag": "#FB1",
+    "team": "DUCATI LENOVO TEAM",
+    "representing_country": "IT",
+    "bike": "DUCATI",
+    "place_of_birth": "TURIN",
+    "date_of_birth": "14/01/1997",
+    "height": "176 CM",
+    "weight": "67 KG",
+}
+# one invalid (or edge case) field per raw rider
+CASES = [
+    {},
+    {"hero_hashtag": "#FB0"},
+    {"hero_hashtag": "#FB100"},
+    {"hero_hashtag": None},
+    {"rider_name": None},
+    {"representing_country": "not found"},
+    {"representing_country": None},
+    {"team": None, "bike": None, "place_of_birth": None},
+    {"date_of_birth": "31/02/1997"},
+    {"date_of_birth": "1997-01-14"},
+    {"date_of_birth": "1/2/1997"},
+    {"date_of_birth": None},
+    {"height": "151 CM"},
+    {"height": "201 CM"},
+    {"height": "0CM", "weight": "0KG"},
+    {"height": None, "weight": None},
+    {"weight": "39 KG"},
+    {"weight": "116 KG."},
+    {"hero_hashtag": "#FB100", "height": "140 CM", "representing_country": None},
+]
+
+
+def record_errors(raw: dict) -> set:
+    try:
+        validate_raw_rider(raw)
+    except ValidationError as err:
+        return {(error["loc"], error["type"]) for error in err.errors()}
+    return set()
+
+
+def test_errors_match_rider_model():
+    raw = pd.DataFrame([{**VALID, **case} for case in CASES])
+
+    riders, errors = validate_riders(raw)
+
+    for row, case in enumerate(CASES):
+        batch = {(e["loc"], e["type"]) for e in errors if e["row"] == row}
+        assert batch == record_errors({**VALID, **case}), case
+    # the valid rows are the same as the ones built by the Rider model
+    valid = [row for row in raw.index if not record_errors(raw.loc[row].to_dict())]
+    assert list(riders.index) == valid
+    expected = riders_to_frame(
+        {row: validate_raw_rider(raw.loc[row].to_dict()) for row in valid},
+        "MOTOGP",
+        "2023-10-25",
+    )
+    assert riders.reset_index(drop=True).equals(expected[riders.columns])
+
+
+def test_unparsable_numbers_are_reported():
+    raw = pd.DataFrame(
+        [{**VALID, "hero_hashtag": "#FB"}, {**VALID, "height": "1.76 M"}]
+    )
+
+    riders, errors = validate_riders(raw)
+
+    assert riders.empty
+    assert [(e["row"], e["loc"], e["type"]) for e in errors] == [
+        (0, ("race_number",), "int_parsing"),
+        (1, ("height",), "int_parsing"),
+    ]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_batch_matches_record_pipeline(rider_pages, process_pool, workers):
+    expected = riders_to_frame(
+        parse_html_and_format(rider_pages), "MOTO2", "2023-10-25"
+    )
+
+    assert parse_html_to_frame(rider_pages, "MOTO2", "2023-10-25", workers).equals(
+        expected
+    )
+
+
+def test_batch_reports_every_invalid_rider(rider_pages):
+    # every race number is pushed above 99
+    pages = [page.replace(">#", ">#99") for page in rider_pages]
+
+    with pytest.raises(AirflowException, match="3 riders failed validation"):
+        parse_html_to_frame(pages, "MOTOGP", "2023-10-25")
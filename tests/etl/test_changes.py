@@ -0,0 +1,76 @@
+"""Tests for the change-data-capture mode of the transform stage."""
+
+from include.etl.changes import diff_snapshots, transform_incremental
+from include.etl.transform import riders_to_frame
+
+
+def run(pages, previous=None, snapshot_date="2023-10-25"):
+    return transform_incremental(pages, previous, "MOTOGP", snapshot_date)
+
+
+def test_first_snapshot_inserts_every_rider(rider_pages):
+    snapshot, changes, manifest = run(rider_pages)
+
+    assert len(snapshot) == 3
+    assert list(changes["change_type"]) == ["inserted"] * 3
+    assert manifest["previous_snapshot_date"] is None
+    assert manifest["pages_parsed"] == 3
+
+
+def test_unchanged_pages_are_not_parsed(rider_pages):
+    previous, _, _ = run(rider_pages)
+
+    snapshot, changes, manifest = run(rider_pages, previous, "2023-10-26")
+
+    assert manifest["pages_reused"] == 3 and manifest["pages_parsed"] == 0
+    assert changes.empty and manifest["unchanged"] == 3
+    # the reused riders are the same as the parsed ones
+    assert snapshot.drop(columns="snapshot_date").equals(
+        previous.drop(columns="snapshot_date")
+    )
+
+
+def test_updated_and_removed_riders(rider_pages):
+    previous, _, _ = run(rider_pages)
+    legend, racer, _ = rider_pages
+    # the racer changes team and the test rider is no longer listed
+    racer = racer.replace(">Ducati Lenovo Team<", ">Pramac Racing<")
+
+    _, changes, manifest = run([legend, racer], previous, "2023-10-26")
+
+    assert manifest["pages_parsed"] == 1
+    assert manifest["updated"] == ["FRANCESCO BAGNAIA"]
+    assert manifest["removed"] == ["MICHELE PIRRO"]
+    assert manifest["inserted"] == []
+    assert dict(zip(changes["rider_name"], changes["change_type"])) == {
+        "FRANCESCO BAGNAIA": "updated",
+        "MICHELE PIRRO": "removed",
+    }
+    assert set(changes["snapshot_date"].astype(str)) == {"2023-10-26"}
+
+
+def test_diff_ignores_page_only_changes(rider_pages):
+    previous, _, _ = run(rider_pages)
+    # markup changes that do not change the extracted fields
+    pages = [
+        page.replace("<body", "<!-- tracking pixel --><body") for page in rider_pages
+    ]
+
+    snapshot, _, manifest = run(pages, previous, "2023-10-26")
+
+    assert manifest["pages_parsed"] == 3
+    assert manifest["updated"] == [] and manifest["unchanged"] == 3
+    _, manifest = diff_snapshots(snapshot, previous, "2023-10-26")
+    assert manifest["unchanged"] == 3
+
+
+def test_empty_snapshot_removes_every_rider(rider_pages):
+    previous, _, _ = run(rider_pages)
+    # the class page came back without any rider
+    current = riders_to_frame({}, "MOTOGP", "2023-10-26")
+
+    changes, manifest = diff_snapshots(current, previous, "2023-10-26")
+
+    assert manifest["removed"] == list(previous["rider_name"])
+    assert list(changes["change_type"]) == ["removed"] * 3
+    assert set(changes["snapshot_date"].astype(str)) == {"2023-10-26"}
@@ -0,0 +1,73 @@
+"""Tests for collecting rider URLs from the riders page."""
+
+from pathlib import Path
+
+from airflow.exceptions import AirflowException
+from bs4 import BeautifulSoup
+import httpx
+import pytest
+
+from include.etl import transform
+from include.etl.parsers import HAS_SELECTOLAX
+
+FIXTURE = Path(__file__).parents[1] / "fixtures" / "html" / "riders_page.html"
+EXPECTED_COUNTS = {"MOTOGP": 22, "MOTO2": 30, "MOTO3": 28, "MOTOE": 18}
+
+
+@pytest.fixture(scope="module")
+def riders_response():
+    return httpx.Response(200, content=FIXTURE.read_bytes())
+
+
+def legacy_collect_gp_urls(response):
+    """The previous implementation - one html.parser parse per GP class."""
+    all_rider_urls = {}
+    for gp_class in ["MOTOGP", "MOTO2", "MOTO3", "MOTOE"]:
+        parent = f"div[class*='rider-grid__{gp_class.lower()}']"
+        child = "div[class*='rider-list__container'] a"
+        soup = BeautifulSoup(response.content, "html.parser")
+        urls = []
+        for attribs in soup.select_one(parent).select(child):
+            if attribs["href"]:
+                urls.append("https://www.motogp.com" + attribs["href"])
+        all_rider_urls[gp_class] = urls
+    return all_rider_urls
+
+
+def test_collect_gp_urls_counts_and_dedup(riders_response):
+    rider_urls = transform.collect_gp_urls(riders_response)
+
+    assert {k: len(v) for k, v in rider_urls.items()} == EXPECTED_COUNTS
+    for urls in rider_urls.values():
+        assert len(urls) == len(set(urls))
+        assert all(url.startswith("https://www.motogp.com/en/riders/") for url in urls)
+
+
+def test_collect_gp_urls_matches_legacy(riders_response):
+    legacy = legacy_collect_gp_urls(riders_response)
+    deduplicated = {k: list(dict.fromkeys(v)) for k, v in legacy.items()}
+
+    assert transform.collect_gp_urls(riders_response) == deduplicated
+
+
+@pytest.mark.skipif(not HAS_SELECTOLAX, reason="selectolax is not installed")
+def test_backends_agree(riders_response):
+    soup_hrefs = transform._grid_hrefs_soup(riders_response.content)
+    selectolax_hrefs = transform._grid_hrefs_selectolax(riders_response.content)
+
+    assert soup_hrefs == selectolax_hrefs
+
+
+def test_missing_class_grid(riders_response):
+    # the riders page of a season before MotoE
+    content = riders_response.content.replace(b"rider-grid__motoe", b"rider-grid__old")
+    season_response = httpx.Response(200, content=content)
+
+    with pytest.raises(AirflowException):
+        transform.collect_gp_urls(season_response)
+    rider_urls = transform.collect_gp_urls(season_response, required=False)
+    assert {k: len(v) for k, v in rider_urls.items()} == {
+        "MOTOGP": 22,
+        "MOTO2": 30,
+        "MOTO3": 28,
+    }
@@ -0,0 +1,51 @@
+"""Tests for the country name to ISO2 lookup."""
+
+import pytest
+
+from include.etl import countries
+from include.etl.transform import _parse_in_processes, extract_raw_rider
+
+
+@pytest.fixture
+def fresh_lookup(monkeypatch):
+    # rebuild the lookup and clear the memoized conversions for each test
+    monkeypatch.setattr(countries, "_lookup", None)
+    countries._resolve.cache_clear()
+    countries.unknown_countries.clear()
+    yield
+    countries._resolve.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "name,iso2",
+    [("ITALY", "IT"), ("SPAIN", "ES"), ("GREAT BRITAIN", "GB"), ("SOUTH AFRICA", "ZA")],
+)
+def test_to_iso2(fresh_lookup, name, iso2):
+    assert countries.to_iso2(name) == iso2
+
+
+def test_unknown_names_are_counted(fresh_lookup):
+    assert countries.to_iso2("ATLANTIS") == countries.NOT_FOUND
+    assert countries.to_iso2("ATLANTIS") == countries.NOT_FOUND
+
+    assert countries.unknown_countries == {"ATLANTIS": 2}
+
+
+def test_prebuilt_lookup_file(fresh_lookup, monkeypatch, tmp_path):
+    path = tmp_path / "countries.json"
+    countries.write_lookup_file(str(path))
+    monkeypatch.setenv(countries.LOOKUP_PATH_ENV, str(path))
+    # loading from the file must not need country_converter
+    monkeypatch.setattr(countries, "build_lookup", None)
+
+    assert countries.to_iso2("JAPAN") == "JP"
+
+
+def test_unknown_names_of_worker_processes_are_counted(
+    fresh_lookup, process_pool, rider_pages
+):
+    pages = [page.replace(">Italy<", ">Atlantis<") for page in rider_pages[:2]]
+
+    list(_parse_in_processes(pages, workers=2, chunksize=1, extract=extract_raw_rider))
+
+    assert countries.unknown_countries == {"ATLANTIS": 2}
@@ -0,0 +1,61 @@
+"""Tests for the cached proxy credential used by the scraping engine."""
+
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+
+from tenacity import wait_none
+import httpx
+
+from include.etl.credentials import CachedCredential
+from include.etl.limiter import AdaptiveLimiter
+from include.etl.scrape import fetch_html
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_credential_is_loaded_once_per_ttl():
+    keys = iter(["key-1", "key-2"])
+    clock = FakeClock()
+    credential = CachedCredential(
+        lambda: next(keys), ttl=timedelta(minutes=1), clock=clock
+    )
+
+    assert [credential.get() for _ in range(100)] == ["key-1"] * 100
+    clock.now = 61
+    assert credential.get() == "key-2"
+    assert credential.loads == 2
+
+
+def test_rotated_key_is_reloaded_and_retried():
+    # the store has rotated the key while the first value was cached
+    store = {"key": "old-key"}
+    credential = CachedCredential(lambda: store["key"])
+    credential.get()
+    store["key"] = "new-key"
+
+    def proxy(request: httpx.Request) -> httpx.Response:
+        api_key = parse_qs(urlsplit(str(request.url)).query)["api_key"][0]
+        if api_key != "new-key":
+            return httpx.Response(401)
+        return httpx.Response(200, text="<html>rider</html>")
+
+    async def fetch() -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(proxy)) as client:
+            return await fetch_html.retry_with(wait=wait_none())(
+                client,
+                AdaptiveLimiter(),
+                "https://www.motogp.com/en/riders/profile/rider",
+                credentials=credential,
+            )
+
+    response = asyncio.run(fetch())
+
+    assert response.status_code == 200
+    assert credential.loads == 2
@@ -0,0 +1,78 @@
+"""Tests for the serial and process-pool modes of parse_html_and_format."""
+
+from airflow.exceptions import AirflowException
+import pytest
+
+from include import telemetry
+from include.etl import transform
+from include.etl.transform import parse_html_and_format
+
+
+def test_parallel_matches_serial(rider_pages, process_pool):
+    pages = rider_pages * 4
+
+    serial = parse_html_and_format(pages)
+    parallel = parse_html_and_format(pages, workers=2, chunksize=1)
+
+    assert list(parallel) == list(range(len(pages)))
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_invalid_page_raises_in_both_modes(rider_pages, process_pool, workers):
+    # a race number above 99 fails the Rider model validation
+    invalid_page = rider_pages[1].replace(">#FB1<", ">#FB100<")
+    pages = [rider_pages[0], invalid_page, rider_pages[2]]
+
+    with pytest.raises(AirflowException, match="race_number"):
+        parse_html_and_format(pages, workers=workers, chunksize=1)
+
+
+def test_worker_processes_are_reused(rider_pages, process_pool):
+    parse_html_and_format(rider_pages, workers=2)
+    pool = transform.get_parse_pool(2)
+    parse_html_and_format(rider_pages, workers=2)
+
+    assert transform.get_parse_pool(2) is pool
+
+
+def test_small_batches_stay_in_this_process(rider_pages, monkeypatch):
+    def get_parse_pool(workers):
+        raise AssertionError("no worker process should be started")
+
+    monkeypatch.setattr(transform, "MAX_PARSE_WORKERS", 2)
+    monkeypatch.setattr(transform, "get_parse_pool", get_parse_pool)
+
+    assert parse_html_and_format(rider_pages, workers=2) == parse_html_and_format(
+        rider_pages
+    )
+
+
+def test_threshold_is_configurable(rider_pages, monkeypatch):
+    started = []
+
+    def get_parse_pool(workers):
+        started.append(workers)
+        raise RuntimeError("pool started")
+
+    monkeypatch.setattr(transform, "MAX_PARSE_WORKERS", 2)
+    monkeypatch.setattr(transform, "get_parse_pool", get_parse_pool)
+
+    with pytest.raises(RuntimeError, match="pool started"):
+        parse_html_and_format(rider_pages, workers=2, min_pages=len(rider_pages))
+    assert started == [2]
+
+
+def test_worker_metrics_reach_the_task_summary(rider_pages, process_pool):
+    pages = rider_pages * 2
+    telemetry.set_enabled(True)
+    try:
+        with telemetry.task_telemetry("transform_htmls") as summary:
+            parse_html_and_format(pages, workers=2, chunksize=1)
+    finally:
+        telemetry.set_enabled(False)
+
+    # every page was timed in a worker process
+    assert summary.as_dict()["distributions"]["transform.parse_page"]["count"] == len(
+        pages
+    )
@@ -0,0 +1,98 @@
+"""Tests for the streaming extract and transform pipeline."""
+
+import asyncio
+import random
+
+import httpx
+import pytest
+from airflow.exceptions import AirflowException
+
+from include.etl.credentials import CachedCredential
+from include.etl.pipeline import stream_class
+from include.etl.scrape import ScrapeEngine
+from include.etl.transform import parse_html_and_format, riders_to_frame
+from include.registry import GP_CLASS_NAMES
+
+URLS = [f"https://www.motogp.com/en/riders/profile/rider-{i}" for i in range(12)]
+
+
+def serve(pages: dict[str, str], missing: set = frozenset()):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        url = request.url.params["url"]
+        # complete the pages out of order
+        await asyncio.sleep(random.uniform(0, 0.02))
+        if url in missing:
+            return httpx.Response(404)
+        return httpx.Response(200, text=pages[url])
+
+    return httpx.MockTransport(handler)
+
+
+def run(pages: dict[str, str], missing: set = frozenset(), **kwargs):
+    async def main():
+        async with ScrapeEngine(
+            credentials=CachedCredential(lambda: "key"),
+            transport=serve(pages, missing),
+        ) as engine:
+            return await stream_class(
+                engine, "MOTOGP", list(pages), "2023-10-25", queue_size=2, **kwargs
+            )
+
+    return asyncio.run(main())
+
+
+def test_matches_the_batch_transform_and_archives_in_url_order(rider_pages):
+    pages = {url: rider_pages[i % len(rider_pages)] for i, url in enumerate(URLS)}
+    archived = []
+
+    df = run(pages, archive=lambda url, content: archived.append((url, content)))
+
+    expected = riders_to_frame(
+        parse_html_and_format(pages.values()), "MOTOGP", "2023-10-25"
+    )
+    assert df.equals(expected)
+    assert [url for url, _ in archived] == URLS
+    assert [content.decode() for _, content in archived] == list(pages.values())
+
+
+def test_pages_that_were_not_fetched_are_skipped(rider_pages):
+    pages = {url: rider_pages[i % len(rider_pages)] for i, url in enumerate(URLS)}
+    missing = {URLS[0], URLS[5]}
+    archived = []
+
+    df = run(pages, missing, archive=lambda url, content: archived.append(url))
+
+    assert len(df) == len(URLS) - 2
+    assert archived == [url for url in URLS if url not in missing]
+
+
+def test_failed_archive_fails_the_class(rider_pages):
+    pages = {url: rider_pages[0] for url in URLS}
+
+    def archive(url, content):
+        raise OSError("disk full")
+
+    with pytest.raises(AirflowException, match="disk full"):
+        run(pages, archive=archive)
+
+
+def test_limit_grows_to_the_share_of_a_class(rider_pages):
+    # a class's share of the default budget, as in the mapped extract task
+    share = max(1, 20 // len(GP_CLASS_NAMES))
+    urls = [f"https://www.motogp.com/en/riders/profile/rider-{i}" for i in range(30)]
+    pages = {url: rider_pages[0] for url in urls}
+
+    async def main():
+        async with ScrapeEngine(
+            max_concurrency=share,
+            credentials=CachedCredential(lambda: "key"),
+            transport=serve(pages),
+        ) as engine:
+            start = engine.limiter.limit
+            await engine.fetch_many(urls)
+            return start, engine.limiter.limit
+
+    start, end = asyncio.run(main())
+
+    assert start < share
+    assert end == share
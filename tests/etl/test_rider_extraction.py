@@ -0,0 +1,75 @@
+"""Tests for the single-pass rider page extraction."""
+
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+import pytest
+
+from include.etl import transform
+from include.etl.parsers import is_installed
+from include.etl.scrape import extract_text
+
+ACCENTED_PAGE = (
+    Path(__file__).parents[1] / "fixtures" / "html" / "accented_rider_page.html"
+)
+
+BACKENDS = [
+    pytest.param("html.parser"),
+    pytest.param(
+        "lxml",
+        marks=pytest.mark.skipif(not is_installed("lxml"), reason="lxml not installed"),
+    ),
+    pytest.param(
+        "selectolax",
+        marks=pytest.mark.skipif(
+            not is_installed("selectolax"), reason="selectolax not installed"
+        ),
+    ),
+]
+
+
+def legacy_extract_fields(html):
+    """The previous extraction - one CSS query per field over an html.parser tree."""
+    soup = BeautifulSoup(html, "html.parser")
+    bio = soup.select("div[class='rider-bio__table'] > div > p + p")
+    return {
+        "rider_name": extract_text(soup, "span[class*='rider-hero__info-name']"),
+        "hero_hashtag": extract_text(soup, "span[class*='rider-hero__info-hashtag']"),
+        "team": extract_text(soup, "span[class*='rider-hero__details-team']"),
+        "representing_country": extract_text(
+            soup, "span[class*='rider-hero__details-country']"
+        ),
+        "rider_bio": [element.get_text(strip=True) for element in bio],
+    }
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_match_legacy_selectors(rider_pages, backend):
+    for html in rider_pages:
+        fields = transform.RIDER_SPEC.extract(html, backend)
+        legacy = legacy_extract_fields(html)
+
+        assert {
+            k: transform._upper(v) for k, v in fields.items() if k != "rider_bio"
+        } == {k: v for k, v in legacy.items() if k != "rider_bio"}
+        assert fields["rider_bio"] == legacy["rider_bio"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_extract_rider_data_is_backend_independent(rider_pages, backend):
+    expected = [
+        transform.extract_rider_data(html, "html.parser") for html in rider_pages
+    ]
+
+    assert [
+        transform.extract_rider_data(html, backend) for html in rider_pages
+    ] == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_undeclared_utf8_bytes(backend):
+    # raw bytes as read from the archive - the page does not declare its charset
+    fields = transform.RIDER_SPEC.extract(ACCENTED_PAGE.read_bytes(), backend)
+
+    assert fields["rider_name"] == "Raúl Fernández"
+    assert "Alcalá de Henares" in fields["rider_bio"]
@@ -0,0 +1,62 @@
+"""Tests for the block page detection of the scraping engine."""
+
+from urllib.parse import urlencode
+
+import httpx
+import pytest
+
+from include.etl.scrape import is_retryable_content
+from include.etl.signatures import (
+    SITE_SIGNATURES,
+    BlockSignatures,
+    find_block_signature,
+    register_site_signatures,
+)
+
+
+def proxied(url: str, body: bytes) -> httpx.Response:
+    request = httpx.Request(
+        "GET", "https://proxy.scrapeops.io/v1/", params=urlencode({"url": url})
+    )
+    return httpx.Response(200, content=body, request=request)
+
+
+@pytest.fixture
+def other_site():
+    yield register_site_signatures("example.com", ["Access Denied", "captcha"], 64)
+    SITE_SIGNATURES.pop("example.com")
+
+
+def test_phrases_are_matched_case_insensitively():
+    signatures = BlockSignatures(["you are blocked", "captcha"])
+
+    assert signatures.search(b"<title>You Are BLOCKED</title>") == "you are blocked"
+    assert signatures.search(b"<div>CAPTCHA</div>") == "captcha"
+    assert signatures.search(b"<html>rider page</html>") is None
+
+
+def test_only_the_leading_bytes_are_scanned():
+    signatures = BlockSignatures(["you are blocked"], scan_bytes=32)
+
+    assert signatures.search(b"you are blocked" + b" " * 100)
+    assert signatures.search(b" " * 100 + b"you are blocked") is None
+
+
+def test_signatures_are_chosen_by_the_proxied_site(other_site):
+    page = b"<h1>Access denied</h1>"
+
+    assert is_retryable_content(proxied("https://example.com/a", page))
+    assert not is_retryable_content(proxied("https://www.motogp.com/en", page))
+    assert is_retryable_content(
+        proxied("https://www.motogp.com/en", b"You are blocked")
+    )
+
+
+def test_the_scan_result_is_cached_on_the_response():
+    response = proxied("https://www.motogp.com/en", b"You are blocked")
+
+    assert find_block_signature(response) == "you are blocked"
+    assert response.extensions["block_signature"] == "you are blocked"
+    # a response without a request uses the default signatures
+    assert not is_retryable_content(httpx.Response(200, content=b"rider page"))
+    assert not is_retryable_content(None)
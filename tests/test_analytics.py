@@ -0,0 +1,130 @@
+"""Tests for the DuckDB analytics over local copies of the transformed partitions."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from include.analytics import ClassProfile, RiderAnalytics, RosterChange
+from include.etl.transform import riders_to_frame
+
+
+def rider(name: str, weight: int = None, height: int = None) -> dict:
+    return {
+        "rider_name": name,
+        "hero_hashtag": None,
+        "race_number": None,
+        "team": None,
+        "bike": None,
+        "representing_country": None,
+        "place_of_birth": None,
+        "date_of_birth": None,
+        "height": height,
+        "weight": weight,
+    }
+
+
+SNAPSHOTS = {
+    ("MOTOGP", "2023-10-24"): [rider("A", 60, 170), rider("B", 70, 180)],
+    ("MOTOGP", "2023-10-25"): [rider("A", 60, 170), rider("C", 80, 190)],
+    ("MOTO2", "2023-10-25"): [rider("D", 65)],
+}
+
+
+@pytest.fixture
+def root(tmp_path):
+    """The riders tables laid out as in the bucket, with a changes table next to one."""
+    for (gp_class, snapshot_date), riders in SNAPSHOTS.items():
+        partition = tmp_path / gp_class / snapshot_date
+        partition.mkdir(parents=True)
+        df = riders_to_frame(dict(enumerate(riders)), gp_class, snapshot_date)
+        df.to_parquet(partition / "riders.parquet", index=False)
+    (tmp_path / "MOTOGP" / "2023-10-25" / "changes.json").write_text("{}")
+    return tmp_path
+
+
+@pytest.fixture
+def analytics(root):
+    analytics = RiderAnalytics(str(root))
+    yield analytics
+    analytics.close()
+
+
+def test_partitions_are_pruned_by_class_and_date(analytics, root):
+    assert [p[:2] for p in analytics.partitions(["MOTOGP"])] == [
+        ("MOTOGP", "2023-10-24"),
+        ("MOTOGP", "2023-10-25"),
+    ]
+
+    relation = analytics.riders(["MOTOGP", "MOTO2"], start="2023-10-25")
+
+    assert sorted(row[0] for row in relation.project("rider_name").fetchall()) == [
+        "A",
+        "C",
+        "D",
+    ]
+    with pytest.raises(ValueError):
+        analytics.riders(["MOTOE"])
+
+
+def test_roster_changes(analytics):
+    assert analytics.roster_changes() == [
+        RosterChange(date(2023, 10, 25), "MOTOGP", "C", "joined"),
+        RosterChange(date(2023, 10, 25), "MOTOGP", "B", "left"),
+    ]
+
+
+def test_class_profiles(analytics):
+    assert analytics.class_profiles(["MOTOGP"]) == [
+        ClassProfile("MOTOGP", date(2023, 10, 24), 2, 65.0, 175.0),
+        ClassProfile("MOTOGP", date(2023, 10, 25), 2, 70.0, 180.0),
+    ]
+    moto2 = analytics.class_profiles(["MOTO2"])
+    assert moto2 == [ClassProfile("MOTO2", date(2023, 10, 25), 1, 65.0, None)]
+
+
+def test_query_with_params(analytics):
+    df = analytics.query(
+        "SELECT rider_name FROM riders WHERE weight > ? ORDER BY rider_name",
+        params=[62],
+    )
+
+    assert list(df["rider_name"]) == ["B", "C", "D"]
+
+
+def test_concurrent_queries_read_their_own_partitions(analytics):
+    def classes(gp_class: str) -> list[str]:
+        df = analytics.query("SELECT DISTINCT gp_class FROM riders", [gp_class])
+        return list(df["gp_class"])
+
+    requested = ["MOTOGP", "MOTO2"] * 50
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(classes, requested))
+
+    assert results == [[gp_class] for gp_class in requested]
+
+
+def test_riders_relation_is_not_replaced_by_later_queries(analytics):
+    relation = analytics.riders(["MOTO2"])
+    analytics.query("SELECT * FROM riders", ["MOTOGP"])
+
+    assert relation.project("rider_name").fetchall() == [("D",)]
+
+
+def test_aggregates_are_cached_until_they_expire(root):
+    now = [0.0]
+    analytics = RiderAnalytics(str(root), clock=lambda: now[0])
+    first = analytics.class_profiles(["MOTO2"])
+
+    # a new snapshot is not seen until the cached listing expires
+    partition = root / "MOTO2" / "2023-10-26"
+    partition.mkdir()
+    df = riders_to_frame({0: rider("E", 75)}, "MOTO2", "2023-10-26")
+    df.to_parquet(partition / "riders.parquet", index=False)
+
+    assert analytics.class_profiles(["MOTO2"]) is first
+    now[0] += 601
+    assert len(analytics.class_profiles(["MOTO2"])) == 2
+    analytics.close()
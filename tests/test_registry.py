@@ -0,0 +1,32 @@
+"""Tests for the GP class and S3 key registry."""
+
+import pytest
+
+from include.registry import (
+    GP_CLASSES,
+    GRID_CLASS_PATTERN,
+    changes_table_key,
+    html_archive_key,
+    parse_partition,
+    riders_table_key,
+)
+
+
+@pytest.mark.parametrize("gp_class", GP_CLASSES, ids=lambda c: c.name)
+def test_key_builders_roundtrip(gp_class):
+    for key in [
+        html_archive_key(gp_class.name, "2023-10-25"),
+        riders_table_key(gp_class.name, "2023-10-25", "parquet"),
+        changes_table_key(gp_class.name, "2023-10-25", "csv"),
+    ]:
+        assert parse_partition(key) == (gp_class, "2023-10-25")
+    # every class has a rider grid on the riders page
+    assert GRID_CLASS_PATTERN.search(f"rider-grid rider-grid__{gp_class.slug}")
+
+
+@pytest.mark.parametrize(
+    "key", ["transformed_rider_data/WSBK/2023-10-25/riders.parquet", "riders.parquet"]
+)
+def test_parse_partition_rejects_unknown_keys(key):
+    with pytest.raises(ValueError):
+        parse_partition(key)
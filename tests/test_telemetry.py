@@ -0,0 +1,126 @@
+"""Tests for the per-task telemetry of the DAG."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from include import telemetry
+from include.etl.credentials import CachedCredential
+from include.etl.scrape import ScrapeEngine
+from include.etl import transform
+
+
+@pytest.fixture
+def enabled():
+    telemetry.set_enabled(True)
+    yield
+    telemetry.set_enabled(False)
+
+
+def test_nothing_is_recorded_when_disabled():
+    telemetry.set_enabled(False)
+
+    with telemetry.task_telemetry("task") as summary:
+        telemetry.incr("proxy.requests")
+        with telemetry.timer("transform.parse_page"):
+            pass
+
+    assert summary.as_dict() == {"counters": {}, "distributions": {}}
+
+
+def test_task_summary(enabled, caplog):
+    @telemetry.timer("step")
+    def step():
+        telemetry.incr("items", 2)
+        telemetry.observe("bytes", 10)
+
+    with caplog.at_level("INFO", logger="include.telemetry"):
+        with telemetry.task_telemetry("task") as summary:
+            step()
+            step()
+            telemetry.observe("bytes", 30)
+
+    result = summary.as_dict()
+    assert result["counters"] == {"items": 4}
+    assert result["distributions"]["bytes"] == {
+        "count": 3,
+        "total": 50,
+        "mean": pytest.approx(50 / 3, rel=1e-5),
+        "min": 10,
+        "max": 30,
+    }
+    assert result["distributions"]["step"]["count"] == 2
+    assert result["distributions"]["task.task"]["count"] == 1
+    assert "task telemetry" in caplog.text
+
+
+def test_each_task_run_starts_a_new_summary(enabled):
+    decorator = telemetry.task_telemetry("task")
+
+    @decorator
+    def run():
+        telemetry.incr("items")
+        return telemetry.summary
+
+    first, second = run(), run()
+
+    assert first is not second
+    assert second.as_dict()["counters"] == {"items": 1}
+
+
+def test_proxy_requests_are_recorded(enabled):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"<html>rider</html>")
+
+    async def fetch():
+        async with ScrapeEngine(
+            credentials=CachedCredential(lambda: "key"),
+            transport=httpx.MockTransport(handler),
+        ) as engine:
+            return await engine.fetch_many(["https://www.motogp.com/a"] * 3)
+
+    with telemetry.task_telemetry("extract") as summary:
+        asyncio.run(fetch())
+
+    result = summary.as_dict()
+    assert result["counters"]["proxy.requests"] == 3
+    assert result["counters"]["proxy.status.200"] == 3
+    assert result["distributions"]["proxy.response_bytes"]["max"] == 18
+    assert result["distributions"]["proxy.latency"]["count"] == 3
+
+
+def test_drained_metrics_merge_into_another_summary():
+    worker = telemetry.Summary()
+    worker.incr("items", 2)
+    worker.observe("bytes", 10)
+    worker.observe("bytes", 30)
+    task = telemetry.Summary()
+    task.incr("items", 1)
+    task.observe("bytes", 20)
+
+    task.merge(*worker.drain())
+
+    assert worker.as_dict() == {"counters": {}, "distributions": {}}
+    assert task.as_dict() == {
+        "counters": {"items": 3},
+        "distributions": {
+            "bytes": {"count": 3, "total": 60, "mean": 20, "min": 10, "max": 30}
+        },
+    }
+
+
+def worker_telemetry_enabled() -> bool:
+    return telemetry.ENABLED
+
+
+def test_parse_workers_follow_the_flag(monkeypatch):
+    monkeypatch.delenv("MOTOGP_TELEMETRY", raising=False)
+    try:
+        for enabled in [True, False]:
+            telemetry.set_enabled(enabled)
+            pool = transform.get_parse_pool(1)
+            assert pool.submit(worker_telemetry_enabled).result() is enabled
+    finally:
+        telemetry.set_enabled(False)
+        transform.shutdown_parse_pool()